@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import numpy as np
+import MotionVisualizer
+
+NS_PER_SECOND = 1e9
+MIN_QUALITY = 0.2  # Below this peak correlation the devices are not considered matched
+MAX_DRIFT_PPM = 1000.0  # Phone clocks drift far less; larger fits come from repetitive motion
+
+def motion_signal(visualizer, fs=100.0):
+    """
+    Gyro plus accelerometer magnitude of one device, each normalized to zero
+    mean and unit variance, resampled onto a uniform `fs` grid of its own clock
+
+    Returns:
+    --------
+    (start time in seconds, signal)
+    """
+    length = min(len(visualizer.time), len(visualizer.accelerometer_x), len(visualizer.gyro_x))
+    seconds = (np.asarray(visualizer.time[:length], dtype=np.int64) - int(visualizer.time[0])) / NS_PER_SECOND
+    acc = np.sqrt(visualizer.accelerometer_x[:length] ** 2 + visualizer.accelerometer_y[:length] ** 2
+                  + visualizer.accelerometer_z[:length] ** 2)
+    gyro = np.sqrt(visualizer.gyro_x[:length] ** 2 + visualizer.gyro_y[:length] ** 2 + visualizer.gyro_z[:length] ** 2)
+
+    grid = np.arange(0.0, seconds[-1], 1.0 / fs) if length > 1 else np.zeros(1)
+    signal = np.zeros(len(grid))
+    for values in (acc, gyro):
+        resampled = np.interp(grid, seconds, values)
+        std = resampled.std()
+        signal += (resampled - resampled.mean()) / (std if std > 0 else 1.0)
+    std = signal.std()
+    return int(visualizer.time[0]) / NS_PER_SECOND, signal / (std if std > 0 else 1.0)
+
+
+def cross_correlate(reference, other, min_overlap=1):
+    """
+    Normalized cross-correlation of two signals for every lag, in O(n log n)
+
+    The correlation at lag k compares reference[n + k] with other[n]; it is
+    divided by the number of overlapping samples so partial overlaps at large
+    lags are not penalized. Lags overlapping less than `min_overlap` samples
+    are excluded.
+
+    Returns:
+    --------
+    (lag in samples with sub-sample refinement, correlation at that lag)
+    """
+    size = 1 << int(np.ceil(np.log2(len(reference) + len(other) - 1)))
+    spectrum = np.fft.rfft(reference, size) * np.conj(np.fft.rfft(other, size))
+    correlation = np.fft.irfft(spectrum, size)
+
+    # Lags -(len(other) - 1) .. len(reference) - 1; negative lags wrap to the end
+    lags = np.arange(-(len(other) - 1), len(reference))
+    correlation = correlation[lags % size]
+    overlap = np.minimum(len(other), len(reference) - lags) - np.maximum(0, -lags)
+    correlation = np.where(overlap >= min_overlap, correlation / np.maximum(overlap, 1), -np.inf)
+
+    best = int(np.argmax(correlation))
+    lag = float(lags[best])
+    if 0 < best < len(correlation) - 1 and np.isfinite(correlation[best - 1]) and np.isfinite(correlation[best + 1]):
+        # Parabola through the peak and its neighbours
+        left, center, right = correlation[best - 1:best + 2]
+        curvature = left - 2.0 * center + right
+        if curvature < 0:
+            lag += 0.5 * (left - right) / curvature
+    return lag, float(correlation[best])
+
+
+def estimate_offset(reference, other, fs=100.0, drift=False, segments=8, search=2.0, max_drift_ppm=MAX_DRIFT_PPM):
+    """
+    Estimate the clock offset (and optionally drift) of `other` against `reference`
+    by cross-correlating their motion signals (see motion_signal)
+
+    Parameters:
+    -----------
+    reference, other : MotionVisualizer
+    fs : float
+        Resampling rate in Hz; the offset resolution is a fraction of 1 / fs
+    drift : bool
+        Also correlate `segments` pieces of the session separately and fit
+        the offset change over time
+    search : float
+        Seconds around the global offset searched by each segment
+    max_drift_ppm : float
+        Drift fits beyond this are rejected and the global offset is kept
+
+    Returns:
+    --------
+    dict with offset_s (add to other's time stamps to get reference time; with
+    drift, at other's first sample), drift_ppm (change of the offset per second
+    of other's clock, 0 unless estimated) and quality (peak correlation, at
+    most about 1)
+    """
+    reference_start, reference_signal = motion_signal(reference, fs)
+    other_start, other_signal = motion_signal(other, fs)
+    min_overlap = int(min(len(reference_signal), len(other_signal)) * 0.25)
+    lag, quality = cross_correlate(reference_signal, other_signal, max(1, min_overlap))
+    result = {"offset_s": float(reference_start - other_start + lag / fs), "drift_ppm": 0.0, "quality": quality}
+    if not drift:
+        return result
+
+    # Local offsets of consecutive pieces of `other`, each searched near the global lag
+    piece = len(other_signal) // segments
+    pad = int(search * fs)
+    times, lags, weights = [], [], []
+    for segment in range(segments):
+        start = segment * piece
+        window_start = int(start + lag) - pad
+        window_stop = int(start + lag) + piece + pad
+        if piece < fs or window_start < 0 or window_stop > len(reference_signal):
+            continue
+        local_lag, local_quality = cross_correlate(reference_signal[window_start:window_stop],
+                                                   other_signal[start:start + piece], piece)
+        if local_quality > 0.3:
+            times.append((start + piece / 2) / fs)
+            lags.append((window_start + local_lag - start) / fs)
+            weights.append(local_quality)
+    if len(times) >= 2:
+        slope, intercept = np.polyfit(times, lags, 1, w=weights)
+        if abs(slope) * 1e6 > max_drift_ppm:
+            return result
+        result["offset_s"] = reference_start - other_start + float(intercept)
+        result["drift_ppm"] = float(slope * 1e6)
+    return result
+
+
+def cached_offset(reference, other, fs=100.0, drift=False):
+    """
+    estimate_offset() cached per device pair as clock_<key>.json in the
+    reference device folder, reused until either device's files change
+    """
+    settings = {"other": os.path.abspath(other.based_path), "fs": fs, "drift": drift, "max_drift_ppm": MAX_DRIFT_PPM}
+    key = hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+    path = os.path.join(reference.based_path, f"clock_{key}.json")
+    tag = [MotionVisualizer.source_tag(reference.based_path), MotionVisualizer.source_tag(other.based_path)]
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        if cached.get("tag") == tag:
+            return cached["result"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    result = estimate_offset(reference, other, fs, drift)
+    try:
+        with open(path, "w") as f:
+            json.dump({"settings": settings, "tag": tag, "result": result}, f)
+    except OSError as e:
+        print(f"Could not cache clock offset in {path}: {e}")
+    return result
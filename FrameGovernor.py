@@ -0,0 +1,137 @@
+import time
+
+# Optional work at each quality level, from full quality down; the sensor
+# stream and UDP output are never part of it
+QUALITY_LEVELS = [
+    {"name": "full", "glyph_detail": 20, "ui_interval": 1, "text_interval": 1, "trail_stride": 1, "plots": True, "detail_text": True},
+    {"name": "reduced", "glyph_detail": 12, "ui_interval": 2, "text_interval": 3, "trail_stride": 2, "plots": True, "detail_text": True},
+    {"name": "low", "glyph_detail": 8, "ui_interval": 4, "text_interval": 10, "trail_stride": 4, "plots": True, "detail_text": False},
+    {"name": "minimal", "glyph_detail": 5, "ui_interval": 8, "text_interval": 30, "trail_stride": 8, "plots": False, "detail_text": False},
+]
+
+class FrameGovernor:
+    def __init__(self, sample_dt, budget=1.0 / 60.0, degrade_after=5, restore_after=90, headroom=0.6,
+                 smoothing=0.2, max_catch_up=0.25):
+        """
+        Frame-time budget for the players.
+
+        Playback is paced by the wall clock instead of by frames: every frame
+        steps and sends all samples that fell due since the last one, so a
+        slow frame delays the picture but not the sensor stream. The time a
+        frame spends working (everything except the sleep until the next
+        sample, and waits bracketed by end_work() and start_work() such as a
+        buffer swap blocking on vsync) is smoothed and compared to the budget;
+        sustained overruns step the quality level down, sustained headroom
+        steps it back up.
+
+        Parameters:
+        -----------
+        sample_dt : float
+            Sample period in seconds
+        budget : float
+            Frame time in seconds the players aim to stay under
+        degrade_after, restore_after : int
+            Consecutive frames over budget (under headroom * budget) before
+            the level is lowered (raised); restoring is slower so the level
+            does not oscillate
+        headroom : float
+            Fraction of the budget a frame must stay under to count towards restoring
+        smoothing : float
+            Weight of the latest frame in the moving average of frame times
+        max_catch_up : float
+            Seconds of samples stepped in one frame at most; anything older is
+            dropped and playback falls behind
+        """
+        self.sample_dt = sample_dt
+        self.budget = budget
+        self.degrade_after = degrade_after
+        self.restore_after = restore_after
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.max_samples = max(1, int(round(max_catch_up / sample_dt)))
+
+        self.level = 0
+        self.frame = 0
+        self.frame_time = 0.0
+        self.over = 0
+        self.under = 0
+        self.dropped = 0
+        self.clock = None
+        self.backlog = 0.0
+        self.work = 0.0
+        self.work_start = time.perf_counter()  # None while not working
+
+    @property
+    def settings(self):
+        """Optional work allowed at the current level, see QUALITY_LEVELS"""
+        return QUALITY_LEVELS[self.level]
+
+    def every(self, setting):
+        """Whether work refreshed every settings[setting] frames is due this frame"""
+        return self.frame % self.settings[setting] == 0
+
+    def samples_due(self, paused=False):
+        """Number of samples to step this frame to keep playback on the wall clock; 0 while paused"""
+        now = time.perf_counter()
+        if paused or self.clock is None:
+            self.clock = now
+            self.backlog = 0.0
+            return 0
+        self.backlog += (now - self.clock) / self.sample_dt
+        self.clock = now
+        due = int(self.backlog)
+        self.backlog -= due
+        if due > self.max_samples:
+            self.dropped += due - self.max_samples
+            due = self.max_samples
+        return due
+
+    def end_work(self):
+        """Stop counting frame time, e.g. before a buffer swap that waits for vsync"""
+        if self.work_start is not None:
+            self.work += time.perf_counter() - self.work_start
+            self.work_start = None
+
+    def start_work(self):
+        """Count frame time again after end_work()"""
+        if self.work_start is None:
+            self.work_start = time.perf_counter()
+
+    def end_frame(self):
+        """Measure the frame, adapt the quality level and sleep until the next sample is due"""
+        self.end_work()
+        now = time.perf_counter()
+        elapsed = self.work
+        self.frame_time += self.smoothing * (elapsed - self.frame_time)
+        self.frame += 1
+
+        if self.frame_time > self.budget:
+            self.over += 1
+            self.under = 0
+        elif self.frame_time < self.headroom * self.budget:
+            self.under += 1
+            self.over = 0
+        else:
+            self.over = self.under = 0
+        if self.over >= self.degrade_after and self.level < len(QUALITY_LEVELS) - 1:
+            self.level += 1
+            self.over = 0
+            print(f"Frame time {self.frame_time * 1000:.1f} ms over budget, quality {self.settings['name']}")
+        elif self.under >= self.restore_after and self.level > 0:
+            self.level -= 1
+            self.under = 0
+            print(f"Frame time {self.frame_time * 1000:.1f} ms within budget, quality {self.settings['name']}")
+
+        if self.clock is not None:
+            delay = self.clock + (1.0 - self.backlog) * self.sample_dt - now
+            if delay > 0:
+                time.sleep(delay)
+        self.work = 0.0
+        self.work_start = time.perf_counter()
+
+    def status(self):
+        """Current level and smoothed frame time for display"""
+        text = f"Quality: {self.settings['name']} ({self.frame_time * 1000:.1f} / {self.budget * 1000:.1f} ms)"
+        if self.dropped:
+            text += f", {self.dropped} samples behind"
+        return text
@@ -0,0 +1,154 @@
+import numpy as np
+# Panda3D is imported where it is used, so hpr_to_quaternion is available to
+# tools without it (see PosePredictor)
+
+TRACK_WIDTH = 4096  # Texels per texture row; samples wrap onto following rows
+
+VERTEX_SHADER = """
+#version 150
+
+uniform mat4 p3d_ModelViewProjectionMatrix;
+uniform sampler2D pose_positions;
+uniform sampler2D pose_orientations;
+uniform float playback_index;
+uniform float track_row;
+uniform float track_length;
+
+in vec4 p3d_Vertex;
+in vec3 p3d_Normal;
+
+out vec3 world_normal;
+
+ivec2 texel(int index) {
+    return ivec2(index % TRACK_WIDTH, int(track_row) + index / TRACK_WIDTH);
+}
+
+vec3 rotate(vec4 q, vec3 v) {
+    return v + 2.0 * cross(q.xyz, cross(q.xyz, v) + q.w * v);
+}
+
+void main() {
+    // Interpolate between the two samples around the playback position
+    float index = clamp(playback_index, 0.0, max(track_length - 1.0, 0.0));
+    int first = int(floor(index));
+    int second = min(first + 1, int(track_length) - 1);
+    float blend = index - float(first);
+
+    vec3 position = mix(texelFetch(pose_positions, texel(first), 0).xyz,
+                        texelFetch(pose_positions, texel(second), 0).xyz, blend);
+    vec4 q0 = texelFetch(pose_orientations, texel(first), 0);
+    vec4 q1 = texelFetch(pose_orientations, texel(second), 0);
+    vec4 q = normalize(mix(q0, dot(q0, q1) < 0.0 ? -q1 : q1, blend));
+
+    world_normal = rotate(q, p3d_Normal);
+    gl_Position = p3d_ModelViewProjectionMatrix * vec4(rotate(q, p3d_Vertex.xyz) + position, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 150
+
+uniform struct {
+    vec4 diffuse;
+} p3d_Material;
+uniform vec4 p3d_ColorScale;
+uniform vec3 light_direction;
+
+in vec3 world_normal;
+
+out vec4 p3d_FragColor;
+
+void main() {
+    float light = 0.25 + 0.75 * max(dot(normalize(world_normal), -light_direction), 0.0);
+    p3d_FragColor = vec4(p3d_Material.diffuse.rgb * light, p3d_Material.diffuse.a) * p3d_ColorScale;
+}
+"""
+
+def hpr_to_quaternion(hpr):
+    """
+    Panda3D heading/pitch/roll in degrees, shape (..., 3), to (x, y, z, w)
+    quaternions rotating the same way as NodePath.setHpr()
+    """
+    half = np.radians(np.asarray(hpr, dtype=np.float64)) / 2.0
+    ch, cp, cr = np.cos(half[..., 0]), np.cos(half[..., 1]), np.cos(half[..., 2])
+    sh, sp, sr = np.sin(half[..., 0]), np.sin(half[..., 1]), np.sin(half[..., 2])
+    # q_heading(z) * q_pitch(x) * q_roll(y)
+    return np.stack([
+        ch * sp * cr - sh * cp * sr,
+        ch * cp * sr + sh * sp * cr,
+        sh * cp * cr + ch * sp * sr,
+        ch * cp * cr - sh * sp * sr,
+    ], axis=-1)
+
+
+def track_texture(name, tracks, rows):
+    """Pack (N, T, 4) float tracks into an RGBA32F texture, `rows` rows per device"""
+    from panda3d.core import Texture, SamplerState
+    count, length = tracks.shape[:2]
+    packed = np.zeros((count, rows * TRACK_WIDTH, 4), dtype=np.float32)
+    packed[:, :length] = tracks
+    texture = Texture(name)
+    texture.setup2dTexture(TRACK_WIDTH, count * rows, Texture.T_float, Texture.F_rgba32)
+    # Panda3D keeps RAM images in BGRA order
+    texture.setRamImage(np.ascontiguousarray(packed[..., [2, 1, 0, 3]]).tobytes())
+    texture.setMinfilter(SamplerState.FT_nearest)
+    texture.setMagfilter(SamplerState.FT_nearest)
+    texture.setWrapU(SamplerState.WM_clamp)
+    texture.setWrapV(SamplerState.WM_clamp)
+    texture.setKeepRamImage(False)
+    return texture
+
+
+class GPUPlayback:
+    def __init__(self, sensor_array):
+        """
+        Whole-session pose tracks on the GPU for the Panda3D player.
+
+        The position and orientation of every device at every playback index
+        are computed once (SensorArray.playback_tracks) and uploaded as float
+        textures; a vertex shader poses each device's model from a single
+        playback_index uniform, interpolating between samples. Seeking and
+        playing are one uniform update per frame, whatever the device count.
+
+        Causal filters (SensorArray.apply_filters(..., causal=True)) only
+        affect CPU stepping; the tracks use the offline arrays.
+        """
+        from panda3d.core import Shader
+        positions, hpr = sensor_array.playback_tracks()
+        self.count, self.length = positions.shape[:2]
+        self.rows = max(1, -(-self.length // TRACK_WIDTH))
+        self.track_lengths = np.clip(sensor_array.lengths - sensor_array.start_index, 1, self.length)
+
+        positions = np.concatenate([positions, np.ones(positions.shape[:2] + (1,))], axis=2)
+        self.positions = track_texture("pose-positions", positions, self.rows)
+        self.orientations = track_texture("pose-orientations", hpr_to_quaternion(hpr), self.rows)
+        self.shader = Shader.make(Shader.SL_GLSL, VERTEX_SHADER.replace("TRACK_WIDTH", str(TRACK_WIDTH)),
+                                  FRAGMENT_SHADER)
+        self.root = None
+
+    def attach(self, root, device_nodes, model, light_np=None):
+        """
+        Put an instance of `model` under every device node and pose them all
+        from the shader; `root` (e.g. render) carries the shared playback uniform
+        """
+        from panda3d.core import LVector3
+        self.root = root
+        light_direction = LVector3(0, 1, 0)
+        if light_np is not None:
+            light_direction = light_np.getQuat(root).getForward()
+        root.setShaderInput("playback_index", 0.0)
+
+        for row, node in enumerate(device_nodes):
+            node.clearTransform()
+            for child in model.getChildren():
+                child.instanceTo(node)
+            node.setShader(self.shader)
+            node.setShaderInput("pose_positions", self.positions)
+            node.setShaderInput("pose_orientations", self.orientations)
+            node.setShaderInput("track_row", float(row * self.rows))
+            node.setShaderInput("track_length", float(self.track_lengths[row]))
+            node.setShaderInput("light_direction", light_direction)
+
+    def set_index(self, index):
+        """Pose every device at playback `index`; fractional values interpolate"""
+        self.root.setShaderInput("playback_index", float(index))
@@ -0,0 +1,196 @@
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+from MotionVisualizer import LIVE_FILE, SESSION_ARRAYS
+
+# File layout: MAGIC, then chunks of CHUNK header + `count` SAMPLE records.
+# A chunk is written with a single write() and only counts once its checksum
+# matches, so readers can map the file while it grows and stop at a torn tail.
+MAGIC = b"SKILIVE1"
+CHUNK = struct.Struct("<4sII")  # CHUNK_TAG, sample count, crc32 of the samples
+CHUNK_TAG = b"CHNK"
+SAMPLE = np.dtype([(name, "<i8" if name == "time" else "<f8") for name in SESSION_ARRAYS])
+
+class LiveRecorder:
+    def __init__(self, based_path, batch_interval=0.25, fsync_interval=2.0):
+        """
+        Append-only recording of one device's live samples.
+
+        record() only queues the sample; a background thread packs everything
+        queued during `batch_interval` into one chunk and appends it with a
+        single write, so the file can be loaded (see read_live) at any moment
+        while it is being written. fsync runs every `fsync_interval` seconds
+        and on close(). If writing fails (disk full, device removed) the
+        thread stops and the error is raised from the next record() or close().
+
+        Parameters:
+        -----------
+        based_path : str
+            Device folder, e.g. data/Live/Left/; LIVE_FILE is created in it,
+            or appended to if it already holds a recording
+        batch_interval : float
+            Seconds of samples gathered per chunk; also the longest a sample
+            waits before readers can see it
+        fsync_interval : float
+            Seconds between fsyncs; samples written since the last one can be
+            lost on power failure, but not on a crash of the recording process
+        """
+        self.path = os.path.join(based_path, LIVE_FILE)
+        self.batch_interval = batch_interval
+        self.fsync_interval = fsync_interval
+        self.samples = 0
+        self.chunks = 0
+        self.error = None
+
+        os.makedirs(based_path, exist_ok=True)
+        self.file = open(self.path, "a+b", buffering=0)
+        size = self.file.seek(0, os.SEEK_END)
+        if size == 0:
+            self.file.write(MAGIC)
+        else:
+            _, end = read_records(self.path)
+            if end < size:
+                print(f"Dropping {size - end} bytes of an incomplete chunk at the end of {self.path}")
+                self.file.truncate(end)
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._writer, name="LiveRecorder", daemon=True)
+        self.thread.start()
+
+    def record(self, sample):
+        """
+        Queue one sample: SESSION_ARRAYS values in order, time in nanoseconds,
+        the rest in the units of the CSV files
+        """
+        self._check()
+        self.queue.put(sample)
+
+    def _writer(self):
+        try:
+            self._write_batches()
+        except OSError as e:
+            self.error = e
+        finally:
+            self.file.close()
+
+    def _write_batches(self):
+        last_sync = time.monotonic()
+        running = True
+        while running:
+            batch = []
+            deadline = time.monotonic() + self.batch_interval
+            while True:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(tuple(item))
+            if batch:
+                self._write_chunk(np.array(batch, dtype=SAMPLE))
+            if not running or time.monotonic() - last_sync >= self.fsync_interval:
+                os.fsync(self.file.fileno())
+                last_sync = time.monotonic()
+
+    def _write_chunk(self, samples):
+        payload = samples.tobytes()
+        self.file.write(CHUNK.pack(CHUNK_TAG, len(samples), zlib.crc32(payload)) + payload)
+        self.samples += len(samples)
+        self.chunks += 1
+
+    def close(self):
+        """Write every queued sample, fsync and close the file"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self._check()
+
+    def _check(self):
+        if self.error is not None:
+            raise OSError(f"Recording to {self.path} failed after {self.samples} samples: {self.error}") from self.error
+
+
+def read_records(path, offset=0):
+    """
+    Complete chunks of a live recording, from `offset` (a previous end, or 0)
+
+    Returns:
+    --------
+    (samples, end) : SAMPLE records, and the offset just past the last
+    complete chunk, to continue from once more has been written
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a live recording: {path}")
+        offset = max(offset, len(MAGIC))
+        f.seek(offset)
+        data = f.read()
+
+    chunks = []
+    position = 0
+    while position + CHUNK.size <= len(data):
+        tag, count, checksum = CHUNK.unpack_from(data, position)
+        payload = data[position + CHUNK.size:position + CHUNK.size + count * SAMPLE.itemsize]
+        if tag != CHUNK_TAG or len(payload) < count * SAMPLE.itemsize or zlib.crc32(payload) != checksum:
+            break  # Chunk still being written, or cut short by a crash
+        chunks.append(np.frombuffer(payload, dtype=SAMPLE))
+        position += CHUNK.size + len(payload)
+    offset += position
+    samples = np.concatenate(chunks) if chunks else np.zeros(0, dtype=SAMPLE)
+    return samples, offset
+
+
+def read_live(path):
+    """Load a live recording, as far as it has been written, into SESSION_ARRAYS arrays"""
+    samples, _ = read_records(path)
+    return {name: np.ascontiguousarray(samples[name]) for name in SESSION_ARRAYS}
+
+
+def record_session(devices, output, dt=0.01, speed=1.0):
+    """
+    Feed recorded sessions through LiveRecorder as if the samples arrived
+    live, one sample per device every dt / speed seconds; for trying live
+    capture and instant replay without the phones
+
+    Parameters:
+    -----------
+    devices : list of (name, folder)
+        Devices to replay
+    output : str
+        Session folder to record into, one sub-folder per device name
+    """
+    from SessionLoader import load_session
+
+    visualizers = load_session(devices, None, dt)
+    recorders = [LiveRecorder(os.path.join(output, name.capitalize()) + "/") for name, _ in devices]
+    length = max(visualizer.length for visualizer in visualizers)
+    period = dt / speed if speed > 0 else 0.0
+    print(f"Recording {len(recorders)} devices, {length} samples to {output}")
+    start = time.perf_counter()
+    try:
+        for index in range(length):
+            for visualizer, recorder in zip(visualizers, recorders):
+                if index < visualizer.length:
+                    recorder.record([getattr(visualizer, name)[index] for name in SESSION_ARRAYS])
+            if period:
+                delay = start + (index + 1) * period - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        errors = []
+        for recorder in recorders:
+            try:
+                recorder.close()
+            except OSError as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+    print(f"Wrote {sum(recorder.samples for recorder in recorders)} samples in "
+          f"{sum(recorder.chunks for recorder in recorders)} chunks")
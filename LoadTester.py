@@ -0,0 +1,224 @@
+import argparse
+import json
+import socket
+import threading
+import time
+import numpy as np
+from UDPHandler import UDPHandler
+
+LEG_FIELDS = ("yaw", "pitch", "roll", "acc", "gravity")
+
+class ConsumerStats:
+    def __init__(self):
+        """Arrival log of one consumer, summarized on demand"""
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.sequences = []
+            self.sent_times = []
+            self.recv_times = []
+            self.decode_errors = 0
+            self.devices = 0
+            self.started = time.time()
+
+    def add(self, sequence, sent, received, devices):
+        with self.lock:
+            self.sequences.append(sequence)
+            self.sent_times.append(sent)
+            self.recv_times.append(received)
+            self.devices = devices
+
+    def add_error(self):
+        with self.lock:
+            self.decode_errors += 1
+
+    def summary(self, reset=False):
+        """
+        Compute packets/sec, latency, jitter and loss over the collected arrivals
+
+        Returns:
+        --------
+        dict of metric name -> value, times in milliseconds
+        """
+        with self.lock:
+            sequences = np.array(self.sequences, dtype=np.int64)
+            sent = np.array(self.sent_times, dtype=np.float64)
+            received = np.array(self.recv_times, dtype=np.float64)
+            decode_errors = self.decode_errors
+            devices = self.devices
+            elapsed = time.time() - self.started
+        if reset:
+            self.reset()
+
+        stats = {"packets": len(sequences), "decode_errors": decode_errors, "devices": devices,
+                 "packets_per_sec": len(sequences) / elapsed if elapsed > 0 else 0.0}
+        if len(sequences) == 0:
+            return stats
+
+        latency = (received - sent) * 1000.0
+        unique = np.unique(sequences)
+        expected = int(sequences.max() - sequences.min() + 1)
+        stats.update({
+            "latency_mean_ms": float(latency.mean()),
+            "latency_p50_ms": float(np.percentile(latency, 50)),
+            "latency_p99_ms": float(np.percentile(latency, 99)),
+            "latency_max_ms": float(latency.max()),
+            "lost": expected - len(unique),
+            "loss_pct": 100.0 * (expected - len(unique)) / expected,
+            "duplicates": len(sequences) - len(unique),
+            "reordered": int((np.diff(sequences) < 0).sum()),
+        })
+        if len(sequences) > 1:
+            # RFC 3550 style: change in transit time between consecutive packets
+            transit_delta = np.abs(np.diff(received - sent)) * 1000.0
+            stats["jitter_ms"] = float(transit_delta.mean())
+            stats["interarrival_std_ms"] = float(np.diff(received).std() * 1000.0)
+        return stats
+
+
+class UDPConsumer:
+    def __init__(self, ip="127.0.0.1", port=5005):
+        """
+        Impersonates a Unity consumer: receives and decodes leg payloads on
+        (ip, port) in a background thread and keeps arrival statistics
+        """
+        self.ip = ip
+        self.port = port
+        self.stats = ConsumerStats()
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.socket.bind((ip, port))
+        self.socket.settimeout(0.2)
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._receive, name=f"UDPConsumer-{self.port}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        self.socket.close()
+
+    def _receive(self):
+        while self.running:
+            try:
+                payload = self.socket.recv(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            received = time.time()
+            try:
+                data = json.loads(payload)
+                legs = data["legs"]
+                for leg in legs.values():
+                    for field in LEG_FIELDS:
+                        leg[field]
+                self.stats.add(data["seq"], data["sent"], received, len(legs))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                self.stats.add_error()
+
+
+def hammer(handlers, rate, duration, devices):
+    """
+    Drive UDPHandler.sendLegData as fast as `rate` allows (0 = unthrottled)
+
+    Returns:
+    --------
+    (packets sent per handler, elapsed seconds)
+    """
+    names = [f"device{i}" for i in range(devices)]
+    rng = np.random.default_rng(0)
+    ypr = rng.uniform(-180, 180, (devices, 3))
+    acc = rng.normal(size=(devices, 3))
+    gravity = rng.normal(size=(devices, 3))
+
+    period = 1.0 / rate if rate > 0 else 0.0
+    sent = 0
+    start = time.perf_counter()
+    next_send = start
+    while True:
+        now = time.perf_counter()
+        if now - start >= duration:
+            break
+        if period:
+            if now < next_send:
+                time.sleep(min(next_send - now, 0.001))
+                continue
+            next_send += period
+        for handler in handlers:
+            handler.setDevicesData(names, ypr, acc, gravity)
+            handler.sendLegData()
+        sent += 1
+    return sent, time.perf_counter() - start
+
+
+def print_stats(port, stats):
+    line = f"[{port}] {stats['packets']} pkts, {stats['packets_per_sec']:.1f} pkt/s, {stats['devices']} devices"
+    if "latency_mean_ms" in stats:
+        line += (f", latency mean {stats['latency_mean_ms']:.3f} p50 {stats['latency_p50_ms']:.3f}"
+                 f" p99 {stats['latency_p99_ms']:.3f} max {stats['latency_max_ms']:.3f} ms"
+                 f", loss {stats['lost']} ({stats['loss_pct']:.2f}%), reordered {stats['reordered']}")
+    if "jitter_ms" in stats:
+        line += f", jitter {stats['jitter_ms']:.3f} ms"
+    if stats["decode_errors"]:
+        line += f", decode errors {stats['decode_errors']}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local UDP consumer simulator and load tester")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    listen = subparsers.add_parser("listen", help="Impersonate Unity consumers and report metrics")
+    listen.add_argument("--ip", default="127.0.0.1")
+    listen.add_argument("--port", type=int, default=5005)
+    listen.add_argument("--consumers", type=int, default=1, help="Consumers on consecutive ports")
+    listen.add_argument("--interval", type=float, default=1.0, help="Seconds between reports")
+
+    load = subparsers.add_parser("hammer", help="Drive sendLegData at a rate and measure the consumers")
+    load.add_argument("--ip", default="127.0.0.1")
+    load.add_argument("--port", type=int, default=5005)
+    load.add_argument("--consumers", type=int, default=1, help="Consumers on consecutive ports")
+    load.add_argument("--rate", type=float, default=0, help="Packets per second per consumer, 0 = unthrottled")
+    load.add_argument("--duration", type=float, default=5.0)
+    load.add_argument("--devices", type=int, default=2, help="Devices per payload")
+    args = parser.parse_args()
+
+    consumers = [UDPConsumer(args.ip, args.port + i) for i in range(args.consumers)]
+    for consumer in consumers:
+        consumer.start()
+
+    try:
+        if args.command == "listen":
+            while True:
+                time.sleep(args.interval)
+                for consumer in consumers:
+                    print_stats(consumer.port, consumer.stats.summary(reset=True))
+        else:
+            handlers = [UDPHandler(args.ip, consumer.port) for consumer in consumers]
+            sent, elapsed = hammer(handlers, args.rate, args.duration, args.devices)
+            time.sleep(0.5)  # Let the last packets arrive
+            print(f"Sent {sent} packets per consumer in {elapsed:.3f}s: {sent / elapsed:.1f} pkt/s "
+                  f"({sent * len(handlers) / elapsed:.1f} pkt/s total)")
+            for consumer in consumers:
+                stats = consumer.stats.summary()
+                stats["packets_per_sec"] = stats["packets"] / elapsed
+                print_stats(consumer.port, stats)
+            for handler in handlers:
+                handler.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for consumer in consumers:
+            consumer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+from panda3d.core import Filename, ModelRoot, NodePath
+
+CACHE_VERSION = "1"
+
+def cache_path(model_path, scale):
+    """Native .bam written next to the source model, one per scale"""
+    return f"{os.path.splitext(model_path)[0]}.scale{scale:g}.bam"
+
+
+def source_tag(model_path, scale):
+    """Identifies the source file and conversion settings a cache was built from"""
+    stat = os.stat(model_path)
+    return f"{CACHE_VERSION}:{stat.st_size}:{stat.st_mtime_ns}:{scale!r}"
+
+
+def convert_model(loader, model_path, scale=1.0):
+    """
+    Import a model (e.g. FBX) and bake it for rendering: the scale is applied
+    to the vertices and flattenStrong() collapses the node hierarchy and
+    merges geometry, so the result draws in as few calls as possible.
+    """
+    model = loader.loadModel(Filename.fromOsSpecific(model_path), noCache=True)
+    if not model:
+        return None
+    root = NodePath(ModelRoot(os.path.basename(model_path)))
+    model.reparentTo(root)
+    model.setScale(scale)
+    root.flattenStrong()
+    root.setTag("source", source_tag(model_path, scale))
+    return root
+
+
+def load_cached_model(loader, model_path, scale=1.0, use_cache=True):
+    """
+    Load `model_path` from its baked .bam cache, converting it first if the
+    cache is missing or was built from a different source file or scale.
+
+    Returns:
+    --------
+    NodePath, or None if the model could not be loaded
+    """
+    bam_path = cache_path(model_path, scale)
+    if use_cache and os.path.exists(bam_path):
+        model = loader.loadModel(Filename.fromOsSpecific(bam_path), noCache=True, okMissing=True)
+        if model and model.getTag("source") == source_tag(model_path, scale):
+            print(f"Loaded cached model {bam_path}")
+            return model
+        print(f"Model cache {bam_path} is out of date")
+
+    model = convert_model(loader, model_path, scale)
+    if model is None:
+        return None
+    if use_cache:
+        if model.writeBamFile(Filename.fromOsSpecific(bam_path)):
+            print(f"Saved model cache to {bam_path}")
+        else:
+            print(f"Could not write model cache {bam_path}")
+    return model
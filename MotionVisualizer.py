@@ -1,24 +1,41 @@
-import pandas as pd
+import os
 import numpy as np
-from OpenGL.GL import *
-from OpenGL.GLUT import *
-from OpenGL.GLU import *
-import socket
-import json
-from UDPHandler import UDPHandler
+# pandas and OpenGL are imported where they are used, so headless tools that
+# only stream from the binary session cache never pay for them
+
+CSV_FILES = ("Accelerometer.csv", "Gyroscope.csv", "Gravity.csv", "Orientation.csv")
+CACHE_FILE = "session.npz"
+LIVE_FILE = "session.live"  # Written by LiveRecorder, in place of the CSV files
+SESSION_ARRAYS = (
+    "time",
+    "accelerometer_x", "accelerometer_y", "accelerometer_z",
+    "gyro_x", "gyro_y", "gyro_z",
+    "gravity_x", "gravity_y", "gravity_z",
+    "orientation_x", "orientation_y", "orientation_z", "orientation_w",
+    "orientation_roll", "orientation_pitch", "orientation_yaw",
+)
 
 class MotionVisualizer:
-    def __init__(self, based_path, isLeftLeg, udpHandler, dt=0.01, rotation_scale=1.2, acc_scale=1.0):
+    def __init__(self, based_path, isLeftLeg, udpHandler, dt=0.01, rotation_scale=1.2, acc_scale=1.0, name=None, use_cache=True, arrays=None):
         self.dt = dt  # Time step remains unchanged
         self.based_path = based_path
         self.rotation_scale = rotation_scale  # Scale factor for yaw, pitch, and roll updates
         self.acc_scale = acc_scale            # Scale factor for accelerometer updates      # Path to gravity CSV file (mandatory)
         self.isLeftLeg = isLeftLeg
+        self.name = name if name is not None else ("left" if isLeftLeg else "right")
         self.udp_handler = udpHandler
         self.start_index = 0
         
-        # Load the data files
-        self.load_data(self.based_path + "Accelerometer.csv", self.based_path + "Gyroscope.csv", self.based_path + "Gravity.csv", self.based_path + "Orientation.csv")
+        # Load the data files, preferring an up to date binary cache,
+        # unless they were already loaded for us (see SessionLoader)
+        if arrays is not None:
+            self.set_arrays(arrays)
+        elif use_cache and self.cache_is_fresh():
+            self.load_cache()
+        elif is_live(self.based_path):
+            self.load_live()
+        else:
+            self.load_data(*[self.based_path + name for name in CSV_FILES])
         self.reset_state()
 
     def set_start_index(self, index):
@@ -31,53 +48,39 @@ class MotionVisualizer:
     def start(self):
         pass
 
-    def load_data(self, accel_path, gyro_path, gravity_path, orientation_path):
-        # Load accelerometer data
-        df_accel = pd.read_csv(accel_path)
-        
-        # Load gyroscope data
-        df_gyro = pd.read_csv(gyro_path)
-        
-        # Load gravity data (mandatory)
-        df_gravity = pd.read_csv(gravity_path)
-
-        # Load gravity data (mandatory)
-        df_orientation = pd.read_csv(orientation_path)
-
-        # Store time values
-        self.time = df_accel["time"].values
-        self.length = len(df_accel)
-
-        # Calculate and print the dt between the two initial samples (if available)
-        if len(self.time) > 1:
-            computed_dt = self.time[1] - self.time[0]
-            print("Computed dt between initial samples:", computed_dt)
-
-        # Store accelerometer values
-        self.accelerometer_x = df_accel["x"].values
-        self.accelerometer_y = df_accel["y"].values
-        self.accelerometer_z = df_accel["z"].values
-
-        # Store gyroscope values
-        self.gyro_x = df_gyro["x"].values
-        self.gyro_y = df_gyro["y"].values
-        self.gyro_z = df_gyro["z"].values
-        
-        # Store gravity values
-        self.gravity_x = df_gravity["x"].values[:self.length]
-        self.gravity_y = df_gravity["y"].values[:self.length]
-        self.gravity_z = df_gravity["z"].values[:self.length]
-        
-        self.orientation_x = df_orientation["qx"].values[:self.length]
-        self.orientation_y = df_orientation["qy"].values[:self.length]
-        self.orientation_z = df_orientation["qz"].values[:self.length]
-        self.orientation_w = df_orientation["qw"].values[:self.length]
-        self.orientation_roll = df_orientation["roll"].values[:self.length]
-        self.orientation_pitch = df_orientation["pitch"].values[:self.length]
-        self.orientation_yaw = df_orientation["yaw"].values[:self.length]
+    def cache_path(self):
+        return self.based_path + CACHE_FILE
+
+    def cache_is_fresh(self):
+        return cache_is_fresh(self.based_path)
+
+    def load_cache(self):
+        self.set_arrays(read_cache(self.cache_path()))
+        print(f"Loaded session cache from {self.cache_path()}")
+
+    def load_live(self):
+        """Load a live recording as far as it has been written, see LiveRecorder"""
+        from LiveRecorder import read_live
+        self.set_arrays(read_live(self.based_path + LIVE_FILE))
+        print(f"Loaded {self.length} live samples from {self.based_path + LIVE_FILE}")
 
+    def save_cache(self):
+        """Write the loaded arrays to the binary cache read by load_cache()"""
+        np.savez(self.cache_path(), **{name: getattr(self, name) for name in SESSION_ARRAYS})
+        print(f"Saved session cache to {self.cache_path()}")
+
+    def load_data(self, accel_path, gyro_path, gravity_path, orientation_path):
+        # Load accelerometer, gyroscope, gravity and orientation data (all mandatory)
+        self.set_arrays(session_arrays(read_csv_columns(accel_path), read_csv_columns(gyro_path),
+                                       read_csv_columns(gravity_path), read_csv_columns(orientation_path)))
         print(f"Loaded gravity data from {gravity_path}")
 
+    def set_arrays(self, arrays):
+        """Use already loaded session arrays, keyed by SESSION_ARRAYS names"""
+        for name in SESSION_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.length = len(self.time)
+
     def get_length(self):
         return len(self.accelerometer_x)
 
@@ -140,28 +143,115 @@ class MotionVisualizer:
 
         self.draw_cone_with_line()
         # Send leg data including gravity
-        self.udp_handler.setLegData(self.isLeftLeg, self.yaw, self.pitch, self.roll, 
-                                   self.acc_x, self.acc_y, self.acc_z,
-                                   self.grav_x, self.grav_y, self.grav_z)
+        self.udp_handler.setDeviceData(self.name, self.yaw, self.pitch, self.roll, 
+                                      self.acc_x, self.acc_y, self.acc_z,
+                                      self.grav_x, self.grav_y, self.grav_z, tick=index)
 
     def afterRun(self, index, pause):
-        if self.isLeftLeg:
+        # With frame assembly every device may call this; the frame is still sent once
+        if self.isLeftLeg or self.udp_handler.expected_devices is not None:
             self.udp_handler.sendLegData()
 
     def draw_cone_with_line(self):
-        glPushMatrix()
-        glTranslatef(self.pos_x, self.pos_y, self.pos_z)
-        glRotatef(self.yaw, 0, 1, 0)
-        glRotatef(self.pitch, 1, 0, 0)
-        glRotatef(self.roll, 0, 0, 1)
-
-        glColor3f(0.0, 1.0, 0.0)
-        glutSolidCone(0.2, 0.5, 20, 20)
-
-        glColor3f(1.0, 0.0, 0.0)
-        glBegin(GL_LINES)
-        glVertex3f(0, 0, 0)
-        glVertex3f(0, 0, 1)
-        glEnd()
-
-        glPopMatrix()
\ No newline at end of file
+        draw_cone_with_line(self.pos_x, self.pos_y, self.pos_z, self.yaw, self.pitch, self.roll)
+
+
+def cache_is_fresh(based_path):
+    """True if the binary cache exists and is newer than every CSV file and live recording"""
+    try:
+        cache_time = os.path.getmtime(based_path + CACHE_FILE)
+    except OSError:
+        return False
+    for name in CSV_FILES + (LIVE_FILE,):
+        path = based_path + name
+        if os.path.exists(path) and os.path.getmtime(path) > cache_time:
+            return False
+    return True
+
+
+def is_live(based_path):
+    """True if the device folder holds a live recording instead of CSV files"""
+    return os.path.exists(based_path + LIVE_FILE) and not os.path.exists(based_path + CSV_FILES[0])
+
+
+def source_tag(based_path):
+    """Sizes and modification times of a device's session files, to validate derived caches"""
+    tag = []
+    for name in CSV_FILES + (CACHE_FILE, LIVE_FILE):
+        path = based_path + name
+        if os.path.exists(path):
+            stat = os.stat(path)
+            tag.append([name, stat.st_size, stat.st_mtime_ns])
+    return tag
+
+
+def read_csv_columns(path):
+    """Parse one CSV file into a dict of column arrays (picklable, for worker processes)"""
+    import pandas as pd
+    df = pd.read_csv(path)
+    return {column: df[column].values for column in df.columns}
+
+
+def read_cache(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in SESSION_ARRAYS}
+
+
+def session_arrays(accel, gyro, gravity, orientation):
+    """Build the SESSION_ARRAYS dict from the columns of the four CSV files"""
+    arrays = {}
+
+    # Store time values
+    arrays["time"] = np.asarray(accel["time"])
+    length = len(arrays["time"])
+
+    # Calculate and print the dt between the two initial samples (if available)
+    if length > 1:
+        computed_dt = arrays["time"][1] - arrays["time"][0]
+        print("Computed dt between initial samples:", computed_dt)
+
+    # Store accelerometer values
+    arrays["accelerometer_x"] = np.asarray(accel["x"])
+    arrays["accelerometer_y"] = np.asarray(accel["y"])
+    arrays["accelerometer_z"] = np.asarray(accel["z"])
+
+    # Store gyroscope values
+    arrays["gyro_x"] = np.asarray(gyro["x"])
+    arrays["gyro_y"] = np.asarray(gyro["y"])
+    arrays["gyro_z"] = np.asarray(gyro["z"])
+
+    # Store gravity values
+    arrays["gravity_x"] = np.asarray(gravity["x"])[:length]
+    arrays["gravity_y"] = np.asarray(gravity["y"])[:length]
+    arrays["gravity_z"] = np.asarray(gravity["z"])[:length]
+
+    arrays["orientation_x"] = np.asarray(orientation["qx"])[:length]
+    arrays["orientation_y"] = np.asarray(orientation["qy"])[:length]
+    arrays["orientation_z"] = np.asarray(orientation["qz"])[:length]
+    arrays["orientation_w"] = np.asarray(orientation["qw"])[:length]
+    arrays["orientation_roll"] = np.asarray(orientation["roll"])[:length]
+    arrays["orientation_pitch"] = np.asarray(orientation["pitch"])[:length]
+    arrays["orientation_yaw"] = np.asarray(orientation["yaw"])[:length]
+    return arrays
+
+
+def draw_cone_with_line(x, y, z, yaw, pitch, roll, detail=20):
+    from OpenGL.GL import glPushMatrix, glPopMatrix, glTranslatef, glRotatef, glColor3f, glBegin, glEnd, glVertex3f, GL_LINES
+    from OpenGL.GLUT import glutSolidCone
+
+    glPushMatrix()
+    glTranslatef(x, y, z)
+    glRotatef(yaw, 0, 1, 0)
+    glRotatef(pitch, 1, 0, 0)
+    glRotatef(roll, 0, 0, 1)
+
+    glColor3f(0.0, 1.0, 0.0)
+    glutSolidCone(0.2, 0.5, detail, detail)
+
+    glColor3f(1.0, 0.0, 0.0)
+    glBegin(GL_LINES)
+    glVertex3f(0, 0, 0)
+    glVertex3f(0, 0, 1)
+    glEnd()
+
+    glPopMatrix()
\ No newline at end of file
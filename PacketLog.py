@@ -0,0 +1,172 @@
+import argparse
+import mmap
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+
+# File layout: MAGIC, then records of RECORD header + payload bytes. Every
+# recording run starts with a RUN_START record without payload, because the
+# monotonic clock of one process means nothing to the next one
+MAGIC = b"SKIUDP1\0"
+RECORD = struct.Struct("<qI")  # monotonic time in ns, payload length
+RUN_START = 0xFFFFFFFF  # Payload length of the marker record
+
+class PacketRecorder:
+    def __init__(self, path, buffer_size=1 << 20):
+        """
+        Append-only binary log of outgoing packets.
+
+        record() only stamps the packet and queues it; a background thread does
+        the buffered file writes so the send path never waits on disk. Runs
+        appended to an existing log are separated by a marker, see
+        PacketReplayer.
+
+        Parameters:
+        -----------
+        path : str
+            Log file to create (or append to if it already has the header)
+        buffer_size : int
+            Size of the file write buffer in bytes
+        """
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            # Never append records to a file that is not a packet log
+            with open(path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"Not a packet log: {path}")
+        self.file = open(path, "ab", buffering=buffer_size)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.file.write(RECORD.pack(time.monotonic_ns(), RUN_START))
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._writer, name="PacketRecorder", daemon=True)
+        self.thread.start()
+
+    def record(self, payload):
+        self.queue.put((time.monotonic_ns(), payload))
+
+    def _writer(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            timestamp, payload = item
+            self.file.write(RECORD.pack(timestamp, len(payload)))
+            self.file.write(payload)
+        self.file.close()
+
+    def close(self):
+        """Flush every queued packet and close the file"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+
+class PacketReplayer:
+    def __init__(self, path):
+        """
+        Memory-mapped reader for logs written by PacketRecorder.
+
+        Timestamps are rebased at every run marker so the runs of a log
+        follow each other without the gap (or jump back) between the
+        clocks of the processes that recorded them.
+
+        Parameters:
+        -----------
+        path : str
+            Log file to replay
+        """
+        self.path = path
+        self.file = open(path, "rb")
+        if os.fstat(self.file.fileno()).st_size < len(MAGIC):
+            self.file.close()
+            raise ValueError(f"Empty or truncated packet log: {path}")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a packet log: {path}")
+
+    def __iter__(self):
+        """Yield (timestamp_ns, payload) for every complete record, timestamps rebased across runs"""
+        offset = len(MAGIC)
+        end = len(self.map)
+        shift = 0
+        last = None
+        new_run = False
+        while offset + RECORD.size <= end:
+            timestamp, length = RECORD.unpack_from(self.map, offset)
+            offset += RECORD.size
+            if length == RUN_START:
+                new_run = True
+                continue
+            if offset + length > end:
+                break  # Truncated tail of a log that is still being written
+            if new_run and last is not None:
+                shift = last - timestamp  # Continue right where the previous run stopped
+            new_run = False
+            last = timestamp + shift
+            yield last, self.map[offset:offset + length]
+            offset += length
+
+    def replay(self, ip="127.0.0.1", port=5005, rate=1.0, loop=False):
+        """
+        Re-send the logged packets to (ip, port)
+
+        Parameters:
+        -----------
+        rate : float
+            Playback speed; 1.0 keeps the original timing, 0 sends as fast as possible
+        loop : bool
+            Start over when the end of the log is reached
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sent = 0
+        try:
+            while True:
+                first = None
+                start = time.perf_counter()
+                for timestamp, payload in self:
+                    if first is None:
+                        first = timestamp
+                    if rate > 0:
+                        delay = start + (timestamp - first) / 1e9 / rate - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                    sock.sendto(payload, (ip, port))
+                    sent += 1
+                if not loop or first is None:
+                    break
+        finally:
+            sock.close()
+        return sent
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a binary UDP packet log")
+    parser.add_argument("log", help="Log file written by UDPHandler(record_path=...)")
+    parser.add_argument("--ip", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5005)
+    parser.add_argument("--rate", type=float, default=1.0, help="Playback speed, 0 = as fast as possible")
+    parser.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        replayer = PacketReplayer(args.log)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Cannot replay {args.log}: {e}")
+    start = time.perf_counter()
+    sent = replayer.replay(args.ip, args.port, args.rate, args.loop)
+    elapsed = time.perf_counter() - start
+    replayer.close()
+    print(f"Sent {sent} packets in {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import numpy as np
+from GPUPlayback import hpr_to_quaternion
+
+# Orientation convention of the yaw/pitch/roll samples: yaw about z, then
+# pitch about x, then roll about y (intrinsic), angles in degrees; the same
+# order as Panda3D's HPR, which the Panda3D player poses the devices with
+
+def quaternion_to_ypr(q):
+    """Inverse of GPUPlayback.hpr_to_quaternion, for unit quaternions of shape (..., 4)"""
+    x, y, z, w = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    # Rotation matrix entries R01, R11, R20, R21, R22
+    r01 = 2.0 * (x * y - z * w)
+    r11 = 1.0 - 2.0 * (x * x + z * z)
+    r20 = 2.0 * (x * z - y * w)
+    r21 = 2.0 * (y * z + x * w)
+    r22 = 1.0 - 2.0 * (x * x + y * y)
+    return np.degrees(np.stack([
+        np.arctan2(-r01, r11),
+        np.arcsin(np.clip(r21, -1.0, 1.0)),
+        np.arctan2(-r20, r22),
+    ], axis=-1))
+
+
+def multiply(a, b):
+    """Hamilton product a * b of (..., 4) quaternions"""
+    ax, ay, az, aw = a[..., 0], a[..., 1], a[..., 2], a[..., 3]
+    bx, by, bz, bw = b[..., 0], b[..., 1], b[..., 2], b[..., 3]
+    return np.stack([
+        aw * bx + ax * bw + ay * bz - az * by,
+        aw * by - ax * bz + ay * bw + az * bx,
+        aw * bz + ax * by - ay * bx + az * bw,
+        aw * bw - ax * bx - ay * by - az * bz,
+    ], axis=-1)
+
+
+def conjugate(q):
+    return q * np.array([-1.0, -1.0, -1.0, 1.0])
+
+
+def rotate(q, v):
+    """Rotate (..., 3) vectors by (..., 4) unit quaternions"""
+    u = q[..., :3]
+    return v + 2.0 * np.cross(u, np.cross(u, v) + q[..., 3:] * v)
+
+
+def to_rotation_vector(q):
+    """Axis * angle (radians) of (..., 4) unit quaternions, taking the shorter way round"""
+    q = np.where(q[..., 3:] < 0, -q, q)
+    sin_half = np.linalg.norm(q[..., :3], axis=-1, keepdims=True)
+    angle = 2.0 * np.arctan2(sin_half, q[..., 3:])
+    # angle / sin(angle / 2) tends to 2 for small angles
+    scale = np.where(sin_half > 1e-12, angle / np.maximum(sin_half, 1e-12), 2.0)
+    return q[..., :3] * scale
+
+
+def from_rotation_vector(v):
+    """Unit quaternions of (..., 3) rotation vectors"""
+    angle = np.linalg.norm(v, axis=-1, keepdims=True)
+    # sin(angle / 2) / angle tends to 1 / 2 for small angles
+    scale = np.where(angle > 1e-12, np.sin(angle / 2.0) / np.maximum(angle, 1e-12), 0.5)
+    return np.concatenate([v * scale, np.cos(angle / 2.0)], axis=-1)
+
+
+class PosePredictor:
+    def __init__(self, smoothing=0.5, use_acceleration=True, max_angle=90.0, max_rate=2000.0):
+        """
+        Extrapolates device orientations ahead in time, all devices at once.
+
+        Every update() takes the next orientation sample of each device and
+        estimates its angular velocity from the rotation between consecutive
+        samples (quaternion log, world frame), and its angular acceleration
+        from the change of that velocity, both exponentially smoothed.
+        predict() rotates the latest orientation by
+        rate * t + acceleration * t^2 / 2, so poses can be sent for the moment
+        they will be shown instead of the moment they were measured.
+
+        Parameters:
+        -----------
+        smoothing : float
+            Weight of the newest sample in the velocity and acceleration
+            estimates, 1 = no smoothing; lower is steadier but lags more
+        use_acceleration : bool
+            Extrapolate with the angular acceleration too, not only the velocity
+        max_angle : float
+            Largest rotation in degrees a prediction may add
+        max_rate : float
+            Rotation rate in deg/s above which consecutive samples are taken
+            as a jump (seek, reconnect) and the estimates restart
+        """
+        self.smoothing = smoothing
+        self.use_acceleration = use_acceleration
+        self.max_angle = np.radians(max_angle)
+        self.max_rate = np.radians(max_rate)
+        self.reset()
+
+    def reset(self):
+        """Forget the motion so far, e.g. after a seek"""
+        self.q = None
+        self.rate = None  # (N, 3) world frame angular velocity in rad/s
+        self.acceleration = None  # (N, 3) in rad/s^2
+
+    def update(self, ypr, dt):
+        """
+        Add the next sample of every device
+
+        Parameters:
+        -----------
+        ypr : array of shape (N, 3)
+            Orientations in degrees
+        dt : float or array of shape (N, 1)
+            Seconds since the previous sample
+        """
+        q = hpr_to_quaternion(ypr)
+        if self.q is None or self.q.shape != q.shape:
+            self.q = q
+            self.rate = np.zeros(q.shape[:-1] + (3,))
+            self.acceleration = np.zeros_like(self.rate)
+            return
+
+        rate = to_rotation_vector(multiply(q, conjugate(self.q))) / dt
+        jump = np.linalg.norm(rate, axis=-1, keepdims=True) > self.max_rate
+        new_rate = np.where(jump, 0.0, self.rate + self.smoothing * (rate - self.rate))
+        acceleration = (new_rate - self.rate) / dt
+        self.acceleration = np.where(jump, 0.0,
+                                     self.acceleration + self.smoothing * (acceleration - self.acceleration))
+        self.rate = new_rate
+        self.q = q
+
+    def predict(self, ahead, gravity=None):
+        """
+        Orientations `ahead` seconds after the latest sample
+
+        Parameters:
+        -----------
+        ahead : float or array of shape (N, 1)
+        gravity : array of shape (N, 3), optional
+            Device frame gravity of the latest sample, turned along with the prediction
+
+        Returns:
+        --------
+        ypr of shape (N, 3) in degrees, or (ypr, gravity) if gravity is given
+        """
+        rotation = self.rate * ahead
+        if self.use_acceleration:
+            rotation = rotation + 0.5 * self.acceleration * ahead * ahead
+        angle = np.linalg.norm(rotation, axis=-1, keepdims=True)
+        rotation = rotation * np.minimum(1.0, self.max_angle / np.maximum(angle, 1e-12))
+
+        q = multiply(from_rotation_vector(rotation), self.q)
+        if gravity is None:
+            return quaternion_to_ypr(q)
+        # The world stays put: the device frame turns by the inverse rotation
+        return quaternion_to_ypr(q), rotate(multiply(conjugate(q), self.q), gravity)
@@ -0,0 +1,139 @@
+import numpy as np
+
+class SparseTable:
+    def __init__(self, values, reduce=np.maximum):
+        """
+        Idempotent range reduction (max or min) over axis 1 of an (N, T) array.
+
+        Level k holds the reduction of 2**k consecutive samples, so any range is
+        covered by two overlapping blocks and answered in O(1).
+
+        Parameters:
+        -----------
+        values : array of shape (N, T)
+        reduce : ufunc
+            np.maximum or np.minimum
+        """
+        self.reduce = reduce
+        self.levels = [np.asarray(values, dtype=np.float64)]
+        span = 1
+        while 2 * span <= self.levels[0].shape[1]:
+            previous = self.levels[-1]
+            self.levels.append(reduce(previous[:, :-span], previous[:, span:]))
+            span *= 2
+
+    def query(self, start, stop):
+        """Reduction of samples [start, stop) for every row; requires stop > start"""
+        level = int(stop - start).bit_length() - 1
+        table = self.levels[level]
+        return self.reduce(table[:, start], table[:, stop - (1 << level)])
+
+
+class RangeIndex:
+    def __init__(self, sensor_array, g_threshold=2.0):
+        """
+        Prefix-sum and sparse-table indexes over a whole session, built once,
+        answering per device statistics for any playback range in O(1).
+
+        Indexes are built on the playback timeline (after sync_times()), so
+        slider positions can be used directly.
+
+        Parameters:
+        -----------
+        sensor_array : SensorArray
+            Loaded (and optionally filtered) session
+        g_threshold : float
+            G-force above which time is counted as high load
+        """
+        self.names = list(sensor_array.names)
+        self.count = sensor_array.count
+        self.length = sensor_array.get_length()
+        self.g_threshold = g_threshold
+        self.dt = sensor_array.dt[:, 0]
+
+        # Playback index i maps to sample start_index + i on every device
+        self.valid_length = sensor_array.lengths - sensor_array.start_index
+        valid = np.arange(self.length)[None, :] < self.valid_length[:, None]
+        acc = sensor_array.aligned(sensor_array.accelerometer) * sensor_array.acc_scale[:, :, None]
+        gyro = sensor_array.aligned(sensor_array.gyro)
+        gravity = sensor_array.aligned(sensor_array.gravity)
+        yaw = sensor_array.aligned(sensor_array.orientation[:, :, :1])[:, :, 0]
+
+        # Gravity reads 1 in g units and 9.81 in m/s^2; use it to express load in g
+        gravity_norm = np.linalg.norm(gravity, axis=2)
+        g_unit = np.array([np.median(gravity_norm[i][valid[i]]) if valid[i].any() else 1.0
+                           for i in range(self.count)])
+        g_unit = np.where(g_unit > 0, g_unit, 1.0)[:, None]
+
+        acc_norm = np.linalg.norm(acc, axis=2)
+        rate = np.degrees(np.linalg.norm(gyro, axis=2))
+        g_force = np.linalg.norm(acc + gravity, axis=2) / g_unit
+
+        # Total yaw turned, ignoring the -180/180 wrap; steps into or out of padding count as 0
+        yaw_step = np.abs(np.diff(np.degrees(np.unwrap(yaw, axis=1)), axis=1, prepend=yaw[:, :1]))
+        yaw_step[:, 1:] *= valid[:, 1:] & valid[:, :-1]
+
+        self.valid = self._prefix(valid)
+        self.acc_sum = self._prefix(np.where(valid, acc_norm, 0.0))
+        self.g_sum = self._prefix(np.where(valid, g_force, 0.0))
+        self.g_excess = self._prefix(np.where(valid, np.maximum(g_force - 1.0, 0.0), 0.0))
+        self.g_high = self._prefix(valid & (g_force > g_threshold))
+        self.yaw_turned = self._prefix(yaw_step)
+        self.yaw_unwrapped = np.degrees(np.unwrap(yaw, axis=1))
+
+        self.acc_peak = SparseTable(np.where(valid, acc_norm, -np.inf))
+        self.rate_peak = SparseTable(np.where(valid, rate, -np.inf))
+        self.g_peak = SparseTable(np.where(valid, g_force, -np.inf))
+
+    @staticmethod
+    def _prefix(values):
+        """(N, T + 1) running sums with a leading zero, so sum[a:b] = prefix[b] - prefix[a]"""
+        prefix = np.zeros((values.shape[0], values.shape[1] + 1))
+        np.cumsum(values, axis=1, out=prefix[:, 1:])
+        return prefix
+
+    def query(self, start, stop):
+        """
+        Statistics of playback samples [start, stop) for every device
+
+        Returns:
+        --------
+        dict of statistic -> array of shape (N,), NaN for devices without samples in the range
+        """
+        start = max(0, min(int(start), self.length - 1))
+        stop = max(start + 1, min(int(stop), self.length))
+        samples = self.valid[:, stop] - self.valid[:, start]
+        rows = np.arange(self.count)
+        last = np.clip(np.minimum(stop, self.valid_length) - 1, 0, self.length - 1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            stats = {
+                "samples": samples,
+                "duration_s": samples * self.dt,
+                "acc_mean": (self.acc_sum[:, stop] - self.acc_sum[:, start]) / samples,
+                "acc_peak": self.acc_peak.query(start, stop),
+                "rate_peak_dps": self.rate_peak.query(start, stop),
+                "yaw_turned_deg": self.yaw_turned[:, stop] - self.yaw_turned[:, start + 1],
+                "yaw_net_deg": self.yaw_unwrapped[rows, last] - self.yaw_unwrapped[:, start],
+                "g_mean": (self.g_sum[:, stop] - self.g_sum[:, start]) / samples,
+                "g_peak": self.g_peak.query(start, stop),
+                "g_exposure_gs": (self.g_excess[:, stop] - self.g_excess[:, start]) * self.dt,
+                "g_high_s": (self.g_high[:, stop] - self.g_high[:, start]) * self.dt,
+            }
+        empty = samples == 0
+        for key, values in stats.items():
+            if key != "samples":
+                stats[key] = np.where(empty | np.isinf(values), np.nan, values)
+        return stats
+
+    def format(self, start, stop):
+        """One summary line per device for the range [start, stop)"""
+        stats = self.query(start, stop)
+        lines = []
+        for i, name in enumerate(self.names):
+            lines.append(f"{name}: {stats['duration_s'][i]:.2f}s  "
+                         f"acc mean {stats['acc_mean'][i]:.2f} peak {stats['acc_peak'][i]:.2f}  "
+                         f"rate peak {stats['rate_peak_dps'][i]:.0f} deg/s  "
+                         f"yaw {stats['yaw_turned_deg'][i]:.0f} deg (net {stats['yaw_net_deg'][i]:+.0f})  "
+                         f"g peak {stats['g_peak'][i]:.2f} exposure {stats['g_exposure_gs'][i]:.2f} g*s "
+                         f">{self.g_threshold:g}g {stats['g_high_s'][i]:.2f}s")
+        return lines
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import numpy as np
+import MotionVisualizer
+
+def run_features(sensor_array, step=1):
+    """
+    Per playback index features of a run: gyro and accelerometer magnitude,
+    averaged over the devices that have samples there and normalized to zero
+    mean and unit variance, then averaged over blocks of `step` samples
+
+    Returns:
+    --------
+    array of shape (ceil(T / step), 2)
+    """
+    valid = np.arange(sensor_array.length)[None, :] < (sensor_array.lengths - sensor_array.start_index)[:, None]
+    features = []
+    for channel in (sensor_array.gyro, sensor_array.accelerometer):
+        magnitude = np.where(valid, np.linalg.norm(sensor_array.aligned(channel), axis=2), 0.0)
+        devices = np.maximum(valid.sum(axis=0), 1)
+        features.append(magnitude.sum(axis=0) / devices)
+    features = np.stack(features, axis=1)
+    features = (features - features.mean(axis=0)) / np.where(features.std(axis=0) > 0, features.std(axis=0), 1.0)
+
+    pad = (-len(features)) % step
+    if pad:
+        features = np.concatenate([features, np.repeat(features[-1:], pad, axis=0)])
+    return features.reshape(-1, step, features.shape[1]).mean(axis=1)
+
+
+def banded_dtw(a, b, band):
+    """
+    Dynamic time warping of feature sequences a (n, k) and b (m, k), limited
+    to a band of +-`band` samples around the diagonal scaled to both lengths.
+
+    The cost matrix is filled one anti-diagonal at a time, so every cell of a
+    diagonal is computed in one vectorized step from the two diagonals before
+    it; time and memory are O((n + m) * band).
+
+    Returns:
+    --------
+    (i, j) : index arrays of the warp path from (0, 0) to (n - 1, m - 1)
+    """
+    n, m = len(a), len(b)
+    ratio = (m - 1) / max(n - 1, 1)
+    # Narrower bands leave no connected path: with `ratio` columns per row,
+    # the bands of consecutive rows only touch while ratio <= 2 * band + 1
+    band = max(float(band), ratio, 1.0)
+
+    # Cells (i, j) with |j - i * ratio| <= band on diagonal d = i + j
+    diagonals = n + m - 1
+    d = np.arange(diagonals)
+    lo = np.maximum.reduce([np.zeros(diagonals, dtype=np.int64), d - (m - 1),
+                            np.ceil((d - band) / (1.0 + ratio)).astype(np.int64)])
+    hi = np.minimum.reduce([np.full(diagonals, n - 1, dtype=np.int64), d,
+                            np.floor((d + band) / (1.0 + ratio)).astype(np.int64)])
+    offsets = np.concatenate([[0], np.cumsum(np.maximum(hi - lo + 1, 0))])
+    moves = np.zeros(offsets[-1], dtype=np.int8)  # 0 diagonal, 1 from (i - 1, j), 2 from (i, j - 1)
+
+    # The band edges move by at most one cell per diagonal, so a single inf on
+    # either side of the earlier diagonals covers every neighbour outside them
+    def previous(padded, padded_lo, first, count):
+        """Costs of cells first .. first + count - 1 of an earlier, inf padded diagonal"""
+        start = first - padded_lo + 1
+        return padded[start:start + count]
+
+    before_last, before_last_lo = np.full(4, np.inf), -1
+    last, last_lo = before_last, before_last_lo
+    for diagonal in range(diagonals):
+        first, count = lo[diagonal], hi[diagonal] - lo[diagonal] + 1
+        difference = a[first:first + count] - b[diagonal - first - count + 1:diagonal - first + 1][::-1]
+        cost = np.einsum("ij,ij->i", difference, difference)
+        if diagonal == 0:
+            current = cost
+        else:
+            candidates = np.stack([previous(before_last, before_last_lo, first - 1, count),
+                                   previous(last, last_lo, first - 1, count),
+                                   previous(last, last_lo, first, count)])
+            choice = np.argmin(candidates, axis=0)
+            moves[offsets[diagonal]:offsets[diagonal + 1]] = choice
+            current = cost + np.take_along_axis(candidates, choice[None], axis=0)[0]
+        before_last, before_last_lo = last, last_lo
+        last, last_lo = np.concatenate([[np.inf], current, [np.inf]]), first
+
+    # Walk back from the end corner
+    path_i, path_j = [n - 1], [m - 1]
+    i, j = n - 1, m - 1
+    while i > 0 or j > 0:
+        move = moves[offsets[i + j] + i - lo[i + j]]
+        if move == 0:
+            i, j = i - 1, j - 1
+        elif move == 1:
+            i -= 1
+        else:
+            j -= 1
+        path_i.append(i)
+        path_j.append(j)
+    return np.array(path_i[::-1]), np.array(path_j[::-1])
+
+
+def warp_map(path_i, path_j, step, length_a, length_b):
+    """Run B playback index for every run A playback index, from a path computed on `step` sample blocks"""
+    # Average the matched B blocks per A block, then interpolate between block centers
+    counts = np.bincount(path_i)
+    matched = np.bincount(path_i, weights=path_j) / np.maximum(counts, 1)
+    centers = np.arange(len(matched)) * step + (step - 1) / 2.0
+    mapped = np.interp(np.arange(length_a), centers, matched * step + (step - 1) / 2.0)
+    return np.clip(np.round(mapped), 0, length_b - 1).astype(np.int64)
+
+
+def load_comparison(run_a, devices, dt=0.01, filters=None, sync_method="timestamps"):
+    """
+    Load a second run from `devices` and warp it onto `run_a`
+
+    Returns:
+    --------
+    (run_b, warp) : the SensorArray of run B and the cached_warp() of run B onto run A
+    """
+    from SessionLoader import load_session
+    from SensorArray import SensorArray
+    run_b = SensorArray(load_session(devices, None, dt))
+    if filters:
+        run_b.apply_filters(filters)
+    run_b.sync_times(sync_method)
+    return run_b, cached_warp(run_a, run_b, filters=filters)
+
+
+def cached_warp(run_a, run_b, resolution=25.0, band=20.0, filters=None):
+    """
+    Time warp of run B onto run A, cached per pair of runs as dtw_<key>.npz in
+    run A's first device folder and reused until any device's files change
+
+    Parameters:
+    -----------
+    run_a, run_b : SensorArray
+        Synchronized runs (sync_times() already called)
+    resolution : float
+        Rate in Hz the features are averaged down to before warping
+    band : float
+        Seconds either run may lead or lag the other, beyond their length ratio
+    filters : dict, optional
+        Filters both runs were loaded with, part of the cache key
+
+    Returns:
+    --------
+    int array of length run_a.length: run B playback index for each run A index
+    """
+    step = max(1, int(round(1.0 / (float(run_a.dt[0, 0]) * resolution))))
+    settings = {
+        "a": [os.path.abspath(v.based_path) for v in run_a.visualizers],
+        "b": [os.path.abspath(v.based_path) for v in run_b.visualizers],
+        "start_a": run_a.start_index.tolist(), "start_b": run_b.start_index.tolist(),
+        "length_a": run_a.length, "length_b": run_b.length,
+        "resolution": resolution, "band": band,
+        "filters": {channel: [list(stage) for stage in stages] for channel, stages in sorted((filters or {}).items())},
+    }
+    key = hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+    path = os.path.join(run_a.visualizers[0].based_path, f"dtw_{key}.npz")
+    tag = json.dumps([MotionVisualizer.source_tag(v.based_path) for v in run_a.visualizers + run_b.visualizers])
+    try:
+        with np.load(path) as cached:
+            if str(cached["tag"]) == tag and len(cached["warp"]) == run_a.length:
+                return cached["warp"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    features_a = run_features(run_a, step)
+    features_b = run_features(run_b, step)
+    path_i, path_j = banded_dtw(features_a, features_b, band / (float(run_a.dt[0, 0]) * step))
+    warp = warp_map(path_i, path_j, step, run_a.length, run_b.length)
+    try:
+        np.savez(path, warp=warp, tag=tag)
+    except OSError as e:
+        print(f"Could not cache run warp in {path}: {e}")
+    return warp
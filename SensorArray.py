@@ -0,0 +1,268 @@
+import numpy as np
+import MotionVisualizer
+from MotionVisualizer import draw_cone_with_line
+from SignalFilter import FILTERABLE_CHANNELS, StreamingFilter, cached_zero_phase, zero_phase
+
+RAD_TO_DEG = 180.0 / np.pi
+
+# Stacked channel name -> MotionVisualizer arrays, one per column
+CHANNELS = {
+    "accelerometer": ["accelerometer_x", "accelerometer_y", "accelerometer_z"],
+    "gyro": ["gyro_x", "gyro_y", "gyro_z"],
+    "gravity": ["gravity_x", "gravity_y", "gravity_z"],
+    "orientation": ["orientation_yaw", "orientation_pitch", "orientation_roll"],
+    "quaternion": ["orientation_x", "orientation_y", "orientation_z", "orientation_w"],
+}
+
+class SensorArray:
+    def __init__(self, visualizers, stacked=None):
+        """
+        Manage N sensor streams (skis, boots, pelvis, riders...) as stacked arrays
+        so every device advances in a single vectorized operation per tick.
+
+        Parameters:
+        -----------
+        visualizers : list of MotionVisualizer
+            Loaded devices. Each one keeps its own name, dt and scale factors.
+        stacked : dict, optional
+            Already stacked "time" and CHANNELS arrays to use instead of
+            copying them from the visualizers (see SessionStore)
+        """
+        self.visualizers = list(visualizers)
+        self.names = [v.name for v in self.visualizers]
+        self.count = len(self.visualizers)
+
+        self.lengths = np.array([v.get_length() for v in self.visualizers], dtype=np.int64)
+        self.length = int(self.lengths.max()) if self.count else 0
+        self.start_index = np.zeros(self.count, dtype=np.int64)
+        self.clock_offsets = np.zeros(self.count, dtype=np.int64)  # Nanoseconds added to each device's clock
+
+        # Per-device constants, shaped (N, 1) to broadcast against (N, 3) state
+        self.dt = np.array([[v.dt] for v in self.visualizers], dtype=np.float64)
+        self.acc_scale = np.array([[v.acc_scale] for v in self.visualizers], dtype=np.float64)
+
+        # Stacked channels, shaped (N, T, k); shorter devices are zero padded
+        self.time = stacked["time"] if stacked is not None else self._stack_time()
+        for channel, attributes in CHANNELS.items():
+            setattr(self, channel, stacked[channel] if stacked is not None else self._stack(attributes))
+
+        self.stream_filters = {}
+        self.tracks = None  # playback_tracks(), computed on the first seek()
+        self.reset_state()
+
+    def _stack(self, attributes):
+        stacked = np.zeros((self.count, self.length, len(attributes)), dtype=np.float64)
+        for i, visualizer in enumerate(self.visualizers):
+            for k, attribute in enumerate(attributes):
+                values = getattr(visualizer, attribute)[:self.length]
+                stacked[i, :len(values), k] = values
+        return stacked
+
+    def _stack_time(self):
+        # Pad with the largest time stamp so padding never wins a time comparison
+        stacked = np.full((self.count, self.length), np.iinfo(np.int64).max, dtype=np.int64)
+        for i, visualizer in enumerate(self.visualizers):
+            values = visualizer.time[:self.length]
+            stacked[i, :len(values)] = values
+        return stacked
+
+    def get_length(self):
+        return self.length
+
+    def get_index(self, name):
+        return self.names.index(name)
+
+    def sync_times(self, method="timestamps"):
+        """
+        Align all devices to the latest first time stamp among them
+
+        Parameters:
+        -----------
+        method : str
+            "timestamps" trusts every device clock as is; "correlate" first
+            estimates each device's clock offset against the first device by
+            cross-correlating their motion (see ClockSync), cached per pair;
+            "drift" also estimates how fast each clock drifts and stretches
+            the device's samples onto the first device's clock
+        """
+        if self.count < 2:
+            return
+        self.tracks = None
+        self.clock_offsets[:] = 0
+        if method in ("correlate", "drift"):
+            from ClockSync import cached_offset, MIN_QUALITY
+            drifts = np.zeros(self.count)
+            for i in range(1, self.count):
+                estimate = cached_offset(self.visualizers[0], self.visualizers[i], drift=method == "drift")
+                print(f"{self.names[i]} clock offset: {estimate['offset_s'] * 1000:+.1f} ms "
+                      f"(drift {estimate['drift_ppm']:+.1f} ppm, correlation {estimate['quality']:.2f})")
+                if estimate["quality"] < MIN_QUALITY:
+                    print(f"{self.names[i]} motion does not match {self.names[0]}, keeping its time stamps")
+                    continue
+                self.clock_offsets[i] = int(round(estimate["offset_s"] * 1e9))
+                drifts[i] = estimate["drift_ppm"]
+            if drifts.any():
+                self._resample(1.0 + drifts * 1e-6)
+        elif method != "timestamps":
+            raise ValueError(f"Unknown time sync method '{method}'")
+
+        # Compare against the start shifted into each device's own clock; the
+        # int64 padding at the end of shorter devices must not be offset
+        start_time = (self.time[:, 0] + self.clock_offsets).max()
+        self.start_index = (self.time < (start_time - self.clock_offsets)[:, None]).sum(axis=1)
+        for name, index in zip(self.names, self.start_index):
+            print(f"{name} start index: {index}")
+
+    def _resample(self, scales):
+        """
+        Stretch device i's samples by scales[i], the seconds of first-device
+        clock per second of its own clock, so one index step is the same time
+        on every device. Samples are repeated or skipped at the nearest index
+        rather than interpolated, which keeps angles from wrapping wrongly.
+        """
+        lengths = np.where(self.lengths > 0, np.floor((self.lengths - 1) * scales).astype(np.int64) + 1, 0)
+        length = int(lengths.max())
+        sources = [np.minimum(np.round(np.arange(lengths[i]) / scales[i]).astype(np.int64), self.lengths[i] - 1)
+                   for i in range(self.count)]
+        for channel in ("time",) + tuple(CHANNELS):
+            # New arrays, the stacks may be read-only views into a shared session
+            old = getattr(self, channel)
+            if channel == "time":
+                new = np.full((self.count, length), np.iinfo(np.int64).max, dtype=np.int64)
+            else:
+                new = np.zeros((self.count, length) + old.shape[2:], dtype=old.dtype)
+            for i, source in enumerate(sources):
+                new[i, :len(source)] = old[i, source]
+            setattr(self, channel, new)
+        for name, old_length, new_length in zip(self.names, self.lengths, lengths):
+            if new_length != old_length:
+                print(f"{name} resampled for clock drift: {old_length} -> {new_length} samples")
+        self.lengths = lengths
+        self.length = length
+
+    def aligned(self, channel):
+        """Shift a stacked (N, T, k) channel so column i is playback index i for every device"""
+        shifted = np.zeros_like(channel)
+        for i, start in enumerate(self.start_index):
+            shifted[i, :self.length - start] = channel[i, start:]
+        return shifted
+
+    def apply_filters(self, filters, causal=False, use_cache=True):
+        """
+        Filter stacked channels, e.g. {"accelerometer": [("median", 5), ("lowpass", 8.0)]}
+        (see SignalFilter.parse_filters).
+
+        Offline (default) every device's whole recording is filtered zero-phase
+        once, with the result cached next to the session files. With `causal`
+        the same filters run sample by sample in step() instead, as they would
+        on live input.
+        """
+        for channel in filters:
+            if channel not in FILTERABLE_CHANNELS:
+                raise ValueError(f"Channel '{channel}' can not be filtered, expected one of {FILTERABLE_CHANNELS}")
+
+        self.tracks = None
+        if causal:
+            self.stream_filters = {channel: StreamingFilter(stages, 1.0 / self.dt, (self.count, 3))
+                                   for channel, stages in filters.items() if stages}
+            return
+
+        for channel, stages in filters.items():
+            if not stages:
+                continue
+            # Copy, the stacks may be read-only views into a shared session
+            filtered = np.array(getattr(self, channel))
+            for i, visualizer in enumerate(self.visualizers):
+                length = self.lengths[i]
+                samples = filtered[i, :length]
+                if use_cache:
+                    sources = [visualizer.based_path + name for name in MotionVisualizer.CSV_FILES]
+                    sources.append(visualizer.cache_path())
+                    filtered[i, :length] = cached_zero_phase(visualizer.based_path, channel, samples, stages,
+                                                             1.0 / visualizer.dt, sources)
+                else:
+                    filtered[i, :length] = zero_phase(samples, stages, 1.0 / visualizer.dt)
+            setattr(self, channel, filtered)
+            print(f"Filtered {channel}: {', '.join(f'{kind} {parameter}' for kind, parameter in stages)}")
+
+    def reset_state(self):
+        for stream_filter in self.stream_filters.values():
+            stream_filter.reset()
+        self.pos = np.zeros((self.count, 3))
+        self.vel = np.zeros((self.count, 3))
+        self.ypr = np.zeros((self.count, 3))   # yaw, pitch, roll in degrees
+        self.acc = np.zeros((self.count, 3))
+        self.rate = np.zeros((self.count, 3))  # gyroscope in rad/s
+        self.grav = np.zeros((self.count, 3))
+
+    def step(self, index, pause):
+        """Advance every device to sample `index` in one vectorized update"""
+        if pause or self.count == 0:
+            return
+
+        curr_index = self.start_index + index
+        active = (curr_index < self.lengths)[:, None]
+        if not active.any():
+            return
+
+        rows = np.arange(self.count)
+        safe_index = np.minimum(curr_index, self.length - 1)
+
+        samples = {channel: getattr(self, channel)[rows, safe_index] for channel in FILTERABLE_CHANNELS}
+        for channel, stream_filter in self.stream_filters.items():
+            samples[channel] = stream_filter.update(samples[channel])
+
+        self.acc = np.where(active, samples["accelerometer"] * self.acc_scale, self.acc)
+        self.rate = np.where(active, samples["gyro"], self.rate)
+        self.grav = np.where(active, samples["gravity"], self.grav)
+
+        # Integrate velocity and position with the scaled acceleration
+        self.vel = np.where(active, self.vel + self.acc * self.dt, self.vel)
+        self.pos = np.where(active, self.pos + self.vel * self.dt, self.pos)
+
+        # Orientation comes straight from the Orientation data
+        self.ypr = np.where(active, self.orientation[rows, safe_index] * RAD_TO_DEG, self.ypr)
+
+    def playback_tracks(self):
+        """
+        Position and yaw/pitch/roll of every device at every playback index,
+        as step() would leave them when playing from a reset state
+
+        Returns:
+        --------
+        (positions, ypr) : arrays of shape (N, T, 3), ypr in degrees
+        """
+        acc = self.aligned(self.accelerometer) * self.acc_scale[:, :, None]
+        ypr = self.aligned(self.orientation) * RAD_TO_DEG
+
+        # Devices hold their last state once their samples run out
+        valid_length = self.lengths - self.start_index
+        active = (np.arange(self.length)[None, :] < valid_length[:, None])[:, :, None]
+        dt = self.dt[:, :, None]
+        vel = np.cumsum(np.where(active, acc * dt, 0.0), axis=1)
+        positions = np.cumsum(np.where(active, vel * dt, 0.0), axis=1)
+
+        last = np.clip(valid_length - 1, 0, self.length - 1)
+        rows = np.arange(self.count)
+        ypr = np.where(active, ypr, ypr[rows, last][:, None, :])
+        ypr[valid_length <= 0] = 0.0
+        return positions, ypr
+
+    def seek(self, index):
+        """Jump pos and ypr to the state step() reaches at playback `index` when playing from the start"""
+        if self.tracks is None:
+            self.tracks = self.playback_tracks()
+        positions, ypr = self.tracks
+        index = min(max(int(index), 0), self.length - 1)
+        self.pos = positions[:, index].copy()
+        self.ypr = ypr[:, index].copy()
+
+    def draw(self, detail=20):
+        """Draw a cone per device, with `detail` slices and stacks"""
+        for i in range(self.count):
+            draw_cone_with_line(*self.pos[i], *self.ypr[i], detail)
+
+    def publish(self, udp_handler, tick=None):
+        """Send the current state of all devices as one per-device payload"""
+        udp_handler.setDevicesData(self.names, self.ypr, self.acc, self.grav, tick=tick)
+        udp_handler.sendLegData()
@@ -0,0 +1,116 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import MotionVisualizer
+from LiveRecorder import read_live
+
+class SessionLoadError(Exception):
+    """Raised with every missing or unreadable file of a session at once"""
+
+
+class SessionLoader:
+    def __init__(self, devices, udp_handler, dt=0.01, use_cache=True, max_workers=None, use_processes=False, progress=None):
+        """
+        Load all files of all devices of a session in parallel.
+
+        Every CSV (or session cache) of every device is a separate task in one
+        pool, so parsing time is bounded by the largest file rather than the
+        sum of all of them. Callers can poll done()/completed while the files
+        stream in, e.g. to keep a window responsive.
+
+        Parameters:
+        -----------
+        devices : list of (name, folder)
+            Devices to load, in the order the visualizers are returned
+        udp_handler : UDPHandler
+            Passed on to every MotionVisualizer
+        dt : float
+            Sample period passed on to every MotionVisualizer
+        use_cache : bool
+            Read an up to date session.npz instead of the CSV files or live recording
+        max_workers : int, optional
+            Pool size, defaults to the executor's default
+        use_processes : bool
+            Parse in worker processes instead of threads
+        progress : callable, optional
+            Called as progress(completed, total, path) after every file
+        """
+        self.devices = list(devices)
+        self.udp_handler = udp_handler
+        self.dt = dt
+        self.use_cache = use_cache
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.progress = progress
+        self.executor = None
+        self.futures = []
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.total = 0
+
+    def _tasks(self):
+        """(device index, path, function) for every file to read"""
+        tasks = []
+        for index, (name, path) in enumerate(self.devices):
+            if self.use_cache and MotionVisualizer.cache_is_fresh(path):
+                tasks.append((index, path + MotionVisualizer.CACHE_FILE, MotionVisualizer.read_cache))
+            elif MotionVisualizer.is_live(path):
+                tasks.append((index, path + MotionVisualizer.LIVE_FILE, read_live))
+            else:
+                for file_name in MotionVisualizer.CSV_FILES:
+                    tasks.append((index, path + file_name, MotionVisualizer.read_csv_columns))
+        return tasks
+
+    def start(self):
+        """Check that every file exists and submit them all; returns self"""
+        tasks = self._tasks()
+        missing = [path for _, path, _ in tasks if not os.path.exists(path)]
+        if missing:
+            raise SessionLoadError("Missing session files:\n  " + "\n  ".join(missing))
+
+        executor_type = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        self.executor = executor_type(max_workers=self.max_workers)
+        self.total = len(tasks)
+        for index, path, function in tasks:
+            future = self.executor.submit(function, path)
+            future.add_done_callback(lambda _, path=path: self._on_done(path))
+            self.futures.append((index, path, future))
+        return self
+
+    def _on_done(self, path):
+        with self.lock:
+            self.completed += 1
+            completed = self.completed
+        if self.progress is not None:
+            self.progress(completed, self.total, path)
+
+    def done(self):
+        return all(future.done() for _, _, future in self.futures)
+
+    def result(self):
+        """Wait for every file and build one MotionVisualizer per device"""
+        results = [{} for _ in self.devices]
+        errors = []
+        for index, path, future in self.futures:
+            try:
+                results[index][path] = future.result()
+            except Exception as e:
+                errors.append(f"{path}: {e}")
+        self.executor.shutdown()
+        if errors:
+            raise SessionLoadError("Failed to load session files:\n  " + "\n  ".join(errors))
+
+        visualizers = []
+        for (name, path), files in zip(self.devices, results):
+            if len(files) == 1:
+                arrays = next(iter(files.values()))  # Session cache or live recording
+            else:
+                arrays = MotionVisualizer.session_arrays(*[files[path + file_name] for file_name in MotionVisualizer.CSV_FILES])
+            visualizers.append(MotionVisualizer.MotionVisualizer(path, name == "left", self.udp_handler, self.dt,
+                                                                 name=name, arrays=arrays))
+        return visualizers
+
+
+def load_session(devices, udp_handler, dt=0.01, use_cache=True, **kwargs):
+    """Blocking convenience wrapper: load all devices in parallel and return the visualizers"""
+    return SessionLoader(devices, udp_handler, dt, use_cache, **kwargs).start().result()
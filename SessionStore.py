@@ -0,0 +1,232 @@
+import atexit
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+import MotionVisualizer
+from SensorArray import SensorArray, CHANNELS
+from SessionLoader import SessionLoadError
+
+ALIGNMENT = 64
+
+class SharedSessionError(SessionLoadError):
+    """Raised when a shared session name is in use by processes playing a different session"""
+
+
+def default_directory():
+    """RAM-backed /dev/shm where available, the temp folder otherwise"""
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm/skisim_sessions"
+    return os.path.join(tempfile.gettempdir(), "skisim_sessions")
+
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        return True  # No cheap check without extra dependencies; entries go on close()
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _locked(path):
+    """Exclusive inter-process lock on `path`"""
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class SessionStore:
+    def __init__(self, name, directory=None):
+        """
+        A loaded session shared read-only between local processes by name.
+
+        The stacked SensorArray channels of all devices live in one memory
+        mapped file (in /dev/shm where available), so every attached process
+        maps the same physical pages instead of parsing and holding its own
+        copy. Attached processes are reference counted by PID; the last one
+        to close() removes the files.
+
+        Use open_shared_session() rather than calling this directly.
+        """
+        self.name = name
+        self.directory = directory or default_directory()
+        base = os.path.join(self.directory, name)
+        self.data_path = base + ".data"
+        self.manifest_path = base + ".json"
+        self.refs_path = base + ".refs"
+        self.lock_path = base + ".lock"
+        self.manifest = None
+        self.stacked = None
+        self.attached = False
+
+    def exists(self):
+        return os.path.exists(self.manifest_path)
+
+    def _read_refs(self):
+        try:
+            with open(self.refs_path) as f:
+                pids = json.load(f)
+        except (OSError, ValueError):
+            pids = []
+        return [pid for pid in pids if _pid_alive(pid)]
+
+    def _write_refs(self, pids):
+        with open(self.refs_path, "w") as f:
+            json.dump(pids, f)
+
+    def _write(self, sensor_array, devices):
+        """Copy the stacked channels of `sensor_array` into the data file"""
+        arrays = {"time": sensor_array.time}
+        arrays.update({channel: getattr(sensor_array, channel) for channel in CHANNELS})
+
+        layout = {}
+        offset = 0
+        for key, array in arrays.items():
+            layout[key] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+        data = np.memmap(self.data_path, dtype=np.uint8, mode="w+", shape=(max(offset, 1),))
+        for key, array in arrays.items():
+            start = layout[key]["offset"]
+            data[start:start + array.nbytes] = np.ascontiguousarray(array).view(np.uint8).reshape(-1)
+        data.flush()
+        del data
+
+        manifest = {
+            "devices": [{"name": name, "path": path} for name, path in devices],
+            "tags": [MotionVisualizer.source_tag(path) for name, path in devices],
+            "lengths": sensor_array.lengths.tolist(),
+            "arrays": layout,
+        }
+        # Publish the manifest last and atomically; it marks the store as ready
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def _map(self):
+        with open(self.manifest_path) as f:
+            self.manifest = json.load(f)
+        data = np.memmap(self.data_path, dtype=np.uint8, mode="r")
+        self.stacked = {}
+        for key, entry in self.manifest["arrays"].items():
+            dtype = np.dtype(entry["dtype"])
+            count = int(np.prod(entry["shape"]))
+            start = entry["offset"]
+            view = data[start:start + count * dtype.itemsize].view(dtype)
+            self.stacked[key] = view.reshape(entry["shape"])
+
+    def _matches(self, devices):
+        """True if the store holds `devices` as their files are now"""
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        stored = [(device["name"], os.path.abspath(device["path"])) for device in manifest["devices"]]
+        requested = [(name, os.path.abspath(path)) for name, path in devices]
+        if stored != requested:
+            return False
+        return manifest.get("tags") == [MotionVisualizer.source_tag(path) for name, path in devices]
+
+    def _remove_files(self):
+        for path in (self.manifest_path, self.data_path, self.refs_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Still mapped elsewhere on Windows; removed by the next owner
+
+    def attach(self, devices=None, udp_handler=None, dt=0.01):
+        """
+        Attach to the store, creating it from `devices` if it does not exist yet.
+        Creation happens under the store lock, so concurrent processes wait for
+        the first one to load the session and then share it.
+
+        A store holding other devices, or files that changed since it was
+        written, is rebuilt when no live process uses it (e.g. left behind by
+        a crash); while one does, SharedSessionError is raised.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with _locked(self.lock_path):
+            if self.exists() and devices is not None and not self._matches(devices):
+                pids = self._read_refs()
+                if pids:
+                    raise SharedSessionError(
+                        f"Shared session '{self.name}' holds a different session or older files and is in use "
+                        f"by process {', '.join(str(pid) for pid in pids)}; choose another --shared name")
+                print(f"Shared session '{self.name}' is out of date, rebuilding it")
+                self._remove_files()
+            if not self.exists():
+                if devices is None:
+                    raise FileNotFoundError(f"No shared session named '{self.name}'")
+                from SessionLoader import load_session
+                visualizers = load_session(devices, udp_handler, dt)
+                sensor_array = SensorArray(visualizers)
+                self._write(sensor_array, [(v.name, v.based_path) for v in visualizers])
+                print(f"Created shared session '{self.name}' in {self.directory}")
+            self._map()
+            pids = self._read_refs()
+            pids.append(os.getpid())
+            self._write_refs(pids)
+        self.attached = True
+        atexit.register(self.close)
+        return self
+
+    def visualizers(self, udp_handler, dt=0.01):
+        """MotionVisualizers whose arrays are read-only views into the store"""
+        visualizers = []
+        for i, (device, length) in enumerate(zip(self.manifest["devices"], self.manifest["lengths"])):
+            arrays = {"time": self.stacked["time"][i, :length]}
+            for channel, attributes in CHANNELS.items():
+                for k, attribute in enumerate(attributes):
+                    arrays[attribute] = self.stacked[channel][i, :length, k]
+            visualizers.append(MotionVisualizer.MotionVisualizer(
+                device["path"], device["name"] == "left", udp_handler, dt, name=device["name"], arrays=arrays))
+        return visualizers
+
+    def close(self):
+        """Detach; the last process to detach removes the shared files"""
+        if not self.attached:
+            return
+        self.attached = False
+        self.stacked = None
+        with _locked(self.lock_path):
+            pids = [pid for pid in self._read_refs() if pid != os.getpid()]
+            if pids:
+                self._write_refs(pids)
+                return
+            self._remove_files()
+        print(f"Removed shared session '{self.name}'")
+
+
+def open_shared_session(name, devices, udp_handler, dt=0.01, directory=None):
+    """
+    Attach to (or create) the shared session `name` and build its devices
+
+    Returns:
+    --------
+    (store, visualizers, sensor_array) where the SensorArray reuses the shared stacks
+    """
+    store = SessionStore(name, directory).attach(devices, udp_handler, dt)
+    visualizers = store.visualizers(udp_handler, dt)
+    return store, visualizers, SensorArray(visualizers, stacked=store.stacked)
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+FILTER_KINDS = ("lowpass", "highpass", "median")
+FILTERABLE_CHANNELS = ("accelerometer", "gyro", "gravity")  # Angles would need wrap-around aware filters
+BUTTERWORTH_Q = 1.0 / np.sqrt(2.0)
+DECAY_TOLERANCE = 1e-9
+
+def parse_filter(spec):
+    """
+    Parse one filter stage, e.g. "lowpass:8" (Hz), "highpass:0.3" (Hz) or "median:5" (samples)
+
+    Returns:
+    --------
+    (kind, parameter)
+    """
+    kind, sep, value = spec.strip().partition(":")
+    if kind not in FILTER_KINDS or not sep:
+        raise ValueError(f"Invalid filter '{spec}', expected one of {', '.join(k + ':VALUE' for k in FILTER_KINDS)}")
+    if kind == "median":
+        width = int(value)
+        if width < 1 or width % 2 == 0:
+            raise ValueError(f"Median width must be a positive odd number of samples, got '{value}'")
+        return kind, width
+    cutoff = float(value)
+    if cutoff <= 0:
+        raise ValueError(f"Cutoff frequency must be positive, got '{value}'")
+    return kind, cutoff
+
+
+def parse_filters(specs):
+    """
+    Parse per channel filter chains, e.g. ["accelerometer=median:5,lowpass:8", "gyro=lowpass:12"]
+
+    Returns:
+    --------
+    dict of channel -> list of (kind, parameter), applied in order
+    """
+    filters = {}
+    for spec in specs or ():
+        channel, sep, chain = spec.partition("=")
+        if not sep or channel not in FILTERABLE_CHANNELS:
+            raise ValueError(f"Invalid filter chain '{spec}', expected CHANNEL=STAGE[,STAGE...] "
+                             f"with CHANNEL one of {', '.join(FILTERABLE_CHANNELS)}")
+        filters[channel] = [parse_filter(stage) for stage in chain.split(",") if stage.strip()]
+    return filters
+
+
+def biquad(kind, cutoff, fs):
+    """
+    Second order Butterworth low/high-pass coefficients (audio EQ cookbook)
+
+    `fs` may be an array, e.g. (N, 1) per device sample rates; the returned
+    coefficients broadcast the same way.
+
+    Returns:
+    --------
+    (b0, b1, b2, a1, a2), normalized so a0 == 1
+    """
+    fs = np.asarray(fs, dtype=np.float64)
+    # Keep the cutoff just below Nyquist so the filter stays stable
+    w0 = 2.0 * np.pi * np.minimum(cutoff, 0.49 * fs) / fs
+    cos_w0 = np.cos(w0)
+    alpha = np.sin(w0) / (2.0 * BUTTERWORTH_Q)
+    a0 = 1.0 + alpha
+    if kind == "lowpass":
+        b1 = (1.0 - cos_w0) / a0
+        b0 = b2 = b1 / 2.0
+    else:
+        b1 = -(1.0 + cos_w0) / a0
+        b0 = b2 = -b1 / 2.0
+    return b0, b1, b2, -2.0 * cos_w0 / a0, (1.0 - alpha) / a0
+
+
+def decay_length(coefficients):
+    """Samples until the impulse response of a biquad drops below DECAY_TOLERANCE"""
+    a1, a2 = float(coefficients[3]), float(coefficients[4])
+    radius = np.abs(np.roots([1.0, a1, a2])).max()
+    if radius <= 0.0:
+        return 2
+    return int(np.ceil(np.log(DECAY_TOLERANCE) / np.log(radius))) + 2
+
+
+def zero_phase_response(coefficients, size):
+    """|H|^2 on the rfft grid of `size` points: the biquad run forward and then backward"""
+    b0, b1, b2, a1, a2 = coefficients
+    z = np.exp(-1j * np.pi * np.arange(size // 2 + 1) / (size // 2))
+    response = (b0 + b1 * z + b2 * z * z) / (1.0 + a1 * z + a2 * z * z)
+    return np.abs(response) ** 2
+
+
+def median_filter(samples, width):
+    """Centered running median over axis 0, edges padded with the edge values"""
+    half = width // 2
+    padded = np.pad(samples, [(half, half)] + [(0, 0)] * (samples.ndim - 1), mode="edge")
+    return np.median(sliding_window_view(padded, width, axis=0), axis=-1)
+
+
+def zero_phase(samples, stages, fs):
+    """
+    Filter a whole recording offline without phase lag.
+
+    IIR stages are applied as the forward-backward (filtfilt) response of the
+    same biquads StreamingFilter runs causally, in one FFT per stage over all
+    columns. The ends are extended by odd reflection over the filter's decay
+    length, so no ringing or wrap-around leaks in from the edges.
+
+    Parameters:
+    -----------
+    samples : array of shape (T,) or (T, k)
+    stages : list of (kind, parameter)
+    fs : float
+        Sample rate in Hz
+    """
+    filtered = np.asarray(samples, dtype=np.float64)
+    length = len(filtered)
+    if length < 2:
+        return filtered.copy()
+    for kind, parameter in stages:
+        if kind == "median":
+            filtered = median_filter(filtered, parameter)
+            continue
+
+        coefficients = biquad(kind, parameter, fs)
+        pad = min(decay_length(coefficients), length - 1)
+        head = 2.0 * filtered[:1] - filtered[pad:0:-1]
+        tail = 2.0 * filtered[-1:] - filtered[-2:-pad - 2:-1]
+        extended = np.concatenate([head, filtered, tail])
+
+        size = 1 << int(np.ceil(np.log2(len(extended))))
+        spectrum = np.fft.rfft(extended, size, axis=0)
+        response = zero_phase_response(coefficients, size).reshape((-1,) + (1,) * (filtered.ndim - 1))
+        filtered = np.fft.irfft(spectrum * response, size, axis=0)[pad:pad + length]
+    return filtered
+
+
+def filter_key(stages, fs):
+    """Stable short hash of a filter chain and sample rate, used to name cache files"""
+    text = json.dumps([[kind, parameter] for kind, parameter in stages] + [float(fs)])
+    return hashlib.sha1(text.encode()).hexdigest()[:12]
+
+
+def cached_zero_phase(based_path, channel, samples, stages, fs, sources=()):
+    """
+    zero_phase() with the result cached in `based_path` as filtered_<channel>_<key>.npy.
+
+    The cache is reused while it is newer than every file in `sources`
+    (the session CSVs and binary cache) and the sample count matches.
+    """
+    path = os.path.join(based_path, f"filtered_{channel}_{filter_key(stages, fs)}.npy")
+    try:
+        cache_time = os.path.getmtime(path)
+        if all(not os.path.exists(source) or os.path.getmtime(source) <= cache_time for source in sources):
+            cached = np.load(path)
+            if cached.shape == np.shape(samples):
+                return cached
+    except (OSError, ValueError):
+        pass
+
+    filtered = zero_phase(samples, stages, fs)
+    try:
+        np.save(path, filtered)
+    except OSError as e:
+        print(f"Could not cache filtered {channel} in {path}: {e}")
+    return filtered
+
+
+class StreamingFilter:
+    def __init__(self, stages, fs, shape):
+        """
+        Causal counterpart of zero_phase() for live samples: the same biquads
+        (direct form II transposed) and a running median over the last samples,
+        each costing O(1) per sample and vectorized over all devices and axes.
+
+        Parameters:
+        -----------
+        stages : list of (kind, parameter)
+        fs : float or array broadcasting against `shape`, e.g. (N, 1)
+            Sample rate in Hz
+        shape : tuple
+            Shape of one sample, e.g. (N, 3) for N devices
+        """
+        self.stages = list(stages)
+        self.shape = tuple(shape)
+        self.coefficients = [biquad(kind, parameter, fs) if kind != "median" else None
+                             for kind, parameter in self.stages]
+        self.reset()
+
+    def reset(self):
+        self.primed = False
+        self.states = []
+        for kind, parameter in self.stages:
+            if kind == "median":
+                self.states.append(np.zeros((parameter,) + self.shape))
+            else:
+                self.states.append([np.zeros(self.shape), np.zeros(self.shape)])
+        self.ring_index = 0
+
+    def _prime(self, sample):
+        """Start from steady state at the first sample instead of ringing up from zero"""
+        value = sample
+        for (kind, parameter), coefficients, state in zip(self.stages, self.coefficients, self.states):
+            if kind == "median":
+                state[:] = value
+                continue
+            b0, b1, b2, a1, a2 = coefficients
+            gain = (b0 + b1 + b2) / (1.0 + a1 + a2)  # 1 for low-pass, 0 for high-pass
+            output = value * gain
+            state[1][:] = b2 * value - a2 * output
+            state[0][:] = b1 * value - a1 * output + state[1]
+            value = output
+        self.primed = True
+
+    def update(self, sample):
+        """Filter one sample of shape `shape` and return the filtered sample"""
+        value = np.asarray(sample, dtype=np.float64)
+        if not self.primed:
+            self._prime(value)
+        for (kind, parameter), coefficients, state in zip(self.stages, self.coefficients, self.states):
+            if kind == "median":
+                state[self.ring_index % parameter] = value
+                value = np.median(state, axis=0)
+                continue
+            b0, b1, b2, a1, a2 = coefficients
+            z1, z2 = state
+            output = b0 * value + z1
+            state[0] = b1 * value - a1 * output + z2
+            state[1] = b2 * value - a2 * output
+            value = output
+        self.ring_index += 1
+        return value
@@ -0,0 +1,172 @@
+import ctypes
+import numpy as np
+# OpenGL is imported where it is used, so the Panda3D player can share the
+# ring buffer below without pulling in PyOpenGL
+
+# (label, plot range) for each lane; every lane shows its x, y, z axes
+LANES = [("acc", 20.0), ("gyro", 10.0), ("gravity", 10.0)]
+AXIS_COLORS = [(1.0, 0.35, 0.35), (0.35, 1.0, 0.35), (0.4, 0.6, 1.0)]
+
+class SignalRing:
+    def __init__(self, window=500):
+        """
+        Fixed-size history of the plotted samples, scaled to -1 .. 1 per lane.
+
+        Samples are appended to a buffer of twice the window; when it is full
+        the last window is moved back to the start, once every window samples.
+        The visible window is therefore always the contiguous rows
+        start .. end - 1, and everything pushed since the last take_dirty()
+        is one contiguous range of rows, so the renderers upload it in one go
+        per frame.
+
+        Parameters:
+        -----------
+        window : int
+            Number of samples shown
+        """
+        self.window = window
+        self.capacity = 2 * window
+        self.lines = len(LANES) * 3
+        self.scale = np.repeat([1.0 / plot_range for label, plot_range in LANES], 3).astype(np.float32)
+        self.values = np.zeros((self.capacity, self.lines), dtype=np.float32)
+        self.clear()
+
+    @property
+    def start(self):
+        """First row of the visible window"""
+        return self.end - self.window
+
+    def clear(self):
+        self.values[:] = 0.0
+        self.end = self.window
+        self.dirty = (0, self.capacity)
+
+    def push(self, acc, gyro, gravity):
+        """Append one sample of each channel (3 values each)"""
+        if self.end == self.capacity:
+            self.values[:self.window - 1] = self.values[self.end - self.window + 1:self.end]
+            self.end = self.window - 1
+            self.dirty = (0, self.end)
+        self.values[self.end] = np.concatenate([acc, gyro, gravity]) * self.scale
+        self.end += 1
+        self.dirty = (min(self.dirty[0], self.end - 1), self.end) if self.dirty else (self.end - 1, self.end)
+
+    def take_dirty(self):
+        """Rows (first, stop) changed since the last call, or None"""
+        dirty, self.dirty = self.dirty, None
+        return dirty
+
+
+class SignalPlot:
+    def __init__(self, window=500, x=10, y=60, width=300, lane_height=50):
+        """
+        Scrolling accel/gyro/gravity plot backed by a fixed-size vertex buffer.
+
+        The vertex buffer mirrors a SignalRing, so the visible window is one
+        contiguous range that a single line strip per axis can draw. push()
+        only touches the ring; draw() uploads the rows pushed since the last
+        frame with one sub-buffer update.
+
+        Parameters:
+        -----------
+        window : int
+            Number of samples shown
+        x, y : int
+            Bottom-left corner of the panel in window pixels
+        width, lane_height : int
+            Panel width and height of each lane in pixels
+        """
+        self.ring = SignalRing(window)
+        self.window = window
+        self.x = x
+        self.y = y
+        self.width = width
+        self.lane_height = lane_height
+        self.vbo = None
+
+        # Row-major layout: one (x, y) vertex per line for each row
+        self.vertices = np.zeros((self.ring.capacity, self.ring.lines, 2), dtype=np.float32)
+        self.vertices[:, :, 0] = np.arange(self.ring.capacity, dtype=np.float32)[:, None]
+        self.row_bytes = self.ring.lines * 2 * 4
+
+    def _create_buffer(self):
+        from OpenGL.GL import glGenBuffers, glBindBuffer, glBufferData, GL_ARRAY_BUFFER, GL_DYNAMIC_DRAW
+
+        # Created lazily because it needs a current GL context
+        self.vbo = glGenBuffers(1)
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _upload(self):
+        """Copy the rows pushed since the last frame into the vertex buffer"""
+        from OpenGL.GL import glBufferSubData, GL_ARRAY_BUFFER
+
+        dirty = self.ring.take_dirty()
+        if dirty is None:
+            return
+        first, stop = dirty
+        self.vertices[first:stop, :, 1] = self.ring.values[first:stop]
+        glBufferSubData(GL_ARRAY_BUFFER, first * self.row_bytes, (stop - first) * self.row_bytes,
+                        self.vertices[first:stop])
+
+    def clear(self):
+        self.ring.clear()
+
+    def push(self, acc, gyro, gravity):
+        """Append one sample of each channel (3 values each) to the ring"""
+        self.ring.push(acc, gyro, gravity)
+
+    def draw(self, display_size, stride=1):
+        """Draw the panel; a stride > 1 draws every stride-th sample, always ending on the newest"""
+        from OpenGL.GL import (glPushAttrib, glPopAttrib, glDisable, glMatrixMode, glPushMatrix, glPopMatrix,
+                               glLoadIdentity, glOrtho, glBindBuffer, glEnableClientState, glDisableClientState,
+                               glColor3f, glBegin, glEnd, glVertex2f, glTranslatef, glScalef, glVertexPointer,
+                               glDrawArrays, GL_ALL_ATTRIB_BITS, GL_DEPTH_TEST, GL_PROJECTION, GL_MODELVIEW,
+                               GL_ARRAY_BUFFER, GL_VERTEX_ARRAY, GL_LINES, GL_LINE_STRIP, GL_FLOAT)
+        if self.vbo is None:
+            self._create_buffer()
+
+        glPushAttrib(GL_ALL_ATTRIB_BITS)
+        glDisable(GL_DEPTH_TEST)
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glOrtho(0, display_size[0], 0, display_size[1], -1, 1)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        self._upload()
+        glEnableClientState(GL_VERTEX_ARRAY)
+        start = self.ring.start
+        for lane in range(len(LANES)):
+            # Lanes stack upwards, the first lane on top
+            lane_center = self.y + (len(LANES) - lane - 0.5) * self.lane_height
+
+            glColor3f(0.4, 0.4, 0.4)
+            glBegin(GL_LINES)
+            glVertex2f(self.x, lane_center)
+            glVertex2f(self.x + self.width, lane_center)
+            glEnd()
+
+            glPushMatrix()
+            glTranslatef(self.x, lane_center, 0)
+            glScalef(self.width / self.window, self.lane_height / 2, 1)
+            glTranslatef(-start, 0, 0)
+            first = start + (self.window - 1) % stride
+            for axis in range(3):
+                line = lane * 3 + axis
+                glColor3f(*AXIS_COLORS[axis])
+                glVertexPointer(2, GL_FLOAT, stride * self.row_bytes, ctypes.c_void_p(first * self.row_bytes + line * 8))
+                glDrawArrays(GL_LINE_STRIP, 0, (self.window - 1) // stride + 1)
+            glPopMatrix()
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        glMatrixMode(GL_PROJECTION)
+        glPopMatrix()
+        glMatrixMode(GL_MODELVIEW)
+        glPopMatrix()
+        glPopAttrib()
@@ -0,0 +1,85 @@
+import numpy as np
+
+class SignalPyramid:
+    def __init__(self, samples, factor=2):
+        """
+        Precomputed min/max level-of-detail pyramid over one or more channels.
+
+        Level 0 holds the raw samples; every following level holds the min and
+        max of `factor` consecutive entries of the level below, so any range can
+        be summarized at a cost proportional to the requested pixel width.
+
+        Parameters:
+        -----------
+        samples : array of shape (T,) or (T, C)
+            Signal values, one column per channel
+        factor : int
+            Reduction factor between consecutive levels
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        self.factor = factor
+        self.length = len(samples)
+        self.channels = samples.shape[1]
+
+        mins, maxs = samples, samples
+        self.levels = [(mins, maxs)]
+        while len(mins) > 1:
+            # Pad with edge values so the last partial block reduces correctly
+            pad = (-len(mins)) % factor
+            if pad:
+                mins = np.concatenate([mins, np.repeat(mins[-1:], pad, axis=0)])
+                maxs = np.concatenate([maxs, np.repeat(maxs[-1:], pad, axis=0)])
+            mins = mins.reshape(-1, factor, self.channels).min(axis=1)
+            maxs = maxs.reshape(-1, factor, self.channels).max(axis=1)
+            self.levels.append((mins, maxs))
+
+    def get_range(self):
+        """Global (min, max) per channel"""
+        mins, maxs = self.levels[-1]
+        return mins[0], maxs[0]
+
+    def query(self, start, stop, width):
+        """
+        Summarize samples [start, stop) into `width` pixel columns
+
+        Returns:
+        --------
+        (mins, maxs) : arrays of shape (width, C)
+        """
+        start = max(0, int(start))
+        stop = min(self.length, int(stop))
+        width = int(width)
+        if stop <= start or width <= 0 or self.length == 0:
+            empty = np.zeros((0, self.channels))
+            return empty, empty
+
+        # Pick the coarsest level whose blocks still fit inside one pixel
+        samples_per_pixel = (stop - start) / width
+        level = 0
+        if samples_per_pixel > 1:
+            level = int(np.log(samples_per_pixel) / np.log(self.factor))
+        level = min(level, len(self.levels) - 1)
+        block = self.factor ** level
+
+        mins, maxs = self.levels[level]
+        first = start // block
+        last = -(-stop // block)
+        mins = mins[first:last]
+        maxs = maxs[first:last]
+
+        # First block of every pixel column, relative to the sliced range
+        pixel_start = start + (stop - start) * np.arange(width) // width
+        edges = np.minimum(pixel_start // block - first, len(mins) - 1)
+        return np.minimum.reduceat(mins, edges, axis=0), np.maximum.reduceat(maxs, edges, axis=0)
+
+
+def overview_pyramid(sensor_array):
+    """
+    Build the slider overview for a SensorArray: the largest accelerometer and
+    gyroscope magnitude over all devices, aligned to the playback index
+    """
+    acc = np.linalg.norm(sensor_array.aligned(sensor_array.accelerometer), axis=2).max(axis=0)
+    gyro = np.linalg.norm(sensor_array.aligned(sensor_array.gyro), axis=2).max(axis=0)
+    return SignalPyramid(np.column_stack([acc, gyro]))
@@ -1,4 +1,5 @@
 import pygame
+import numpy as np
 
 class Slider:
     def __init__(self, x, y, width, height, min_value, max_value, initial_value=0):
@@ -13,11 +14,71 @@ class Slider:
         self.slider_color = (100, 100, 100)
         self.handle_color = (200, 200, 200)
         self.handle_width = 10
+        self.overview = None
+        self.overview_colors = [(90, 170, 255), (255, 170, 60)]
+        self._overview_surface = None
+        self._overview_key = None
+        self.flip_overview = False  # Set when the target surface is shown upside down
+        self.selection = None  # (start, stop) range highlighted on the slider
+        self.selection_color = (255, 255, 255, 70)
+    
+    def set_overview(self, pyramid):
+        """Show a SignalPyramid min/max overview behind the slider"""
+        self.overview = pyramid
+        self._overview_surface = None
+        self._overview_key = None
+    
+    def get_overview_surface(self):
+        # Only re-query the pyramid when the visible range or size changes
+        key = (self.width, self.height, self.min_value, self.max_value)
+        if self._overview_surface is not None and self._overview_key == key:
+            return self._overview_surface
+        
+        surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+        mins, maxs = self.overview.query(self.min_value, self.max_value + 1, self.width)
+        low, high = self.overview.get_range()
+        scale = np.where(high > low, high - low, 1.0)
+        
+        # Map each column's [min, max] to pixel rows, larger values towards the top
+        top = (self.height - 1 - (maxs - low) / scale * (self.height - 1)).astype(int)
+        bottom = (self.height - 1 - (mins - low) / scale * (self.height - 1)).astype(int)
+        for channel in range(mins.shape[1]):
+            color = self.overview_colors[channel % len(self.overview_colors)]
+            for column in range(len(mins)):
+                pygame.draw.line(surface, color, (column, top[column, channel]), (column, bottom[column, channel]))
+        
+        if self.flip_overview:
+            surface = pygame.transform.flip(surface, False, True)
+        
+        self._overview_surface = surface
+        self._overview_key = key
+        return surface
+    
+    def set_selection(self, start, stop):
+        """Highlight the value range [start, stop), or nothing if start is None"""
+        self.selection = None if start is None else (start, stop)
+    
+    def value_to_x(self, value):
+        if self.max_value == self.min_value:
+            return self.x
+        return int(self.x + (value - self.min_value) / (self.max_value - self.min_value) * self.width)
         
     def draw(self, surface):
         # Draw slider background
         pygame.draw.rect(surface, self.slider_color, (self.x, self.y, self.width, self.height))
         
+        # Draw the signal overview behind the handle
+        if self.overview is not None:
+            surface.blit(self.get_overview_surface(), (self.x, self.y))
+        
+        # Shade the selected range
+        if self.selection is not None:
+            left = self.value_to_x(self.selection[0])
+            right = max(left + 1, self.value_to_x(self.selection[1]))
+            highlight = pygame.Surface((right - left, self.height), pygame.SRCALPHA)
+            highlight.fill(self.selection_color)
+            surface.blit(highlight, (left, self.y))
+        
         # Calculate handle position
         handle_pos = self.get_handle_position()
         
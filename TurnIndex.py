@@ -0,0 +1,335 @@
+import json
+import os
+import numpy as np
+import MotionVisualizer
+from SessionLoader import SessionLoadError
+from SignalFilter import zero_phase
+
+SIGNALS = ("yaw_rate_dps", "acc", "lean_deg", "rate_dps")  # Described along every turn
+POINTS = 8  # Samples of each signal along a turn, after normalizing its duration
+FEATURES = len(SIGNALS) * POINTS + 1  # Plus the duration
+INDEX_VERSION = 1
+
+def turn_signals(sensor_array):
+    """
+    Signals turns are found and described by, per playback index and averaged
+    over the devices that have samples there: yaw rate about the vertical
+    (deg/s, positive turning left), acceleration magnitude, lean away from the
+    device's mean vertical (deg) and total rotation rate (deg/s)
+
+    Returns:
+    --------
+    array of shape (T, len(SIGNALS))
+    """
+    valid = np.arange(sensor_array.length)[None, :] < (sensor_array.lengths - sensor_array.start_index)[:, None]
+    gravity = sensor_array.aligned(sensor_array.gravity)
+    gyro = sensor_array.aligned(sensor_array.gyro)
+    acc = sensor_array.aligned(sensor_array.accelerometer) * sensor_array.acc_scale[:, :, None]
+
+    # The gravity sensor reads 1 g pointing up
+    norm = np.linalg.norm(gravity, axis=2, keepdims=True)
+    up = gravity / np.where(norm > 0, norm, 1.0)
+    mean_up = np.where(valid[:, :, None], up, 0.0).sum(axis=1)
+    mean_up /= np.maximum(np.linalg.norm(mean_up, axis=1, keepdims=True), 1e-12)
+
+    signals = np.stack([
+        np.degrees(np.einsum("ntk,ntk->nt", gyro, up)),
+        np.linalg.norm(acc, axis=2),
+        np.degrees(np.arccos(np.clip(np.einsum("ntk,nk->nt", up, mean_up), -1.0, 1.0))),
+        np.degrees(np.linalg.norm(gyro, axis=2)),
+    ], axis=2)
+    devices = np.maximum(valid.sum(axis=0), 1)
+    return np.where(valid[:, :, None], signals, 0.0).sum(axis=0) / devices[:, None]
+
+
+def find_turns(yaw_rate, fs, cutoff=1.5, min_duration=0.4, max_duration=5.0, min_rate=15.0):
+    """
+    Split a session into turns: runs of one sign of the low-passed yaw rate
+
+    Parameters:
+    -----------
+    yaw_rate : array of shape (T,)
+        Yaw rate in deg/s, see turn_signals
+    fs : float
+        Sample rate in Hz
+    cutoff : float
+        Low-pass cutoff in Hz removing chatter around zero
+    min_duration, max_duration : float
+        Seconds a turn may last; longer runs are traverses, shorter ones noise
+    min_rate : float
+        Peak yaw rate in deg/s a turn must reach
+
+    Returns:
+    --------
+    (starts, stops) : playback index arrays, each turn is [start, stop)
+    """
+    if len(yaw_rate) < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    smooth = zero_phase(yaw_rate, [("lowpass", cutoff)], fs)
+    side = smooth >= 0
+    bounds = np.concatenate([[0], np.flatnonzero(side[1:] != side[:-1]) + 1, [len(smooth)]])
+    starts, stops = bounds[:-1], bounds[1:]
+    duration = (stops - starts) / fs
+    peak = np.maximum.reduceat(np.abs(smooth), starts)
+    keep = (duration >= min_duration) & (duration <= max_duration) & (peak >= min_rate)
+    return starts[keep], stops[keep]
+
+
+def fixed_windows(length, fs, window=2.0, hop=None):
+    """[start, stop) playback ranges of `window` seconds every `hop` seconds (default window / 2)"""
+    size = max(2, int(round(window * fs)))
+    step = max(1, int(round((hop if hop is not None else window / 2.0) * fs)))
+    starts = np.arange(0, max(length - size, 0) + 1, step)
+    return starts, np.minimum(starts + size, length)
+
+
+def segment_features(signals, starts, stops, fs):
+    """
+    Compact feature vector of every [start, stop) range: each of SIGNALS
+    sampled at POINTS evenly spaced positions from start to end, so turns of
+    different length are compared by shape, plus the duration in seconds.
+    The yaw rate is flipped to be positive so left and right turns compare.
+
+    Returns:
+    --------
+    (features, directions) : float32 array of shape (M, FEATURES), and +1
+    (left) or -1 (right) per range
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    stops = np.asarray(stops, dtype=np.int64)
+    position = starts[:, None] + (stops - 1 - starts)[:, None] * np.linspace(0.0, 1.0, POINTS)[None, :]
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, len(signals) - 1)
+    blend = (position - low)[:, :, None]
+    samples = signals[low] * (1.0 - blend) + signals[high] * blend  # (M, POINTS, len(SIGNALS))
+
+    directions = np.where(samples[:, :, 0].mean(axis=1) >= 0, 1, -1)
+    samples[:, :, 0] *= directions[:, None]
+    features = np.concatenate([samples.transpose(0, 2, 1).reshape(len(starts), len(SIGNALS) * POINTS),
+                               ((stops - starts) / fs)[:, None]], axis=1)
+    return features.astype(np.float32), directions
+
+
+class TurnIndex:
+    def __init__(self, path):
+        """
+        On-disk index of turn feature vectors over a recording archive, with
+        vectorized k-nearest-neighbour queries.
+
+        Every session is split into turns (or fixed windows) on its
+        synchronized playback timeline and each turn is reduced to a
+        segment_features() vector. The vectors of all sessions live in one
+        float32 matrix, so a query is a single matrix-vector product over the
+        whole archive instead of a scan of raw recordings. Sessions are only
+        re-analyzed when their files change (MotionVisualizer.source_tag).
+
+        Files in `path`:
+            sessions.json  settings, and folders, devices and source tag per session
+            features.npy   (M, FEATURES) float32 vectors
+            turns.npz      session number, start, stop and direction per vector
+
+        Parameters:
+        -----------
+        path : str
+            Index folder, created by save()
+        """
+        self.path = path
+        self.settings = {"version": INDEX_VERSION, "dt": 0.01, "mode": "turns", "window": 2.0}
+        self.sessions = []  # dicts with path, devices and tag
+        self.features = np.zeros((0, FEATURES), dtype=np.float32)
+        self.session = np.zeros(0, dtype=np.int32)
+        self.start = np.zeros(0, dtype=np.int64)
+        self.stop = np.zeros(0, dtype=np.int64)
+        self.direction = np.zeros(0, dtype=np.int8)
+        self._scaled = None
+        if os.path.exists(os.path.join(path, "sessions.json")):
+            self.load()
+
+    def __len__(self):
+        return len(self.features)
+
+    def load(self):
+        with open(os.path.join(self.path, "sessions.json")) as f:
+            header = json.load(f)
+        if header["settings"].get("version") != INDEX_VERSION:
+            print(f"Turn index {self.path} is from another version, it will be rebuilt")
+            return
+        self.settings = header["settings"]
+        self.sessions = header["sessions"]
+        self.features = np.load(os.path.join(self.path, "features.npy"), mmap_mode="r")
+        turns = np.load(os.path.join(self.path, "turns.npz"))
+        self.session, self.start, self.stop, self.direction = (turns["session"], turns["start"], turns["stop"],
+                                                               turns["direction"])
+        self._scaled = None
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        # Write temporary files and swap them in, so an interrupted save leaves no truncated file
+        np.save(os.path.join(self.path, "features.tmp.npy"), np.asarray(self.features, dtype=np.float32))
+        np.savez(os.path.join(self.path, "turns.tmp.npz"), session=self.session, start=self.start, stop=self.stop,
+                 direction=self.direction)
+        with open(os.path.join(self.path, "sessions.tmp.json"), "w") as f:
+            json.dump({"settings": self.settings, "sessions": self.sessions}, f, indent=1)
+        for name in ("features.npy", "turns.npz", "sessions.json"):
+            base, extension = os.path.splitext(name)
+            os.replace(os.path.join(self.path, f"{base}.tmp{extension}"), os.path.join(self.path, name))
+
+    def analyze(self, devices):
+        """
+        Load one session and find its turns or windows
+
+        Returns:
+        --------
+        (features, directions, starts, stops), see segment_features
+        """
+        from SessionLoader import load_session
+        from SensorArray import SensorArray
+        sensor_array = SensorArray(load_session(devices, None, self.settings["dt"]))
+        sensor_array.sync_times()
+        signals = turn_signals(sensor_array)
+        starts, stops = self.segments(signals)
+        features, directions = segment_features(signals, starts, stops, 1.0 / self.settings["dt"])
+        return features, directions, starts, stops
+
+    def segments(self, signals):
+        """[start, stop) ranges of the turns (or windows) in turn_signals() of a session"""
+        fs = 1.0 / self.settings["dt"]
+        if self.settings["mode"] == "turns":
+            return find_turns(signals[:, 0], fs)
+        return fixed_windows(len(signals), fs, self.settings["window"])
+
+    def update(self, sessions, dt=0.01, mode="turns", window=2.0):
+        """
+        Index `sessions`, a list of (session folder, [(name, device folder), ...]).
+
+        Sessions whose files are unchanged keep their vectors; new or changed
+        ones are analyzed, sessions no longer listed are dropped. Changing dt,
+        mode or window re-analyzes everything. Call save() to write the result.
+
+        Returns:
+        --------
+        number of sessions analyzed
+        """
+        settings = {"version": INDEX_VERSION, "dt": dt, "mode": mode, "window": window}
+        reuse = settings == self.settings
+        self.settings = settings
+        previous = {session["path"]: (number, session) for number, session in enumerate(self.sessions)}
+
+        rows = {"features": [], "session": [], "start": [], "stop": [], "direction": []}
+        kept_sessions, analyzed = [], 0
+        for path, devices in sessions:
+            path = os.path.abspath(path)
+            devices = [[name, os.path.abspath(folder) + "/"] for name, folder in devices]
+            tag = [MotionVisualizer.source_tag(folder) for name, folder in devices]
+            number, old = previous.get(path, (None, None))
+            if reuse and old is not None and old["tag"] == tag and old["devices"] == devices:
+                own = self.session == number
+                features, directions, starts, stops = (np.asarray(self.features[own]), self.direction[own],
+                                                       self.start[own], self.stop[own])
+            else:
+                print(f"Indexing {path} ({analyzed + 1})")
+                try:
+                    features, directions, starts, stops = self.analyze(devices)
+                except (SessionLoadError, OSError, ValueError) as e:
+                    print(f"Skipping {path}: {e}")
+                    continue
+                analyzed += 1
+            rows["features"].append(features)
+            rows["session"].append(np.full(len(features), len(kept_sessions), dtype=np.int32))
+            rows["start"].append(starts)
+            rows["stop"].append(stops)
+            rows["direction"].append(np.asarray(directions, dtype=np.int8))
+            kept_sessions.append({"path": path, "devices": devices, "tag": tag})
+
+        self.sessions = kept_sessions
+        self.features = np.concatenate(rows["features"]) if kept_sessions else np.zeros((0, FEATURES), np.float32)
+        for key, dtype in (("session", np.int32), ("start", np.int64), ("stop", np.int64), ("direction", np.int8)):
+            setattr(self, key, np.concatenate(rows[key]).astype(dtype) if kept_sessions else np.zeros(0, dtype))
+        self._scaled = None
+        return analyzed
+
+    def _prepare(self):
+        """Scale each signal (all its POINTS together, keeping the shape) to unit variance, once per load"""
+        if self._scaled is None:
+            features = np.asarray(self.features, dtype=np.float32)
+            self.center = features.mean(axis=0) if len(features) else np.zeros(FEATURES, np.float32)
+            groups = [slice(i * POINTS, (i + 1) * POINTS) for i in range(len(SIGNALS))] + [slice(FEATURES - 1, None)]
+            self.scale = np.ones(FEATURES, dtype=np.float32)
+            for group in groups:
+                spread = features[:, group].std() if len(features) else 0.0
+                self.scale[group] = spread if spread > 0 else 1.0
+            self._scaled = (features - self.center) / self.scale
+            self._norms = np.einsum("ij,ij->i", self._scaled, self._scaled)
+        return self._scaled
+
+    def query(self, vector, k=10, direction=None, exclude=None):
+        """
+        The k vectors closest to `vector` (Euclidean, after per signal scaling)
+
+        Parameters:
+        -----------
+        vector : array of shape (FEATURES,)
+        direction : int or None
+            Only turns of this direction (+1 left, -1 right)
+        exclude : (session folder, start, stop) or None
+            Skip turns of that session overlapping [start, stop), e.g. the query itself
+
+        Returns:
+        --------
+        list of dicts with session, devices, start, stop, direction and distance, closest first
+        """
+        scaled = self._prepare()
+        query = (np.asarray(vector, dtype=np.float32) - self.center) / self.scale
+        distance = self._norms - 2.0 * (scaled @ query) + query @ query
+
+        if direction is not None:
+            distance = np.where(self.direction == direction, distance, np.inf)
+        if exclude is not None:
+            path, start, stop = exclude
+            numbers = [number for number, session in enumerate(self.sessions) if session["path"] == os.path.abspath(path)]
+            overlap = np.isin(self.session, numbers) & (self.start < stop) & (self.stop > start)
+            distance = np.where(overlap, np.inf, distance)
+
+        k = min(k, int(np.isfinite(distance).sum()))
+        if k == 0:
+            return []
+        nearest = np.argpartition(distance, k - 1)[:k]
+        nearest = nearest[np.argsort(distance[nearest])]
+        return [{
+            "session": self.sessions[self.session[row]]["path"],
+            "devices": [tuple(device) for device in self.sessions[self.session[row]]["devices"]],
+            "start": int(self.start[row]), "stop": int(self.stop[row]), "direction": int(self.direction[row]),
+            "distance": float(np.sqrt(max(distance[row], 0.0))),
+        } for row in nearest]
+
+    def query_range(self, signals, start, stop, session_path=None, k=10, direction=None):
+        """query() with the playback range [start, stop) of a session's turn_signals(), excluding itself"""
+        features, directions = segment_features(signals, [start], [stop], 1.0 / self.settings["dt"])
+        exclude = (session_path, start, stop) if session_path is not None else None
+        return self.query(features[0], k, direction, exclude)
+
+    def load_match(self, match, length, start, filters=None):
+        """
+        Load the session of a query() match, lined up so its turn starts at
+        playback index `start` of a run of `length` samples
+
+        Returns:
+        --------
+        (sensor_array, warp) : the matched session and its playback index for
+        every index of the other run, like RunCompare.load_comparison
+        """
+        from SessionLoader import load_session
+        from SensorArray import SensorArray
+        sensor_array = SensorArray(load_session(match["devices"], None, self.settings["dt"]))
+        if filters:
+            sensor_array.apply_filters(filters)
+        sensor_array.sync_times()
+        warp = np.clip(np.arange(length) - start + match["start"], 0, sensor_array.length - 1)
+        return sensor_array, warp
+
+
+def format_match(number, match, dt):
+    """One line describing a query() match"""
+    side = "left" if match["direction"] > 0 else "right"
+    return (f"{number}. {os.path.basename(match['session'])} {side} turn "
+            f"{match['start'] * dt:.1f}-{match['stop'] * dt:.1f}s  distance {match['distance']:.2f}")
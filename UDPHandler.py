@@ -1,14 +1,48 @@
 import socket
 import json
+import threading
 import time
+import numpy as np
+from PacketLog import PacketRecorder
 
 class UDPHandler:
-    def __init__(self, ip="127.0.0.1", port=5005):
+    def __init__(self, ip="127.0.0.1", port=5005, record_path=None):
         self.ip = ip
         self.port = port
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.left_leg_data = None
-        self.right_leg_data = None
+        self.device_data = {}
+        self.sequence = 0  # Packet counter so receivers can detect loss and reordering
+        
+        # Frame assembly, enabled by setExpectedDevices()
+        self.expected_devices = None
+        self.frame_deadline = 0.005
+        self.device_ticks = {}
+        self.frame_tick = None
+        self.frame_started = 0.0
+        self.frame_sent = True
+        self.last_published_tick = None
+        self.published_frames = 0
+        self.resend_mark = 0  # published_frames at the last sendLegData()
+        
+        # Tick of the latest data, and the counter that stamps frames of data
+        # set without one (e.g. through setLegData)
+        self.data_tick = None
+        self.untimed_tick = 0
+        
+        # Optional binary log of every outgoing packet, see PacketLog.py
+        self.recorder = PacketRecorder(record_path) if record_path else None
+        
+        # Optional latency compensation, enabled by enablePrediction()
+        self.predictor = None
+        self.prediction_thread = None
+
+    @property
+    def left_leg_data(self):
+        return self.device_data.get("left")
+
+    @property
+    def right_leg_data(self):
+        return self.device_data.get("right")
     
     def setLegData(self, isLeftLeg, yaw, pitch, roll, acc_x, acc_y, acc_z, 
                   gravity_x, gravity_y, gravity_z):
@@ -19,12 +53,80 @@ class UDPHandler:
         -----------
         isLeftLeg : bool
             True if data is for left leg, False for right leg
+        """
+        self.setDeviceData("left" if isLeftLeg else "right", yaw, pitch, roll,
+                           acc_x, acc_y, acc_z, gravity_x, gravity_y, gravity_z)
+
+    def setExpectedDevices(self, names, deadline=0.005):
+        """
+        Enable frame assembly: a frame is sent exactly once, as soon as every
+        expected device has reported data for its tick, or by poll() once
+        `deadline` seconds have passed since the frame's first device arrived.
+        Devices that did not report the frame's tick are listed as stale.
+        
+        Data set without a tick (e.g. through setLegData) cannot be assembled;
+        sendLegData() sends it right away, as without frame assembly.
+        
+        Parameters:
+        -----------
+        names : list of str
+            Devices that make up a complete frame
+        deadline : float
+            Seconds to wait for missing devices
+        """
+        self.expected_devices = list(names)
+        self.frame_deadline = deadline
+
+    def enablePrediction(self, lead_ms=30.0, rate=250.0, sample_dt=0.01, smoothing=0.5):
+        """
+        Send poses predicted ahead instead of the latest samples.
+        
+        Every frame (as it would be sent, see setExpectedDevices) updates a
+        PosePredictor instead of going out; a background thread sends the
+        pose predicted `lead_ms` past the send time `rate` times per second,
+        independently of how often frames arrive or get rendered. Packets carry
+        "predicted_ms", the total extrapolation. While no new frames arrive
+        (paused, stalled) the last frame is sent as it is.
+        
+        Parameters:
+        -----------
+        lead_ms : float
+            Milliseconds to predict ahead, about the network and display latency
+        rate : float
+            Packets per second sent by the background thread
+        sample_dt : float
+            Sample period in seconds of the frames
+        smoothing : float
+            See PosePredictor
+        """
+        from PosePredictor import PosePredictor
+        self.predictor = PosePredictor(smoothing)
+        self.prediction_lead = lead_ms / 1000.0
+        self.prediction_period = 1.0 / rate
+        self.sample_dt = sample_dt
+        self.prediction_lock = threading.Lock()
+        self.prediction_frame = None  # Latest frame: names, acc, gravity, tick, stale, arrival time
+        self.prediction_stop = threading.Event()
+        self.prediction_thread = threading.Thread(target=self._sendPredictions, name="PosePrediction", daemon=True)
+        self.prediction_thread.start()
+
+    def setDeviceData(self, name, yaw, pitch, roll, acc_x, acc_y, acc_z,
+                      gravity_x, gravity_y, gravity_z, tick=None):
+        """
+        Set data for a named device including orientation, acceleration, and gravity
+        
+        Parameters:
+        -----------
+        name : str
+            Device name, e.g. "left", "right", "pelvis"
         yaw, pitch, roll : float
             Orientation angles in degrees
         acc_x, acc_y, acc_z : float
             Acceleration values
         gravity_x, gravity_y, gravity_z : float
             Gravity vector components (mandatory)
+        tick : int, optional
+            Playback tick the sample belongs to, used for frame assembly
         """
         # Create a data dictionary with all values
         leg_data = {
@@ -43,40 +145,191 @@ class UDPHandler:
             }
         }
         
-        # Store data for the appropriate leg
-        if isLeftLeg:
-            self.left_leg_data = leg_data
-        else:
-            self.right_leg_data = leg_data
+        # Store data for the named device
+        self._startFrame(tick)
+        self.device_data[name] = leg_data
+        self.device_ticks[name] = tick
+        self.data_tick = tick
+        self._completeFrame()
+
+    def setDevicesData(self, names, ypr, acc, gravity, tick=None):
+        """
+        Set data for several devices at once from stacked arrays
+        
+        Parameters:
+        -----------
+        names : list of str
+            Device names, one per row
+        ypr : array of shape (N, 3)
+            Yaw, pitch, roll in degrees
+        acc, gravity : arrays of shape (N, 3)
+            Acceleration and gravity vectors
+        tick : int, optional
+            Playback tick shared by all rows, used for frame assembly
+        """
+        # One bulk conversion instead of a float() call per value
+        self._startFrame(tick)
+        for name, (yaw, pitch, roll), (acc_x, acc_y, acc_z), (gravity_x, gravity_y, gravity_z) in zip(
+                names, ypr.tolist(), acc.tolist(), gravity.tolist()):
+            self.device_data[name] = {
+                "yaw": yaw,
+                "pitch": pitch,
+                "roll": roll,
+                "acc": {"x": acc_x, "y": acc_y, "z": acc_z},
+                "gravity": {"x": gravity_x, "y": gravity_y, "z": gravity_z}
+            }
+            self.device_ticks[name] = tick
+        self.data_tick = tick
+        self._completeFrame()
+
+    def _startFrame(self, tick):
+        if self.expected_devices is None or tick is None:
+            return
+        
+        # A new tick starts a new frame; an unfinished previous frame goes out
+        # before any of the new data replaces it. Late data for the tick we
+        # already sent does not reopen that frame.
+        if tick != self.frame_tick and tick != self.last_published_tick:
+            if not self.frame_sent:
+                self._publishFrame()
+            self.frame_tick = tick
+            self.frame_started = time.monotonic()
+            self.frame_sent = False
+
+    def _completeFrame(self):
+        if self.expected_devices is None:
+            return
+        if not self.frame_sent and all(self.device_ticks.get(name) == self.frame_tick for name in self.expected_devices):
+            self._publishFrame()
+
+    def poll(self):
+        """Send the pending frame if its deadline has passed"""
+        if self.expected_devices is None or self.frame_sent:
+            return
+        if time.monotonic() - self.frame_started >= self.frame_deadline:
+            self._publishFrame()
     
     def sendLegData(self):
         """
-        Send both legs' data over UDP as a combined JSON message
-        with the structure: { "legs": { "left": {...}, "right": {...} } }
+        Send all devices' data over UDP as a combined JSON message
+        with the structure:
+        { "seq": n, "tick": i, "sent": t, "stale": [...], "legs": { "left": {...}, "right": {...}, ... } }
+        where "sent" is the wall-clock send time in seconds and "stale" lists the
+        devices whose data is not from "tick". "tick" is the tick of the latest
+        data, or for data set without one, a counter of such sends.
+        
+        With frame assembly enabled, complete frames are sent as they are
+        assembled and this sends a pending frame whose deadline passed. If no
+        frame went out since the last call and none is pending (paused, or
+        no new samples this frame), the last frame is sent again, so
+        receivers keep getting the pose every frame as without assembly.
         """
-        if self.left_leg_data is None and self.right_leg_data is None:
+        if self.expected_devices is not None and self.data_tick is not None:
+            self.poll()
+            if self.frame_sent and self.published_frames == self.resend_mark and self.last_published_tick is not None:
+                tick = self.last_published_tick
+                self._publish(tick, [name for name in self.expected_devices if self.device_ticks.get(name) != tick])
+            self.resend_mark = self.published_frames
+        elif self.data_tick is not None:
+            self._publish(self.data_tick, [name for name, tick in self.device_ticks.items() if tick != self.data_tick])
+        else:
+            self._publish(self.untimed_tick, [])
+            self.untimed_tick += 1
+
+    def _publishFrame(self):
+        """Send the assembled frame"""
+        tick = self.frame_tick
+        self.frame_sent = True
+        self.last_published_tick = tick
+        self.published_frames += 1
+        self._publish(tick, [name for name in self.expected_devices if self.device_ticks.get(name) != tick])
+
+    def _publish(self, tick, stale):
+        if not self.device_data:
             return
-            
-        # Create the legs data structure
-        legs_data = {}
         
-        # Add leg data if available
-        if self.left_leg_data is not None:
-            legs_data["left"] = self.left_leg_data
+        if self.predictor is not None:
+            self._updatePrediction(tick, stale)
+            return
             
-        if self.right_leg_data is not None:
-            legs_data["right"] = self.right_leg_data
+        # Create the final combined data structure, one entry per device
+        self._send({
+            "seq": self.sequence,
+            "tick": tick,
+            "sent": time.time(),
+            "stale": stale,
+            "legs": self.device_data
+        })
+
+    def _updatePrediction(self, tick, stale):
+        """Feed the frame about to be sent to the predictor"""
+        names = list(self.device_data)
+        legs = [self.device_data[name] for name in names]
+        ypr = np.array([[leg["yaw"], leg["pitch"], leg["roll"]] for leg in legs])
+        acc = np.array([[leg["acc"]["x"], leg["acc"]["y"], leg["acc"]["z"]] for leg in legs])
+        gravity = np.array([[leg["gravity"]["x"], leg["gravity"]["y"], leg["gravity"]["z"]] for leg in legs])
+        
+        with self.prediction_lock:
+            previous = self.prediction_frame
+            if previous is not None and tick is not None and tick == previous[3]:
+                return  # Same sample again, e.g. while paused
+            if previous is None or previous[0] != names or (tick is not None and tick != previous[3] + 1):
+                self.predictor.reset()  # Seek, loop or new devices: the motion so far does not continue
+            self.predictor.update(ypr, self.sample_dt)
+            self.prediction_frame = (names, acc, gravity, tick, stale, time.monotonic())
+
+    def _sendPredictions(self):
+        next_send = time.monotonic()
+        while not self.prediction_stop.wait(max(0.0, next_send - time.monotonic())):
+            next_send = max(next_send + self.prediction_period, time.monotonic() - self.prediction_period)
+            with self.prediction_lock:
+                if self.prediction_frame is None:
+                    continue
+                names, acc, gravity, tick, stale, arrived = self.prediction_frame
+                age = time.monotonic() - arrived
+                # Extrapolate from the sample to the send time plus the lead, unless the stream stopped
+                ahead = self.prediction_lead + age if age < 3.0 * self.sample_dt else 0.0
+                ypr, gravity = self.predictor.predict(ahead, gravity)
             
-        # Create the final combined data structure
-        combined_data = {
-            "legs": legs_data
-        }
+            legs = {}
+            for name, (yaw, pitch, roll), (acc_x, acc_y, acc_z), (gravity_x, gravity_y, gravity_z) in zip(
+                    names, ypr.tolist(), acc.tolist(), gravity.tolist()):
+                legs[name] = {
+                    "yaw": yaw,
+                    "pitch": pitch,
+                    "roll": roll,
+                    "acc": {"x": acc_x, "y": acc_y, "z": acc_z},
+                    "gravity": {"x": gravity_x, "y": gravity_y, "z": gravity_z}
+                }
+            self._send({
+                "seq": self.sequence,
+                "tick": tick,
+                "sent": time.time(),
+                "stale": stale,
+                "predicted_ms": ahead * 1000.0,
+                "legs": legs
+            })
+
+    def _send(self, combined_data):
+        self.sequence += 1
             
         # Convert to JSON and send
         json_data = json.dumps(combined_data)
+        payload = json_data.encode()
         try:
-            self.socket.sendto(json_data.encode(), (self.ip, self.port))
+            self.socket.sendto(payload, (self.ip, self.port))
+            if self.recorder is not None:
+                self.recorder.record(payload)
             # Print the data being sent (can be commented out in production)
             # print(f"Sending: {json_data}")
         except Exception as e:
-            print(f"Error sending UDP data: {e}")
\ No newline at end of file
+            print(f"Error sending UDP data: {e}")
+
+    def close(self):
+        """Close the socket and flush the packet log, if any"""
+        if self.prediction_thread is not None:
+            self.prediction_stop.set()
+            self.prediction_thread.join()
+        if self.recorder is not None:
+            self.recorder.close()
+        self.socket.close()
@@ -0,0 +1,192 @@
+import ctypes
+import os
+import queue
+import subprocess
+import threading
+import numpy as np
+
+class ExportError(Exception):
+    """Raised when a frame sink cannot be opened or fails while writing, e.g. without an encoder"""
+
+
+class FrameSink:
+    def __init__(self, max_pending=8):
+        """
+        Base class for frame consumers. Frames are handed to a background thread
+        through a bounded queue so encoding and disk writes overlap rendering.
+        If the thread fails it keeps draining the queue, so the renderer never
+        blocks on it, and the error is raised from the next write() or close().
+        """
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.frames = 0
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self.thread.start()
+
+    def write(self, frame):
+        """Queue one (height, width, 4) RGBA frame, top row first"""
+        self._check()
+        self.queue.put(frame)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        try:
+            self._close()
+        except OSError as e:
+            self.error = self.error or e
+        self._check()
+
+    def _check(self):
+        if self.error is not None:
+            raise ExportError(f"Export failed after {self.frames} frames: {self.error}") from self.error
+
+    def _run(self):
+        while True:
+            frame = self.queue.get()
+            if frame is None:
+                break
+            if self.error is not None:
+                continue  # Drop the frame, write() raises the error
+            try:
+                self._write(frame)
+                self.frames += 1
+            except Exception as e:
+                self.error = e
+
+    def _write(self, frame):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+
+class FFmpegSink(FrameSink):
+    def __init__(self, path, width, height, fps, ffmpeg="ffmpeg"):
+        """Pipe raw RGBA frames into an ffmpeg process encoding `path`"""
+        try:
+            self.process = subprocess.Popen(
+                [ffmpeg, "-y", "-loglevel", "error",
+                 "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+                 "-pix_fmt", "yuv420p", path],
+                stdin=subprocess.PIPE)
+        except FileNotFoundError:
+            raise ExportError(f"{ffmpeg} not found on PATH; install it, or export to a folder for an image sequence")
+        super().__init__()
+
+    def _write(self, frame):
+        self.process.stdin.write(np.ascontiguousarray(frame).tobytes())
+
+    def _close(self):
+        try:
+            self.process.stdin.close()
+        finally:
+            returncode = self.process.wait()
+        if returncode != 0 and self.error is None:
+            self.error = ExportError(f"ffmpeg exited with code {returncode}")
+
+
+class ImageSequenceSink(FrameSink):
+    def __init__(self, folder):
+        """Write every frame as a numbered binary PPM file into `folder`"""
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        super().__init__()
+
+    def _write(self, frame):
+        height, width = frame.shape[:2]
+        with open(os.path.join(self.folder, f"frame_{self.frames:06d}.ppm"), "wb") as f:
+            f.write(f"P6 {width} {height} 255\n".encode())
+            f.write(np.ascontiguousarray(frame[:, :, :3]).tobytes())
+
+
+def open_sink(output, width, height, fps):
+    """Image sequence for a folder (or a path without extension), ffmpeg otherwise"""
+    if output.endswith(os.sep) or output.endswith("/") or not os.path.splitext(output)[1]:
+        return ImageSequenceSink(output)
+    return FFmpegSink(output, width, height, fps)
+
+
+class OffscreenTarget:
+    def __init__(self, width, height):
+        """Framebuffer object with color and depth renderbuffers to render into"""
+        from OpenGL.GL import (glGenFramebuffers, glBindFramebuffer, glGenRenderbuffers, glBindRenderbuffer,
+                               glRenderbufferStorage, glFramebufferRenderbuffer, glCheckFramebufferStatus,
+                               GL_FRAMEBUFFER, GL_RENDERBUFFER, GL_RGBA8, GL_DEPTH_COMPONENT24,
+                               GL_COLOR_ATTACHMENT0, GL_DEPTH_ATTACHMENT, GL_FRAMEBUFFER_COMPLETE)
+        self.width = width
+        self.height = height
+        self.fbo = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+
+        self.color, self.depth = glGenRenderbuffers(2)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.color)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self.color)
+        glBindRenderbuffer(GL_RENDERBUFFER, self.depth)
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self.depth)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("Offscreen framebuffer is incomplete")
+
+    def bind(self):
+        from OpenGL.GL import glBindFramebuffer, glViewport, GL_FRAMEBUFFER
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        glViewport(0, 0, self.width, self.height)
+
+
+class PixelReadback:
+    def __init__(self, width, height, buffers=2):
+        """
+        Asynchronous glReadPixels through a ring of pixel buffer objects.
+
+        read() starts the transfer of the current frame into one PBO and maps
+        the PBO filled `buffers - 1` frames earlier, whose transfer has had a
+        whole frame to complete, so the CPU never waits on the GPU.
+        """
+        from OpenGL.GL import glGenBuffers, glBindBuffer, glBufferData, GL_PIXEL_PACK_BUFFER, GL_STREAM_READ
+        self.width = width
+        self.height = height
+        self.size = width * height * 4
+        self.pbos = [int(pbo) for pbo in np.atleast_1d(glGenBuffers(buffers))]
+        for pbo in self.pbos:
+            glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+            glBufferData(GL_PIXEL_PACK_BUFFER, self.size, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.index = 0
+        self.pending = 0
+
+    def _map(self, pbo):
+        from OpenGL.GL import glBindBuffer, glMapBuffer, glUnmapBuffer, GL_PIXEL_PACK_BUFFER, GL_READ_ONLY
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, pbo)
+        pointer = glMapBuffer(GL_PIXEL_PACK_BUFFER, GL_READ_ONLY)
+        data = ctypes.string_at(pointer, self.size)
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        # OpenGL rows start at the bottom
+        return np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 4)[::-1]
+
+    def read(self):
+        """Queue the current framebuffer; returns an older frame or None while the ring fills"""
+        from OpenGL.GL import glBindBuffer, glReadPixels, GL_PIXEL_PACK_BUFFER, GL_RGBA, GL_UNSIGNED_BYTE
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self.pbos[self.index])
+        glReadPixels(0, 0, self.width, self.height, GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        self.index = (self.index + 1) % len(self.pbos)
+
+        frame = None
+        if self.pending == len(self.pbos) - 1:
+            frame = self._map(self.pbos[self.index])
+        else:
+            self.pending += 1
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        return frame
+
+    def flush(self):
+        """Return the frames still in flight, oldest first"""
+        from OpenGL.GL import glBindBuffer, GL_PIXEL_PACK_BUFFER
+        frames = [self._map(self.pbos[(self.index - self.pending + i) % len(self.pbos)])
+                  for i in range(self.pending)]
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self.pending = 0
+        return frames
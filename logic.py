@@ -1,14 +1,11 @@
-import pandas as pd
-import numpy as np
-from OpenGL.GL import *
-from OpenGL.GLUT import *
-from OpenGL.GLU import *
 import socket
 import json
+# pandas and OpenGL are imported where they are used so sending UDP stays cheap
 
 # Load CSV files
 def initialize():
     global accelerometer_x, accelerometer_y, accelerometer_z, gyro_x, gyro_y, gyro_z, pos_x, pos_y, pos_z, vel_x, vel_y, vel_z, yaw, pitch, roll, dt
+    import pandas as pd
     base_path = "./"
     df_accel = pd.read_csv(base_path + "Accelerometer.csv")
     df_gyro = pd.read_csv(base_path + "Gyroscope.csv")
@@ -59,6 +56,9 @@ def run(index, pause):
 
 # Draw cone and orientation line
 def draw_cone_with_line(x, y, z, yaw, pitch, roll):
+    from OpenGL.GL import glPushMatrix, glPopMatrix, glTranslatef, glRotatef, glColor3f, glBegin, glEnd, glVertex3f, GL_LINES
+    from OpenGL.GLUT import glutSolidCone
+
     glPushMatrix()
     glTranslatef(x, y, z)
     glRotatef(yaw, 0, 1, 0)
@@ -1,16 +1,23 @@
+import os
 import time
 import pygame
 import numpy as np
 from OpenGL.GL import *
 from OpenGL.GLUT import *
 from OpenGL.GLU import *
-import MotionVisualizer
+from SessionLoader import SessionLoader, SessionLoadError
+from SensorArray import SensorArray
+from SignalPyramid import overview_pyramid
+from RangeStats import RangeIndex
+from SignalPlot import SignalPlot
+from FrameGovernor import FrameGovernor, QUALITY_LEVELS
 from UDPHandler import UDPHandler
 from Slider import Slider  # Import the Slider class from separate file
 
 # Flags for enabling/disabling features
 ENABLE_GRID = True
 ENABLE_CAMERA_FOLLOW = True
+ENABLE_PLOTS = True
 PAUSED = True  # Start paused at the first frame
 
 # Camera controls
@@ -23,10 +30,30 @@ deltaTime = 0.01
 # Sample index control
 current_index = 0
 
+# Devices to load as (name, session folder); add entries for skis, boots, pelvis...
+DEVICES = [
+    ("left", "data/Skimulator/Set3/Left/"),
+    ("right", "data/Skimulator/Set3/Right/"),
+]
+
 motion_visualizers = []
+sensor_array = None
+SHARED_SESSION = None  # Name of a shared-memory session to attach to, see SessionStore
+FILTERS = {}  # Channel -> filter stages, see SignalFilter.parse_filters
+CAUSAL_FILTERS = False  # Run FILTERS sample by sample like on live input instead of zero-phase
+SYNC_METHOD = "timestamps"  # "correlate" or "drift" to estimate clock offsets from the motion, see ClockSync
+COMPARE_DEVICES = None  # (name, session folder) of a second run to time-warp onto this one, see RunCompare
+COMPARE_OFFSET = 6.0  # Sideways distance of the second run in the scene
+compare_array = None
+compare_warp = None  # Second run playback index for every playback index
+TURN_INDEX = None  # Folder of a similar-turn index to search with f, see TurnIndex
+MATCHES = 5  # Similar turns listed per search
+FRAME_BUDGET = 1.0 / 60.0  # Seconds per frame before optional drawing is reduced, see FrameGovernor
+governor = None
+session_store = None
 last_index = 0
 
-udpHandler = UDPHandler()
+udpHandler = None  # Created in main()
 
 # Global variables for UI
 slider = None
@@ -34,51 +61,80 @@ display_size = (800, 600)
 slider_height = 20
 slider_y_offset = 50  # Distance from bottom of screen
 ui_surface = None
+ui_texture = None  # Kept between frames so the UI is only re-rendered when due
+text_list = None  # Display list of the overlay text, likewise only recompiled when due
 font = None
+signal_plot = None
+plot_device = 0  # Index of the device shown in the signal plots
+range_index = None
+selection = [None, None]  # Slider range [start, stop) set with [ and ]
+selection_lines = []  # Statistics of the selection, recomputed when it changes
+turn_index = None
+session_signals = None  # turn_signals() of this session, computed on the first search
+matches = []  # Similar turns of the selection, shown one at a time as the compared run
+match_number = -1
+match_lines = []
 
-def syncTimes(motion_visualizers):
+def syncTimes(sensor_array):
     # we need to to adjust the start position of the raw files to the same time
-    startTime = 0
-    #for motion_visualizer in motion_visualizers:
-    if len(motion_visualizers) >= 2:
-        startTime1 = motion_visualizers[0].time[0]
-        startTime2 = motion_visualizers[1].time[0]
-        
-        index = 0
-        if startTime1 > startTime2:
-            while startTime2 < startTime1:
-                index += 1
-                startTime2 = motion_visualizers[1].time[index]
-            motion_visualizers[0].set_start_index(index)
-            print ("startTime2 < startTime1 : Index: ", index)
-        elif startTime2 > startTime1:
-            while startTime1 < startTime2:
-                index += 1
-                startTime1 = motion_visualizers[0].time[index]
-            motion_visualizers[1].set_start_index(index)
-            print ("startTime2 > startTime1 : Index: ", index)
+    sensor_array.sync_times(SYNC_METHOD)
 
 # Initialize Pygame and OpenGL
-def init_3d():
-    global motion_visualizers, last_index, udpHandler, deltaTime, slider, display_size, ui_surface, font
-
-    # Initialize visualizers
-    left = "data/Skimulator/Set3/Left/"
-    right = "data/Skimulator/Set3/Right/"
-    motion_visualizers.append(MotionVisualizer.MotionVisualizer(left, True, udpHandler, deltaTime))
-    motion_visualizers.append(MotionVisualizer.MotionVisualizer(right, False, udpHandler, deltaTime))
+def init_3d(size=(800, 600), hidden=False):
+    global motion_visualizers, sensor_array, session_store, last_index, udpHandler, deltaTime, slider, display_size, ui_surface, font, signal_plot, range_index, compare_array, compare_warp, turn_index
 
-    # Get the maximum length of data
-    for motion_visualizer in motion_visualizers:
-        last_index = max(last_index, motion_visualizer.get_length())
+    # Initialize Pygame first so the window is up while the session loads
+    pygame.init()
+    display_size = size
+    flags = pygame.DOUBLEBUF | pygame.OPENGL
+    if hidden:
+        flags |= pygame.HIDDEN
+    pygame.display.set_mode(display_size, flags)
     
+    try:
+        if SHARED_SESSION is not None:
+            # Map the session other processes already loaded (or load and share it)
+            from SessionStore import open_shared_session
+            session_store, visualizers, sensor_array = open_shared_session(SHARED_SESSION, DEVICES, udpHandler, deltaTime)
+            motion_visualizers.extend(visualizers)
+        else:
+            # Load all files of all devices in parallel
+            loader = SessionLoader(DEVICES, udpHandler, deltaTime).start()
+            wait_for_session(loader)
+            motion_visualizers.extend(loader.result())
+
+            # Stack all devices so they advance together
+            sensor_array = SensorArray(motion_visualizers)
+    except SessionLoadError as e:
+        pygame.quit()
+        raise SystemExit(str(e))
+
+    if FILTERS:
+        sensor_array.apply_filters(FILTERS, causal=CAUSAL_FILTERS)
+
     # Synchronize time in visualizers
-    syncTimes(motion_visualizers)
+    syncTimes(sensor_array)
 
-    # Initialize Pygame
-    pygame.init()
-    display_size = (800, 600)
-    pygame.display.set_mode(display_size, pygame.DOUBLEBUF | pygame.OPENGL)
+    # Get the maximum length of data, after drift correction may have changed it
+    last_index = sensor_array.get_length()
+    
+    # Send one packet per tick, once every device has reported it
+    udpHandler.setExpectedDevices(sensor_array.names)
+    
+    # Range statistics for slider selections, on the synchronized timeline
+    range_index = RangeIndex(sensor_array)
+    
+    # Second run, warped onto this one so the slider moves both in lockstep
+    if COMPARE_DEVICES:
+        from RunCompare import load_comparison
+        compare_array, compare_warp = load_comparison(sensor_array, COMPARE_DEVICES, deltaTime,
+                                                      FILTERS if not CAUSAL_FILTERS else None, SYNC_METHOD)
+
+    # Archive of turns to search for ones similar to the selection
+    if TURN_INDEX:
+        from TurnIndex import TurnIndex
+        turn_index = TurnIndex(TURN_INDEX)
+        print(f"Turn index {TURN_INDEX}: {len(turn_index)} turns from {len(turn_index.sessions)} sessions")
     
     # Initialize UI components
     ui_surface = pygame.Surface(display_size, pygame.SRCALPHA)
@@ -86,6 +142,11 @@ def init_3d():
     
     # Create slider after we know the last_index
     slider = Slider(50, display_size[1] - slider_y_offset, display_size[0] - 100, slider_height, 0, last_index - 1, 0)
+    slider.set_overview(overview_pyramid(sensor_array))
+    slider.flip_overview = True  # The UI surface is uploaded to OpenGL bottom-up
+    
+    # Scrolling accel/gyro/gravity plots above the slider
+    signal_plot = SignalPlot(x=10, y=display_size[1] // 2)
     
     # Initialize OpenGL
     glEnable(GL_DEPTH_TEST)
@@ -94,17 +155,21 @@ def init_3d():
     glMatrixMode(GL_MODELVIEW)
 
 
-# Initialize everything
-init_3d()
-
-# Initialize logic for each visualizer
-for motion_visualizer in motion_visualizers:
-    motion_visualizer.initialize()
-    motion_visualizer.start()
+def wait_for_session(loader):
+    # Keep the window responsive and show progress until every file is parsed
+    while not loader.done():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                exit()
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        draw_text(f"Loading session: {loader.completed} / {loader.total} files", 10, 10)
+        pygame.display.flip()
+        time.sleep(0.02)
 
 
 def handle_input():
-    global ENABLE_CAMERA_FOLLOW, PAUSED, camera_offset, camera_rotation, zoom_level, current_index, slider
+    global ENABLE_CAMERA_FOLLOW, ENABLE_PLOTS, PAUSED, camera_offset, camera_rotation, zoom_level, current_index, slider, plot_device
     
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
@@ -122,6 +187,11 @@ def handle_input():
                 PAUSED = not PAUSED
             elif event.key == pygame.K_c:
                 ENABLE_CAMERA_FOLLOW = not ENABLE_CAMERA_FOLLOW
+            elif event.key == pygame.K_p:
+                ENABLE_PLOTS = not ENABLE_PLOTS
+            elif event.key == pygame.K_o:
+                plot_device = (plot_device + 1) % sensor_array.count
+                signal_plot.clear()
             elif event.key == pygame.K_UP:
                 camera_offset[1] -= camera_speed
             elif event.key == pygame.K_DOWN:
@@ -148,6 +218,96 @@ def handle_input():
             elif event.key == pygame.K_PERIOD:
                 current_index = min(last_index - 1, current_index + 1)  # Go forward
                 slider.set_value(current_index)
+            elif event.key == pygame.K_LEFTBRACKET:
+                mark_selection(True)
+            elif event.key == pygame.K_RIGHTBRACKET:
+                mark_selection(False)
+            elif event.key == pygame.K_BACKSPACE:
+                set_selection(None, None)
+            elif event.key == pygame.K_f:
+                find_similar()
+            elif event.key == pygame.K_n:
+                show_next_match()
+
+def mark_selection(is_start):
+    """Set the start ([) or end (]) of the slider selection at the current sample"""
+    start, stop = selection
+    if is_start:
+        start = current_index
+        if stop is not None and stop <= start:
+            stop = None
+    else:
+        stop = current_index + 1
+        if start is not None and start >= stop:
+            start = None
+    set_selection(start, stop)
+
+def set_selection(start, stop):
+    """Select the slider range [start, stop) and compute its statistics once"""
+    global selection, selection_lines, matches, match_lines
+    selection = [start, stop]
+    matches, match_lines = [], []
+    if start is not None and stop is not None:
+        slider.set_selection(start, stop)
+        selection_lines = [f"Selection {start + 1} - {stop}"] + range_index.format(start, stop)
+    else:
+        slider.set_selection(None, None)
+        if start is not None:
+            selection_lines = [f"Selection from {start + 1}, press ] to end it"]
+        elif stop is not None:
+            selection_lines = [f"Selection to {stop}, press [ to start it"]
+        else:
+            selection_lines = []
+
+def find_similar():
+    """Search the turn index for the selection, or for the turn at the current sample"""
+    global session_signals, matches, match_number, match_lines
+    if turn_index is None:
+        match_lines = ["No turn index, start the player with --index"]
+        return
+    if session_signals is None:
+        from TurnIndex import turn_signals
+        session_signals = turn_signals(sensor_array)
+    
+    start, stop = selection
+    if start is None or stop is None:
+        starts, stops = turn_index.segments(session_signals)
+        around = np.flatnonzero((starts <= current_index) & (stops > current_index))
+        if len(around) == 0:
+            match_lines = ["No turn here, select one with [ and ]"]
+            return
+        start, stop = int(starts[around[0]]), int(stops[around[0]])
+        set_selection(start, stop)
+    
+    session_folder = os.path.dirname(os.path.abspath(DEVICES[0][1]))
+    matches = turn_index.query_range(session_signals, start, stop, session_folder, MATCHES)
+    match_number = -1
+    update_match_lines()
+
+def show_next_match():
+    """Show the next similar turn as the compared run, starting together with the selection"""
+    global compare_array, compare_warp, match_number, current_index, PAUSED
+    if not matches:
+        return
+    match_number = (match_number + 1) % len(matches)
+    compare_array, compare_warp = turn_index.load_match(matches[match_number], last_index, selection[0],
+                                                        FILTERS if not CAUSAL_FILTERS else None)
+    current_index = selection[0]
+    slider.set_value(current_index)
+    PAUSED = True
+    update_match_lines()
+
+def update_match_lines():
+    global match_lines
+    dt = turn_index.settings["dt"]
+    if not matches:
+        match_lines = ["No similar turns in the index"]
+        return
+    from TurnIndex import format_match
+    match_lines = ["Similar turns, press n to show the next:"]
+    for number, match in enumerate(matches):
+        marker = "> " if number == match_number else "  "
+        match_lines.append(marker + format_match(number + 1, match, dt))
 
 def move_camera_relative(distance):
     global camera_offset, camera_rotation
@@ -180,22 +340,9 @@ def draw_grid():
         glVertex3f(10, 0, i)
     glEnd()
 
-def draw_ui():
-    global slider, display_size, ui_surface, font
-    
-    # Save current OpenGL state
-    glPushAttrib(GL_ALL_ATTRIB_BITS)
-    glMatrixMode(GL_PROJECTION)
-    glPushMatrix()
-    glLoadIdentity()
-    # Use bottom-left as origin (0,0) to match Pygame coordinate system
-    glOrtho(0, display_size[0], 0, display_size[1], -1, 1)
-    glMatrixMode(GL_MODELVIEW)
-    glPushMatrix()
-    glLoadIdentity()
-    
-    # Disable depth test temporarily
-    glDisable(GL_DEPTH_TEST)
+def update_ui_texture():
+    """Render the slider into the UI surface and upload it to the UI texture"""
+    global ui_texture
     
     # Clear the surface
     ui_surface.fill((0, 0, 0, 0))  # Transparent
@@ -233,12 +380,40 @@ def draw_ui():
     # Use subsurface=False to prevent vertical flipping of the texture
     data = pygame.image.tostring(ui_surface, "RGBA", False)
     
-    # Create a texture
-    texture_id = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, texture_id)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
-    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, display_size[0], display_size[1], 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
+    # Create the texture once, then only replace its pixels
+    if ui_texture is None:
+        ui_texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, ui_texture)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, display_size[0], display_size[1], 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
+    else:
+        glBindTexture(GL_TEXTURE_2D, ui_texture)
+        glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, display_size[0], display_size[1], GL_RGBA, GL_UNSIGNED_BYTE, data)
+
+
+def draw_ui(refresh=True):
+    global slider, display_size, ui_surface, font
+    
+    # Save current OpenGL state
+    glPushAttrib(GL_ALL_ATTRIB_BITS)
+    glMatrixMode(GL_PROJECTION)
+    glPushMatrix()
+    glLoadIdentity()
+    # Use bottom-left as origin (0,0) to match Pygame coordinate system
+    glOrtho(0, display_size[0], 0, display_size[1], -1, 1)
+    glMatrixMode(GL_MODELVIEW)
+    glPushMatrix()
+    glLoadIdentity()
+    
+    # Disable depth test temporarily
+    glDisable(GL_DEPTH_TEST)
+    
+    # Re-render the slider only when due, otherwise redraw the last upload
+    if refresh or ui_texture is None:
+        update_ui_texture()
+    else:
+        glBindTexture(GL_TEXTURE_2D, ui_texture)
     
     # Enable texturing and blending
     glEnable(GL_TEXTURE_2D)
@@ -254,9 +429,6 @@ def draw_ui():
     glTexCoord2f(0, 1); glVertex2f(0, display_size[1])
     glEnd()
     
-    # Clean up
-    glDeleteTextures(1, [texture_id])
-    
     # Restore OpenGL state
     glMatrixMode(GL_PROJECTION)
     glPopMatrix()
@@ -265,8 +437,76 @@ def draw_ui():
     glPopAttrib()
 
 
+def draw_overlay_text(quality, status, compare_index):
+    """Draw the text lines over the scene"""
+    if compare_index is not None:
+        draw_text(f"Compared run: sample {compare_index + 1} / {compare_array.get_length()}", 10, 50)
+    draw_text(f"Sample {current_index+1} / {last_index}", 10, 10)
+    if quality["detail_text"]:
+        draw_text(f"Camera: {camera_offset}, Rot: {camera_rotation}", 10, 30)
+    if status is not None:
+        draw_text(status, display_size[0] - 9 * len(status), 10)
+    if ENABLE_PLOTS and quality["plots"]:
+        draw_text(f"Signals: {sensor_array.names[plot_device]} (acc / gyro / gravity)", 10, display_size[1] // 2 + 3 * signal_plot.lane_height + 5)
+    for line_number, line in enumerate(selection_lines + match_lines):
+        draw_text(line, 10, display_size[1] - 25 - 20 * line_number)
+
+
+def render_frame(quality=QUALITY_LEVELS[0], refresh_ui=True, status=None, refresh_text=True):
+    """
+    Draw one frame
+    
+    Args:
+        quality: Optional work to do, one of FrameGovernor.QUALITY_LEVELS
+        refresh_ui: Re-render the slider instead of reusing the last one
+        status: Extra line shown in the top right, e.g. the governor status
+        refresh_text: Re-render the overlay text instead of replaying the last one
+    """
+    global text_list
+    
+    # Clear the screen
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    
+    # Set up 3D scene
+    glLoadIdentity()
+    glTranslatef(*camera_offset)
+    glRotatef(camera_rotation[1], 1, 0, 0)
+    glRotatef(camera_rotation[0], 0, 1, 0)
+    glTranslatef(0, 0, zoom_level)
+
+    # Draw 3D elements
+    draw_grid()
+    sensor_array.draw(quality["glyph_detail"])
+    compare_index = None
+    if compare_array is not None:
+        compare_index = compare_warp[min(current_index, last_index - 1)]
+        compare_array.seek(compare_index)
+        glPushMatrix()
+        glTranslatef(COMPARE_OFFSET, 0, 0)
+        compare_array.draw(quality["glyph_detail"])
+        glPopMatrix()
+    if ENABLE_PLOTS and quality["plots"]:
+        signal_plot.draw(display_size, quality["trail_stride"])
+    
+    # Every glyph is a separate GL call, so the text is compiled into a display list when due and replayed otherwise
+    if refresh_text or text_list is None:
+        if text_list is None:
+            text_list = glGenLists(1)
+        glNewList(text_list, GL_COMPILE_AND_EXECUTE)
+        draw_overlay_text(quality, status, compare_index)
+        glEndList()
+    else:
+        glCallList(text_list)
+    
+    # Draw 2D UI elements on top
+    draw_ui(refresh_ui)
+
+
 def animate_3d():
-    global PAUSED, current_index, last_index, motion_visualizers, camera_offset, camera_rotation, zoom_level, deltaTime, slider
+    global PAUSED, current_index, last_index, sensor_array, camera_offset, camera_rotation, zoom_level, deltaTime, slider, governor
+    
+    # Playback follows the wall clock; slow frames lower the drawing quality, not the sample rate
+    governor = FrameGovernor(deltaTime, FRAME_BUDGET)
     
     while True:
         handle_input()
@@ -275,47 +515,118 @@ def animate_3d():
             current_index = 0  # Restart animation and pause at first frame
             slider.set_value(0)
             
-            for motion_visualizer in motion_visualizers:
-                motion_visualizer.reset_state()
+            sensor_array.reset_state()
+            signal_plot.clear()
             PAUSED = True
         
-        # Clear the screen
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        
-        # Set up 3D scene
-        glLoadIdentity()
-        glTranslatef(*camera_offset)
-        glRotatef(camera_rotation[1], 1, 0, 0)
-        glRotatef(camera_rotation[0], 0, 1, 0)
-        glTranslatef(0, 0, zoom_level)
-    
-        # Draw 3D elements
-        draw_grid()
-        
-        # Draw 3D visualization
-        for motion_visualizer in motion_visualizers:
-            motion_visualizer.run(current_index, PAUSED)
-        
-        for motion_visualizer in motion_visualizers:
-            motion_visualizer.afterRun(current_index, PAUSED)
+        # Advance all devices through every sample due since the last frame and send each one
+        due = min(governor.samples_due(PAUSED), last_index - current_index)
+        if PAUSED:
+            sensor_array.step(current_index, PAUSED)
+            sensor_array.publish(udpHandler, tick=current_index)
+        for offset in range(due):
+            sensor_array.step(current_index + offset, False)
+            sensor_array.publish(udpHandler, tick=current_index + offset)
             
-        # Add OpenGL text in 3D space
-        draw_text(f"Sample {current_index+1} / {last_index}", 10, 10)
-        draw_text(f"Camera: {camera_offset}, Rot: {camera_rotation}", 10, 30)
+            # Feed the scrolling plots with the sample just consumed
+            signal_plot.push(sensor_array.acc[plot_device], sensor_array.rate[plot_device], sensor_array.grav[plot_device])
+        if due:
+            current_index += due - 1  # Show the latest sample
         
-        # Draw 2D UI elements on top
-        draw_ui()
+        render_frame(governor.settings, governor.every("ui_interval"), governor.status(), governor.every("text_interval"))
         
-        # Update display
+        # Update display; waiting for vsync in the swap is not work the budget can save
+        governor.end_work()
         pygame.display.flip()
+        governor.start_work()
         
         # Update animation index
-        if not PAUSED:
+        if due:
             current_index += 1
             slider.set_value(current_index)
-            
-        time.sleep(deltaTime)
+        
+        # Sleep until the next sample is due
+        governor.end_frame()
+
+
+def main(devices=None, udp_handler=None, shared_session=None, frame_budget=None):
+    """
+    Run the player
+    
+    Args:
+        devices: List of (name, session folder) tuples, defaults to DEVICES
+        udp_handler: UDPHandler to send to, defaults to 127.0.0.1:5005
+        shared_session: Name of a shared session to attach to or create
+        frame_budget: Seconds per frame before optional drawing is reduced, defaults to FRAME_BUDGET
+    """
+    global DEVICES, udpHandler, SHARED_SESSION, FRAME_BUDGET
+    if devices is not None:
+        DEVICES = devices
+    if frame_budget is not None:
+        FRAME_BUDGET = frame_budget
+    SHARED_SESSION = shared_session
+    udpHandler = udp_handler if udp_handler is not None else UDPHandler()
+    
+    # Initialize everything
+    init_3d()
+    
+    # Initialize logic for each visualizer
+    for motion_visualizer in motion_visualizers:
+        motion_visualizer.initialize()
+        motion_visualizer.start()
+    sensor_array.reset_state()
+    
+    # Start animation loop
+    animate_3d()
+
+
+def export_video(sink, fps=30, size=(1280, 720), devices=None):
+    """
+    Render the whole session offscreen at a fixed frame rate and hand every
+    frame to `sink` (see VideoExporter). Playback time advances by 1 / fps per
+    frame regardless of how long rendering takes.
+    
+    Args:
+        sink: FrameSink receiving (height, width, 4) RGBA frames
+        fps: Video frame rate
+        size: Video size as (width, height)
+        devices: List of (name, session folder) tuples, defaults to DEVICES
+    """
+    global DEVICES, udpHandler, current_index
+    if devices is not None:
+        DEVICES = devices
+    udpHandler = UDPHandler()
+    from VideoExporter import OffscreenTarget, PixelReadback
+    
+    init_3d(size, hidden=True)
+    target = OffscreenTarget(*size)
+    target.bind()
+    readback = PixelReadback(*size)
+    
+    # Step every sample so the integration matches playback, render once per frame
+    samples_per_frame = 1.0 / (fps * deltaTime)
+    frames = int((last_index - 1) / samples_per_frame) + 1
+    sensor_array.reset_state()
+    stepped = 0
+    for frame in range(frames):
+        current_index = min(last_index - 1, int(frame * samples_per_frame))
+        while stepped <= current_index:
+            sensor_array.step(stepped, False)
+            signal_plot.push(sensor_array.acc[plot_device], sensor_array.rate[plot_device], sensor_array.grav[plot_device])
+            stepped += 1
+        slider.set_value(current_index)
+        
+        render_frame()
+        pixels = readback.read()
+        if pixels is not None:
+            sink.write(pixels)
+    
+    for pixels in readback.flush():
+        sink.write(pixels)
+    sink.close()
+    pygame.quit()
+    print(f"Exported {frames} frames at {fps} fps")
 
 
-# Start animation loop
-animate_3d()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
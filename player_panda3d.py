@@ -1,20 +1,47 @@
+import os
 import time
 import numpy as np
 from direct.showbase.ShowBase import ShowBase
 from direct.gui.DirectGui import DirectSlider, DirectFrame, DirectLabel, DGG
 from direct.gui.OnscreenText import OnscreenText
 from panda3d.core import *
-import MotionVisualizer
+from SessionLoader import SessionLoader, SessionLoadError
+from SensorArray import SensorArray
+from SignalPyramid import overview_pyramid
+from RangeStats import RangeIndex
+from ModelCache import load_cached_model
+from FrameGovernor import FrameGovernor
+from SignalPlot import SignalRing, AXIS_COLORS
 from UDPHandler import UDPHandler
 
 class MotionVisualizerApp(ShowBase):
-    def __init__(self):
+    def __init__(self, devices=None, udp_handler=None, offscreen_size=None, shared_session=None,
+                 filters=None, causal_filters=False, gpu_playback=False, sync_method="timestamps",
+                 compare_devices=None, frame_budget=1.0 / 60.0, turn_index=None):
+        """
+        Args:
+            devices: List of (name, session folder) tuples, defaults to Set3 Left/Right
+            udp_handler: UDPHandler to send to, defaults to 127.0.0.1:5005
+            offscreen_size: (width, height) to render into an offscreen buffer instead of a window
+            shared_session: Name of a shared session to attach to or create, see SessionStore
+            filters: Channel -> filter stages, see SignalFilter.parse_filters
+            causal_filters: Run the filters sample by sample instead of zero-phase
+            gpu_playback: Pose the devices in a vertex shader from tracks uploaded once, see GPUPlayback
+            sync_method: "timestamps", or "correlate" / "drift" to estimate clock offsets from the motion, see ClockSync
+            compare_devices: (name, session folder) tuples of a second run shown time-warped next to this one
+            frame_budget: Seconds per frame before optional work is reduced, see FrameGovernor
+            turn_index: Folder of a similar-turn index searched with f, see TurnIndex
+        """
+        if offscreen_size is not None:
+            loadPrcFileData("", f"window-type offscreen\nwin-size {offscreen_size[0]} {offscreen_size[1]}")
+        
         # Initialize ShowBase
         ShowBase.__init__(self)
         
         # Flags for enabling/disabling features
         self.ENABLE_GRID = True
         self.ENABLE_CAMERA_FOLLOW = True
+        self.ENABLE_PLOTS = True
         self.PAUSED = True  # Start paused at the first frame
         
         # Camera controls
@@ -28,10 +55,17 @@ class MotionVisualizerApp(ShowBase):
         # Sample index control
         self.current_index = 0
         self.motion_visualizers = []
+        self.sensor_array = None
         self.last_index = 0
         
+        # Devices to load as (name, session folder)
+        self.device_paths = devices if devices is not None else [
+            ("left", "data/Skimulator/Set3/Left/"),
+            ("right", "data/Skimulator/Set3/Right/"),
+        ]
+        
         # UDP handler
-        self.udpHandler = UDPHandler()
+        self.udpHandler = udp_handler if udp_handler is not None else UDPHandler()
         
         # Set up Panda3D window
         self.win.setClearColor(Vec4(0.1, 0.1, 0.1, 1))
@@ -45,14 +79,44 @@ class MotionVisualizerApp(ShowBase):
         # Set up keyboard inputs
         self.setup_inputs()
         
-        # Initialize visualizers and UI
-        self.init_visualizers()
-        self.init_ui()
+        # Load all session files in parallel; visualizers and UI are set up
+        # by the load task once they are in, so the window opens right away.
+        # A shared session is mapped from the processes that already loaded it.
+        self.shared_session = shared_session
+        self.filters = filters or {}
+        self.causal_filters = causal_filters
+        self.use_gpu_playback = gpu_playback
+        self.sync_method = sync_method
+        self.compare_devices = compare_devices
+        self.compare_array = None
+        self.compare_warp = None
+        self.compare_offset = 6.0  # Sideways distance of the second run in the scene
+        self.compare_root = None
+        self.devices_instanced = False
+        self.turn_index = None
+        if turn_index:
+            from TurnIndex import TurnIndex
+            self.turn_index = TurnIndex(turn_index)
+        self.session_signals = None  # turn_signals() of this session, computed on the first search
+        self.matches = []
+        self.match_number = -1
+        self.gpu_playback = None
+        self.frame_budget = frame_budget
+        self.governor = None
+        self.session_store = None
+        self.session_loader = None
+        if shared_session is None:
+            self.session_loader = SessionLoader(self.device_paths, self.udpHandler, self.deltaTime).start()
+        self.loading_text = OnscreenText(
+            text="Loading session...",
+            pos=(-0.95, 0.9),
+            scale=0.05,
+            fg=(1, 1, 1, 1),
+            align=TextNode.ALeft
+        )
+        self.taskMgr.add(self.wait_for_session, "LoadTask")
         
         self.load_fbx_model("AlpineSkiBootA1Mat_right.fbx")
-
-        # Set up update task
-        self.taskMgr.add(self.update, "UpdateTask")
         
         # Create a grid
         if self.ENABLE_GRID:
@@ -60,12 +124,12 @@ class MotionVisualizerApp(ShowBase):
     
     def load_fbx_model(self, model_path):
         try:
-            self.model = self.loader.loadModel(model_path)
+            # Converted once to a flattened .bam with the size adjustment baked in
+            self.model = load_cached_model(self.loader, model_path, scale=0.001)
             if not self.model:
                 print(f"Failed to load FBX: {model_path}")
                 return
             
-            self.model.setScale(0.001)  # Adjust size
             self.model.setPos(0, 10, 0)  # Move it in front of the camera
             self.model.reparentTo(self.render)  # Attach to scene
             
@@ -83,15 +147,17 @@ class MotionVisualizerApp(ShowBase):
     def setup_lighting(self):
         light = DirectionalLight('light')
         light.setColor((1, 1, 1, 1))
-        light_np = self.render.attachNewNode(light)
-        light_np.setHpr(-45, -45, 0)
-        self.render.setLight(light_np)
+        self.light_np = self.render.attachNewNode(light)
+        self.light_np.setHpr(-45, -45, 0)
+        self.render.setLight(self.light_np)
 
     def setup_inputs(self):
         """Set up keyboard controls"""
         self.accept("escape", self.exit_app)
         self.accept("space", self.toggle_pause)
         self.accept("c", self.toggle_camera_follow)
+        self.accept("p", self.toggle_plots)
+        self.accept("o", self.cycle_plot_device)
         self.accept("arrow_up", self.camera_move, [0, 1, 0, self.camera_speed])
         self.accept("arrow_down", self.camera_move, [0, -1, 0, self.camera_speed])
         self.accept("arrow_left", self.camera_move, [-1, 0, 0, self.camera_speed])
@@ -105,48 +171,119 @@ class MotionVisualizerApp(ShowBase):
         self.accept("-", self.zoom_camera, [-self.zoom_speed])
         self.accept(",", self.step_frame, [-1])
         self.accept(".", self.step_frame, [1])
+        self.accept("[", self.mark_selection, [True])
+        self.accept("]", self.mark_selection, [False])
+        self.accept("backspace", self.clear_selection)
+        self.accept("f", self.find_similar)
+        self.accept("n", self.show_next_match)
+    
+    def wait_for_session(self, task):
+        """Show loading progress until every session file is parsed"""
+        if self.session_loader is None:
+            self.finish_loading()
+            return task.done
+        self.loading_text.setText(f"Loading session: {self.session_loader.completed} / {self.session_loader.total} files")
+        if not self.session_loader.done():
+            return task.cont
+        self.finish_loading()
+        return task.done
+    
+    def finish_loading(self):
+        """Set up visualizers, UI and the update task from the loaded session"""
+        if self.sensor_array is not None:
+            return
+        try:
+            if self.shared_session is not None:
+                from SessionStore import open_shared_session
+                self.session_store, visualizers, sensor_array = open_shared_session(
+                    self.shared_session, self.device_paths, self.udpHandler, self.deltaTime)
+            else:
+                visualizers, sensor_array = self.session_loader.result(), None
+        except SessionLoadError as e:
+            # Raised before removing the load task, the task manager drops exceptions of removed tasks
+            raise SystemExit(str(e))
+        self.taskMgr.remove("LoadTask")
+        self.init_visualizers(visualizers, sensor_array)
+        self.init_ui()
+        self.loading_text.destroy()
+        
+        # Set up update task; playback follows the wall clock, slow frames reduce optional work
+        self.governor = FrameGovernor(self.deltaTime, self.frame_budget)
+        self.taskMgr.add(self.update, "UpdateTask")
     
-    def init_visualizers(self):
+    def init_visualizers(self, motion_visualizers, sensor_array=None):
         """Initialize motion visualizers"""
-        left = "data/Skimulator/Set3/Left/"
-        right = "data/Skimulator/Set3/Right/"
-        self.motion_visualizers.append(MotionVisualizer.MotionVisualizer(left, True, self.udpHandler, self.deltaTime))
-        self.motion_visualizers.append(MotionVisualizer.MotionVisualizer(right, False, self.udpHandler, self.deltaTime))
+        self.motion_visualizers.extend(motion_visualizers)
         
-        # Get the maximum length of data
-        for motion_visualizer in self.motion_visualizers:
-            self.last_index = max(self.last_index, motion_visualizer.get_length())
+        # Stack all devices so they advance together
+        self.sensor_array = sensor_array if sensor_array is not None else SensorArray(self.motion_visualizers)
+        if self.filters:
+            self.sensor_array.apply_filters(self.filters, causal=self.causal_filters)
         
         # Synchronize time in visualizers
         self.sync_times()
         
+        # Get the maximum length of data, after drift correction may have changed it
+        self.last_index = self.sensor_array.get_length()
+        
+        # Send one packet per tick, once every device has reported it
+        self.udpHandler.setExpectedDevices(self.sensor_array.names)
+        
+        # Range statistics for slider selections, on the synchronized timeline
+        self.range_index = RangeIndex(self.sensor_array)
+        self.selection = [None, None]
+        self.selection_lines = []
+        self.match_lines = []
+        
         # Initialize logic for each visualizer
         for motion_visualizer in self.motion_visualizers:
             motion_visualizer.initialize()
             motion_visualizer.start()
             
             # Add a new NodePath to render for each visualizer
-            motion_visualizer.node_path = self.render.attachNewNode(f"visualizer-{id(motion_visualizer)}")
+            motion_visualizer.node_path = self.render.attachNewNode(f"visualizer-{motion_visualizer.name}")
+        self.sensor_array.reset_state()
+        
+        # Upload the whole session once and let the GPU pose a boot per device
+        if self.use_gpu_playback and getattr(self, "model", None):
+            from GPUPlayback import GPUPlayback
+            self.gpu_playback = GPUPlayback(self.sensor_array)
+            self.gpu_playback.attach(self.render, [v.node_path for v in self.motion_visualizers],
+                                     self.model, self.light_np)
+            self.model.hide()
+        
+        # Second run, warped onto this one so the slider moves both in lockstep
+        if self.compare_devices and getattr(self, "model", None):
+            from RunCompare import load_comparison
+            self.show_compare(*load_comparison(
+                self.sensor_array, self.compare_devices, self.deltaTime,
+                self.filters if not self.causal_filters else None, self.sync_method))
+    
+    def show_compare(self, compare_array, compare_warp):
+        """
+        Show a second run next to this one, at compare_warp[i] while this run is
+        at i; both runs get a boot per device, posed on the CPU unless on the GPU already
+        """
+        if not getattr(self, "model", None):
+            return
+        if self.compare_root is not None:
+            self.compare_root.removeNode()
+        self.compare_array, self.compare_warp = compare_array, compare_warp
+        self.compare_root = self.render.attachNewNode("compared-run")
+        self.compare_root.setX(self.compare_offset)
+        self.compare_nodes = [self.compare_root.attachNewNode(f"compared-{name}") for name in self.compare_array.names]
+        nodes = list(self.compare_nodes)
+        if self.gpu_playback is None and not self.devices_instanced:
+            nodes += [v.node_path for v in self.motion_visualizers]
+            self.devices_instanced = True
+        for node in nodes:
+            for child in self.model.getChildren():
+                child.instanceTo(node)
+        self.model.hide()
     
     def sync_times(self):
         """Synchronize the start times of the motion visualizers"""
-        if len(self.motion_visualizers) >= 2:
-            startTime1 = self.motion_visualizers[0].time[0]
-            startTime2 = self.motion_visualizers[1].time[0]
-            
-            index = 0
-            if startTime1 > startTime2:
-                while startTime2 < startTime1:
-                    index += 1
-                    startTime2 = self.motion_visualizers[1].time[index]
-                self.motion_visualizers[0].set_start_index(index)
-                print("startTime2 < startTime1 : Index: ", index)
-            elif startTime2 > startTime1:
-                while startTime1 < startTime2:
-                    index += 1
-                    startTime1 = self.motion_visualizers[0].time[index]
-                self.motion_visualizers[1].set_start_index(index)
-                print("startTime2 > startTime1 : Index: ", index)
+        self.sensor_array.sync_times(self.sync_method)
     
     def init_ui(self):
         """Initialize the UI elements"""
@@ -177,6 +314,38 @@ class MotionVisualizerApp(ShowBase):
             size=(1.8, 0.05),
             command=self.slider_changed
         )
+        self.slider.set_overview(overview_pyramid(self.sensor_array))
+        
+        # Scrolling accel/gyro/gravity plots for one device
+        self.plot_device = 0
+        self.signal_plot = SignalPlot(self, position=(-1.25, 0, -0.2), size=(0.9, 0.12))
+        self.plot_text = OnscreenText(
+            text=f"Signals: {self.sensor_array.names[self.plot_device]} (acc / gyro / gravity)",
+            pos=(-1.25, 0.3),
+            scale=0.04,
+            fg=(1, 1, 1, 1),
+            align=TextNode.ALeft
+        )
+        
+        # Statistics of the slider selection set with [ and ]
+        self.selection_text = OnscreenText(
+            text="",
+            pos=(-1.25, 0.75),
+            scale=0.035,
+            fg=(1, 1, 1, 1),
+            align=TextNode.ALeft,
+            mayChange=True
+        )
+        
+        # Current quality level of the frame budget governor
+        self.quality_text = OnscreenText(
+            text="",
+            pos=(1.3, 0.9),
+            scale=0.04,
+            fg=(1, 1, 1, 1),
+            align=TextNode.ARight,
+            mayChange=True
+        )
     
     def create_grid(self):
         """Create a reference grid on the ground"""
@@ -275,6 +444,123 @@ class MotionVisualizerApp(ShowBase):
         """Toggle camera follow mode"""
         self.ENABLE_CAMERA_FOLLOW = not self.ENABLE_CAMERA_FOLLOW
     
+    def toggle_plots(self):
+        """Toggle the scrolling signal plots"""
+        if self.sensor_array is None:
+            return
+        self.ENABLE_PLOTS = not self.ENABLE_PLOTS
+        if self.ENABLE_PLOTS:
+            self.signal_plot.node_path.show()
+            self.plot_text.show()
+        else:
+            self.signal_plot.node_path.hide()
+            self.plot_text.hide()
+    
+    def cycle_plot_device(self):
+        """Show the next device in the signal plots"""
+        if self.sensor_array is None:
+            return
+        self.plot_device = (self.plot_device + 1) % self.sensor_array.count
+        self.signal_plot.clear()
+        self.plot_text.setText(f"Signals: {self.sensor_array.names[self.plot_device]} (acc / gyro / gravity)")
+    
+    def mark_selection(self, is_start):
+        """Set the start ([) or end (]) of the slider selection at the current frame"""
+        if self.sensor_array is None:
+            return
+        start, stop = self.selection
+        if is_start:
+            start = self.current_index
+            if stop is not None and stop <= start:
+                stop = None
+        else:
+            stop = self.current_index + 1
+            if start is not None and start >= stop:
+                start = None
+        self.selection = [start, stop]
+        self.update_selection()
+    
+    def clear_selection(self):
+        """Remove the slider selection"""
+        if self.sensor_array is None:
+            return
+        self.selection = [None, None]
+        self.update_selection()
+    
+    def update_selection(self):
+        """Highlight the selection and show its statistics; queried once per change"""
+        start, stop = self.selection
+        self.matches, self.match_lines = [], []
+        if start is not None and stop is not None:
+            self.slider.set_selection(start, stop)
+            lines = [f"Selection {start + 1} - {stop}"] + self.range_index.format(start, stop)
+        else:
+            self.slider.set_selection(None, None)
+            if start is not None:
+                lines = [f"Selection from {start + 1}, press ] to end it"]
+            elif stop is not None:
+                lines = [f"Selection to {stop}, press [ to start it"]
+            else:
+                lines = []
+        self.selection_lines = lines
+        self.selection_text.setText("\n".join(lines))
+    
+    def find_similar(self):
+        """Search the turn index for the selection, or for the turn at the current frame"""
+        if self.sensor_array is None:
+            return
+        if self.turn_index is None:
+            self.show_match_lines(["No turn index, start the player with --index"])
+            return
+        if self.session_signals is None:
+            from TurnIndex import turn_signals
+            self.session_signals = turn_signals(self.sensor_array)
+        
+        start, stop = self.selection
+        if start is None or stop is None:
+            starts, stops = self.turn_index.segments(self.session_signals)
+            around = np.flatnonzero((starts <= self.current_index) & (stops > self.current_index))
+            if len(around) == 0:
+                self.show_match_lines(["No turn here, select one with [ and ]"])
+                return
+            self.selection = [int(starts[around[0]]), int(stops[around[0]])]
+            self.update_selection()
+            start, stop = self.selection
+        
+        session_folder = os.path.dirname(os.path.abspath(self.device_paths[0][1]))
+        self.matches = self.turn_index.query_range(self.session_signals, start, stop, session_folder, 5)
+        self.match_number = -1
+        self.update_match_lines()
+    
+    def show_next_match(self):
+        """Show the next similar turn as the compared run, starting together with the selection"""
+        if not self.matches:
+            return
+        self.match_number = (self.match_number + 1) % len(self.matches)
+        self.show_compare(*self.turn_index.load_match(self.matches[self.match_number], self.last_index,
+                                                      self.selection[0],
+                                                      self.filters if not self.causal_filters else None))
+        self.current_index = self.selection[0]
+        self.slider.set_value(self.current_index, from_update=True)
+        self.PAUSED = True
+        self.update_match_lines()
+    
+    def update_match_lines(self):
+        if not self.matches:
+            self.show_match_lines(["No similar turns in the index"])
+            return
+        from TurnIndex import format_match
+        lines = ["Similar turns, press n to show the next:"]
+        for number, match in enumerate(self.matches):
+            marker = "> " if number == self.match_number else "  "
+            lines.append(marker + format_match(number + 1, match, self.turn_index.settings["dt"]))
+        self.show_match_lines(lines)
+    
+    def show_match_lines(self, lines):
+        """Show search results below the selection statistics"""
+        self.match_lines = lines
+        self.selection_text.setText("\n".join(self.selection_lines + lines))
+    
     def exit_app(self):
         """Exit the application cleanly"""
         self.userExit()
@@ -290,33 +576,122 @@ class MotionVisualizerApp(ShowBase):
         """Handle slider value changes"""
         self.current_index = int(self.slider.get_value())
     
+    def pose_devices(self):
+        """Pose each device node from the stacked state"""
+        if self.gpu_playback is not None:
+            self.gpu_playback.set_index(self.current_index)
+        else:
+            for motion_visualizer, pos, ypr in zip(self.motion_visualizers, self.sensor_array.pos, self.sensor_array.ypr):
+                motion_visualizer.node_path.setPosHpr(*pos, *ypr)
+        
+        if self.compare_array is not None:
+            compare_index = self.compare_warp[min(self.current_index, self.last_index - 1)]
+            self.compare_array.seek(compare_index)
+            for node, pos, ypr in zip(self.compare_nodes, self.compare_array.pos, self.compare_array.ypr):
+                node.setPosHpr(*pos, *ypr)
+    
+    def export_video(self, sink, fps=30):
+        """
+        Render the whole session at a fixed frame rate and hand every frame to
+        `sink` (see VideoExporter). Playback time advances by 1 / fps per frame
+        regardless of how long rendering takes. Best used with offscreen_size.
+        """
+        self.finish_loading()
+        self.taskMgr.remove("UpdateTask")
+        
+        # Panda3D copies the framebuffer into the texture's RAM image after each frame
+        texture = Texture()
+        self.win.addRenderTexture(texture, GraphicsOutput.RTMCopyRam)
+        
+        # Step every sample so the integration matches playback, render once per frame
+        samples_per_frame = 1.0 / (fps * self.deltaTime)
+        frames = int((self.last_index - 1) / samples_per_frame) + 1
+        self.sensor_array.reset_state()
+        self.signal_plot.clear()
+        stepped = 0
+        for frame in range(frames):
+            self.current_index = min(self.last_index - 1, int(frame * samples_per_frame))
+            while stepped <= self.current_index:
+                self.sensor_array.step(stepped, False)
+                self.signal_plot.push(self.sensor_array.acc[self.plot_device],
+                                      self.sensor_array.rate[self.plot_device],
+                                      self.sensor_array.grav[self.plot_device])
+                stepped += 1
+            self.signal_plot.update()
+            self.pose_devices()
+            self.frame_text.setText(f"Frame: {self.current_index+1} / {self.last_index}")
+            self.slider.set_value(self.current_index, from_update=True)
+            
+            self.graphicsEngine.renderFrame()
+            pixels = np.frombuffer(memoryview(texture.getRamImageAs("RGBA")), dtype=np.uint8)
+            # RAM images start at the bottom row
+            sink.write(pixels.reshape(texture.getYSize(), texture.getXSize(), 4)[::-1])
+        
+        sink.close()
+        print(f"Exported {frames} frames at {fps} fps")
+    
     def update(self, task):
         """Main update loop"""
-        # Update frame counter and UI elements
-        self.frame_text.setText(f"Frame: {self.current_index+1} / {self.last_index}")
-        self.camera_text.setText(f"Camera: {self.camera_offset}, Rot: {self.camera_rotation}")
-        
-        # Update motion visualizers
-        for motion_visualizer in self.motion_visualizers:
-            motion_visualizer.run(self.current_index, self.PAUSED)
+        # Swap in the frame rendered since the last update here rather than in
+        # the next render, so its wait for vsync is left out of the frame time
+        self.governor.end_work()
+        self.graphicsEngine.flipFrame()
+        self.governor.start_work()
+        
+        quality = self.governor.settings
+        
+        # Update frame counter and UI elements, less often when frames run over budget
+        if self.governor.every("text_interval"):
+            self.frame_text.setText(f"Frame: {self.current_index+1} / {self.last_index}")
+            self.quality_text.setText(self.governor.status())
+            if quality["detail_text"]:
+                self.camera_text.setText(f"Camera: {self.camera_offset}, Rot: {self.camera_rotation}")
+        
+        # Hide the overlays the current level has no time for
+        if quality["detail_text"]:
+            self.camera_text.show()
+        else:
+            self.camera_text.hide()
+        if self.ENABLE_PLOTS:
+            if quality["plots"]:
+                self.signal_plot.node_path.show()
+            else:
+                self.signal_plot.node_path.hide()
+        
+        # Advance all devices through every sample due since the last frame and send each one
+        due = min(self.governor.samples_due(self.PAUSED), self.last_index - self.current_index)
+        if self.PAUSED:
+            self.sensor_array.step(self.current_index, self.PAUSED)
+            self.sensor_array.publish(self.udpHandler, tick=self.current_index)
+        for offset in range(due):
+            self.sensor_array.step(self.current_index + offset, False)
+            self.sensor_array.publish(self.udpHandler, tick=self.current_index + offset)
+            
+            # Feed the scrolling plots with the sample just consumed
+            self.signal_plot.push(self.sensor_array.acc[self.plot_device],
+                                  self.sensor_array.rate[self.plot_device],
+                                  self.sensor_array.grav[self.plot_device])
+        if due:
+            self.current_index += due - 1  # Show the latest sample
+        self.signal_plot.update()
         
-        for motion_visualizer in self.motion_visualizers:
-            motion_visualizer.afterRun(self.current_index, self.PAUSED)
+        self.pose_devices()
         
         # Advance to next frame if not paused
-        if not self.PAUSED:
+        if due:
             self.current_index += 1
             if self.current_index >= self.last_index:
                 self.current_index = 0
-                for motion_visualizer in self.motion_visualizers:
-                    motion_visualizer.reset_state()
+                self.sensor_array.reset_state()
+                self.signal_plot.clear()
                 self.PAUSED = True
             
             # Update slider position without triggering callbacks
-            self.slider.set_value(self.current_index, from_update=True)
+            if self.PAUSED or self.governor.every("ui_interval"):
+                self.slider.set_value(self.current_index, from_update=True)
         
-        # Sleep to maintain frame rate
-        time.sleep(self.deltaTime)
+        # Sleep until the next sample is due
+        self.governor.end_frame()
         
         return task.cont
 
@@ -339,6 +714,9 @@ class Slider:
         self._value = value
         self.command = command
         self._updating = False
+        self.size = size
+        self.overview_np = None
+        self.selection_np = None
         
         # Create slider frame
         self.frame = DirectFrame(
@@ -361,6 +739,53 @@ class Slider:
             parent=self.frame
         )
     
+    def set_overview(self, pyramid, pixel_width=None, colors=((0.35, 0.65, 1.0, 1.0), (1.0, 0.65, 0.25, 1.0))):
+        """Draw a SignalPyramid min/max overview behind the slider thumb"""
+        if self.overview_np is not None:
+            self.overview_np.removeNode()
+            self.overview_np = None
+        
+        # One column per screen pixel covered by the slider
+        if pixel_width is None:
+            pixel_width = max(1, int(self.app.win.getYSize() * self.size[0] / 2))
+        mins, maxs = pyramid.query(self.min_value, self.max_value + 1, pixel_width)
+        low, high = pyramid.get_range()
+        scale = np.where(high > low, high - low, 1.0)
+        
+        width, height = self.size
+        xs = -width / 2 + width * (np.arange(len(mins)) + 0.5) / max(1, len(mins))
+        bottom = -height / 2 + (mins - low) / scale * height
+        top = -height / 2 + (maxs - low) / scale * height
+        
+        segs = LineSegs("slider-overview")
+        for channel in range(mins.shape[1]):
+            segs.setColor(*colors[channel % len(colors)])
+            for x, z0, z1 in zip(xs, bottom[:, channel], top[:, channel]):
+                segs.moveTo(x, 0, z0)
+                segs.drawTo(x, 0, z1)
+        
+        # Parent under the slider with a low sort so the thumb stays on top
+        self.overview_np = NodePath(segs.create())
+        self.overview_np.reparentTo(self.slider, -1)
+    
+    def set_selection(self, start, stop):
+        """Highlight the value range [start, stop), or nothing if start is None"""
+        if self.selection_np is not None:
+            self.selection_np.removeNode()
+            self.selection_np = None
+        if start is None:
+            return
+        
+        width, height = self.size
+        span = max(1, self.max_value - self.min_value)
+        left = -width / 2 + width * (start - self.min_value) / span
+        right = max(left + 0.002, -width / 2 + width * (stop - self.min_value) / span)
+        card = CardMaker("slider-selection")
+        card.setFrame(left, right, -height / 2, height / 2)
+        self.selection_np = self.slider.attachNewNode(card.generate(), -1)
+        self.selection_np.setColor(1, 1, 1, 0.3)
+        self.selection_np.setTransparency(TransparencyAttrib.MAlpha)
+    
     def _on_value_changed(self):
         """Internal callback when slider value changes"""
         if not self._updating:
@@ -383,6 +808,82 @@ class Slider:
         self._updating = False
 
 
+class SignalPlot:
+    def __init__(self, app, window=500, position=(0, 0, 0), size=(1, 0.1)):
+        """
+        Scrolling accel/gyro/gravity plot drawn from a SignalRing
+        
+        The vertex data mirrors the ring row for row, so the visible window is
+        one run of consecutive vertices per axis and the node is shifted left
+        instead of moving any vertex data. push() only touches the ring;
+        update() writes the rows pushed since the last frame.
+        
+        Args:
+            app: The Panda3D application instance
+            window: Number of samples shown
+            position: Left edge of the top lane in aspect2d (x, y, z)
+            size: Width and lane height as (width, height)
+        """
+        self.app = app
+        self.ring = SignalRing(window)
+        self.window = window
+        self.width, self.lane_height = size
+        
+        # Line-major layout so each axis is a run of consecutive rows
+        vdata = GeomVertexData('signal-plot', GeomVertexFormat.getV3c4(), Geom.UHDynamic)
+        vdata.setNumRows(self.ring.lines * self.ring.capacity)
+        vertex = GeomVertexWriter(vdata, 'vertex')
+        color = GeomVertexWriter(vdata, 'color')
+        for line in range(self.ring.lines):
+            for row in range(self.ring.capacity):
+                vertex.addData3f(row, 0, self._lane_center(line // 3))
+                color.addData4f(*AXIS_COLORS[line % 3], 1.0)
+        
+        self.geom = Geom(vdata)
+        self.geom.addPrimitive(GeomLinestrips(Geom.UHDynamic))
+        
+        node = GeomNode('signal-plot')
+        node.addGeom(self.geom)
+        self.node_path = app.aspect2d.attachNewNode(node)
+        self.node_path.setScale(self.width / window, 1, 1)
+        self.position = position
+        self.update()
+    
+    def _lane_center(self, lane):
+        return -(lane + 0.5) * self.lane_height
+    
+    def clear(self):
+        self.ring.clear()
+        self.update()
+    
+    def push(self, acc, gyro, gravity):
+        """Append one sample of each channel (3 values each) to the ring"""
+        self.ring.push(acc, gyro, gravity)
+    
+    def update(self):
+        """Write the rows pushed since the last frame and scroll to the newest sample"""
+        dirty = self.ring.take_dirty()
+        if dirty is None:
+            return
+        first, stop = dirty
+        vertex = GeomVertexWriter(self.geom.modifyVertexData(), 'vertex')
+        for line in range(self.ring.lines):
+            center = self._lane_center(line // 3)
+            vertex.setRow(line * self.ring.capacity + first)
+            for row, value in enumerate(self.ring.values[first:stop, line].tolist(), first):
+                vertex.setData3f(row, 0, center + value * self.lane_height / 2)
+        
+        # Non-indexed strips: only the start of each run changes
+        start = self.ring.start
+        prim = self.geom.modifyPrimitive(0)
+        prim.clearVertices()
+        for line in range(self.ring.lines):
+            prim.addConsecutiveVertices(line * self.ring.capacity + start, self.window)
+            prim.closePrimitive()
+        self.node_path.setPos(self.position[0] - start * self.width / self.window,
+                              self.position[1], self.position[2])
+
+
 # Start the application
 if __name__ == "__main__":
     app = MotionVisualizerApp()
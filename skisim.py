@@ -0,0 +1,437 @@
+"""
+SkiSim command line entry point.
+
+    python skisim.py play --session data/Skimulator/Set3
+    python skisim.py play-panda3d --device left=data/Skimulator/Set3/Left
+    python skisim.py stream --session data/Skimulator/Set3 --ip 192.168.1.20 --port 5005
+    python skisim.py stream --session data/Skimulator/Set3 --shared set3   # share with other processes
+    python skisim.py stream --session data/Skimulator/Set3 --filter accelerometer=median:5,lowpass:8
+    python skisim.py play --session data/Skimulator/Set3 --compare data/Skimulator/Set4
+    python skisim.py convert --session data/Skimulator/Set3
+    python skisim.py record-live --session data/Skimulator/Set3 --output data/Live   # play it while it records
+    python skisim.py index data/Skimulator --index turns.idx
+    python skisim.py similar --session data/Skimulator/Set3 --at 42.5 --index turns.idx
+    python skisim.py export --session data/Skimulator/Set3 --output run.mp4 --fps 30
+    python skisim.py bench --session data/Skimulator/Set3
+
+Only the standard library is imported up front; every subcommand imports the
+modules it needs (pygame, OpenGL, Panda3D, pandas) when it runs.
+"""
+import argparse
+import os
+import sys
+import time
+
+DEFAULT_SESSION = "data/Skimulator/Set3"
+
+def session_devices(session):
+    """(name, folder) for every device sub-folder of a session, e.g. Left/ and Right/"""
+    devices = []
+    for entry in sorted(os.listdir(session)):
+        path = os.path.join(session, entry)
+        if os.path.isdir(path) and (os.path.exists(os.path.join(path, "Accelerometer.csv"))
+                                    or os.path.exists(os.path.join(path, "session.npz"))
+                                    or os.path.exists(os.path.join(path, "session.live"))):
+            devices.append((entry.lower(), path + "/"))
+    return devices
+
+
+def parse_devices(args):
+    if args.device:
+        devices = []
+        for spec in args.device:
+            name, sep, path = spec.partition("=")
+            if not sep or not name or not path:
+                raise SystemExit(f"Invalid --device '{spec}', expected name=folder")
+            devices.append((name, path.rstrip("/") + "/"))
+        return devices
+
+    if not os.path.isdir(args.session):
+        raise SystemExit(f"Session folder not found: {args.session}")
+    devices = session_devices(args.session)
+    if not devices:
+        raise SystemExit(f"No device folders found in {args.session}")
+    return devices
+
+
+def archive_sessions(roots):
+    """(session folder, devices) for every session folder found below `roots`"""
+    sessions = []
+    for root in roots:
+        for folder, subfolders, files in os.walk(root):
+            devices = session_devices(folder)
+            if devices:
+                sessions.append((folder, devices))
+                subfolders[:] = [entry for entry in subfolders
+                                 if os.path.join(folder, entry) + "/" not in {path for name, path in devices}]
+            subfolders.sort()
+    return sessions
+
+
+def parse_compare(args):
+    """Devices of the --compare session, or None"""
+    if not args.compare:
+        return None
+    if not os.path.isdir(args.compare):
+        raise SystemExit(f"Session folder not found: {args.compare}")
+    devices = session_devices(args.compare)
+    if not devices:
+        raise SystemExit(f"No device folders found in {args.compare}")
+    return devices
+
+
+def make_udp_handler(args):
+    from UDPHandler import UDPHandler
+    try:
+        udp_handler = UDPHandler(args.ip, args.port, record_path=args.record)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Cannot record to {args.record}: {e}")
+    if args.predict:
+        # Frames arrive every dt / speed seconds when streaming faster or slower than real time
+        speed = getattr(args, "speed", 1.0)
+        udp_handler.enablePrediction(args.predict, args.predict_rate, args.dt / speed if speed > 0 else args.dt)
+    return udp_handler
+
+
+def parse_filter_args(args):
+    from SignalFilter import parse_filters
+    try:
+        return parse_filters(args.filter)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+def load_visualizers(devices, udp_handler, dt, use_cache=True):
+    from SessionLoader import load_session, SessionLoadError
+    try:
+        return load_session(devices, udp_handler, dt, use_cache)
+    except SessionLoadError as e:
+        raise SystemExit(str(e))
+
+
+def cmd_play(args):
+    import player
+    player.deltaTime = args.dt
+    player.FILTERS = parse_filter_args(args)
+    player.CAUSAL_FILTERS = args.causal
+    player.SYNC_METHOD = args.sync
+    player.COMPARE_DEVICES = parse_compare(args)
+    player.TURN_INDEX = args.index
+    player.main(parse_devices(args), make_udp_handler(args), args.shared, args.frame_budget / 1000.0)
+
+
+def cmd_play_panda3d(args):
+    from player_panda3d import MotionVisualizerApp
+    app = MotionVisualizerApp(parse_devices(args), make_udp_handler(args), shared_session=args.shared,
+                              filters=parse_filter_args(args), causal_filters=args.causal, gpu_playback=args.gpu,
+                              sync_method=args.sync, compare_devices=parse_compare(args), turn_index=args.index,
+                              frame_budget=args.frame_budget / 1000.0)
+    app.run()
+
+
+def cmd_stream(args):
+    """Headless streamer: replay the session over UDP without any window"""
+    from SensorArray import SensorArray
+
+    udp_handler = make_udp_handler(args)
+    if args.shared:
+        from SessionStore import open_shared_session
+        from SessionLoader import SessionLoadError
+        try:
+            store, visualizers, sensor_array = open_shared_session(args.shared, parse_devices(args), udp_handler,
+                                                                   args.dt)
+        except SessionLoadError as e:  # Also SharedSessionError
+            raise SystemExit(str(e))
+    else:
+        sensor_array = SensorArray(load_visualizers(parse_devices(args), udp_handler, args.dt))
+    filters = parse_filter_args(args)
+    if filters:
+        sensor_array.apply_filters(filters, causal=args.causal)
+    sensor_array.sync_times(args.sync)
+    udp_handler.setExpectedDevices(sensor_array.names)
+
+    period = args.dt / args.speed if args.speed > 0 else 0.0
+    print(f"Streaming {sensor_array.count} devices, {sensor_array.get_length()} samples to {args.ip}:{args.port}")
+    try:
+        while True:
+            sensor_array.reset_state()
+            start = time.perf_counter()
+            for index in range(sensor_array.get_length()):
+                sensor_array.step(index, False)
+                sensor_array.publish(udp_handler, tick=index)
+                if period:
+                    delay = start + (index + 1) * period - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+            if not args.loop:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        udp_handler.close()
+
+
+def cmd_export(args):
+    """Render the session offscreen at a fixed frame rate into a video or image sequence"""
+    from VideoExporter import open_sink, ExportError
+
+    try:
+        width, height = (int(value) for value in args.size.lower().split("x"))
+    except ValueError:
+        raise SystemExit(f"Invalid --size '{args.size}', expected WIDTHxHEIGHT")
+    devices = parse_devices(args)
+    try:
+        sink = open_sink(args.output, width, height, args.fps)
+    except ExportError as e:
+        raise SystemExit(str(e))
+
+    try:
+        if args.player == "panda3d":
+            from player_panda3d import MotionVisualizerApp
+            from UDPHandler import UDPHandler
+            app = MotionVisualizerApp(devices, UDPHandler(), offscreen_size=(width, height))
+            app.export_video(sink, args.fps)
+        else:
+            import player
+            player.deltaTime = args.dt
+            player.export_video(sink, args.fps, (width, height), devices)
+    except ExportError as e:
+        raise SystemExit(str(e))
+
+
+def cmd_convert(args):
+    """Parse the CSVs once and write the binary cache next to them"""
+    for visualizer in load_visualizers(parse_devices(args), None, args.dt, use_cache=False):
+        visualizer.save_cache()
+
+
+def cmd_record_live(args):
+    """Replay a session into live recordings at the speed it was captured"""
+    from LiveRecorder import record_session
+    try:
+        record_session(parse_devices(args), args.output, args.dt, args.speed)
+    except OSError as e:
+        raise SystemExit(str(e))
+
+
+def cmd_index(args):
+    """Build or update the similar-turn index over an archive of sessions"""
+    from TurnIndex import TurnIndex
+
+    sessions = archive_sessions(args.archive)
+    if not sessions:
+        raise SystemExit(f"No sessions found in {', '.join(args.archive)}")
+    index = TurnIndex(args.index)
+    start = time.perf_counter()
+    analyzed = index.update(sessions, args.dt, args.mode, args.window)
+    index.save()
+    print(f"Indexed {len(index)} {args.mode} from {len(index.sessions)} sessions "
+          f"({analyzed} analyzed) in {time.perf_counter() - start:.1f} s")
+
+
+def cmd_similar(args):
+    """List the turns of the archive most similar to one turn of a session"""
+    from SensorArray import SensorArray
+    from TurnIndex import TurnIndex, turn_signals, format_match
+
+    index = TurnIndex(args.index)
+    if not len(index):
+        raise SystemExit(f"Turn index {args.index} is empty, build it with the index command")
+    dt = index.settings["dt"]
+    sensor_array = SensorArray(load_visualizers(parse_devices(args), None, dt))
+    sensor_array.sync_times()
+    signals = turn_signals(sensor_array)
+
+    # The turn (or window) around --at, or an explicit --stop
+    at = int(round(args.at / dt))
+    if args.stop is not None:
+        start, stop = at, int(round(args.stop / dt))
+    else:
+        starts, stops = index.segments(signals)
+        around = (starts <= at) & (stops > at)
+        if not around.any():
+            raise SystemExit(f"No turn at {args.at:g} s, pass --stop to give the range")
+        start, stop = int(starts[around][0]), int(stops[around][0])
+    if stop <= start:
+        raise SystemExit("The range must end after it starts")
+
+    query_start = time.perf_counter()
+    matches = index.query_range(signals, start, stop, args.session if not args.device else None, args.k)
+    print(f"Turn {start * dt:.1f}-{stop * dt:.1f}s, {len(matches)} matches of {len(index)} "
+          f"in {1000 * (time.perf_counter() - query_start):.1f} ms")
+    for number, match in enumerate(matches, 1):
+        print(format_match(number, match, dt))
+
+
+def cmd_bench(args):
+    devices = parse_devices(args)
+
+    start = time.perf_counter()
+    import numpy
+    import MotionVisualizer
+    from SensorArray import SensorArray
+    from UDPHandler import UDPHandler
+    print(f"import: {1000 * (time.perf_counter() - start):.1f} ms")
+
+    for use_cache in (False, True):
+        start = time.perf_counter()
+        visualizers = load_visualizers(devices, None, args.dt, use_cache=use_cache)
+        label = "cache" if use_cache and all(v.cache_is_fresh() for v in visualizers) else "csv"
+        print(f"load ({label}): {1000 * (time.perf_counter() - start):.1f} ms")
+
+    udp_handler = UDPHandler(args.ip, args.port)
+    sensor_array = SensorArray(visualizers)
+    sensor_array.sync_times()
+    udp_handler.setExpectedDevices(sensor_array.names)
+    ticks = min(args.ticks, sensor_array.get_length())
+    if ticks <= 0:
+        raise SystemExit("No samples to benchmark; the session is empty (or --ticks is 0)")
+
+    start = time.perf_counter()
+    for index in range(ticks):
+        sensor_array.step(index, False)
+    elapsed = time.perf_counter() - start
+    print(f"step: {1e6 * elapsed / ticks:.2f} us/tick for {sensor_array.count} devices")
+
+    start = time.perf_counter()
+    for index in range(ticks):
+        sensor_array.publish(udp_handler, tick=index)
+    elapsed = time.perf_counter() - start
+    print(f"publish: {1e6 * elapsed / ticks:.2f} us/tick ({ticks / elapsed:.0f} packets/s)")
+    udp_handler.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="skisim", description="SkiSim players, streamer and tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_session_args(subparser):
+        subparser.add_argument("--session", default=DEFAULT_SESSION,
+                               help="Session folder with one sub-folder per device (default: %(default)s)")
+        subparser.add_argument("--device", action="append", metavar="NAME=FOLDER",
+                               help="Explicit device folder, may be repeated; overrides --session")
+        subparser.add_argument("--dt", type=float, default=0.01, help="Sample period in seconds")
+
+    def add_sync_args(subparser):
+        subparser.add_argument("--sync", choices=("timestamps", "correlate", "drift"), default="timestamps",
+                               help="Align devices by their clocks, or estimate clock offsets by correlating "
+                                    "their motion (cached per device pair); drift also corrects clocks that "
+                                    "run at slightly different rates")
+
+    def add_filter_args(subparser):
+        subparser.add_argument("--filter", action="append", metavar="CHANNEL=STAGE[,STAGE]",
+                               help="Filter chain for accelerometer, gyro or gravity, e.g. "
+                                    "accelerometer=median:5,lowpass:8 (Hz) or gyro=highpass:0.3; may be repeated")
+        subparser.add_argument("--causal", action="store_true",
+                               help="Filter sample by sample like live input instead of zero-phase over the session")
+
+    def add_compare_args(subparser):
+        subparser.add_argument("--compare", metavar="SESSION",
+                               help="Second session (another athlete or attempt) shown next to this one, "
+                                    "time-warped so both move in lockstep")
+
+    def add_frame_args(subparser):
+        subparser.add_argument("--frame-budget", type=float, default=1000.0 / 60.0, metavar="MS",
+                               help="Frame time in milliseconds before optional drawing is reduced "
+                                    "(default: %(default).1f)")
+
+    def add_index_args(subparser):
+        subparser.add_argument("--index", metavar="FOLDER",
+                               help="Similar-turn index built with the index command; press f to search it")
+
+    def add_udp_args(subparser):
+        subparser.add_argument("--ip", default="127.0.0.1", help="UDP target address")
+        subparser.add_argument("--port", type=int, default=5005, help="UDP target port")
+        subparser.add_argument("--record", metavar="FILE", help="Also record every packet to a binary log")
+        subparser.add_argument("--predict", type=float, default=0.0, metavar="MS",
+                               help="Send poses predicted MS milliseconds ahead to hide network and display latency")
+        subparser.add_argument("--predict-rate", type=float, default=250.0, metavar="HZ",
+                               help="Packets per second sent with --predict (default: %(default)g)")
+        subparser.add_argument("--shared", metavar="NAME",
+                               help="Attach to the shared-memory session NAME, loading and sharing it if needed")
+
+    play = subparsers.add_parser("play", help="pygame/OpenGL player")
+    add_session_args(play)
+    add_udp_args(play)
+    add_filter_args(play)
+    add_sync_args(play)
+    add_compare_args(play)
+    add_frame_args(play)
+    add_index_args(play)
+    play.set_defaults(func=cmd_play)
+
+    play_panda3d = subparsers.add_parser("play-panda3d", help="Panda3D player")
+    add_session_args(play_panda3d)
+    add_udp_args(play_panda3d)
+    add_filter_args(play_panda3d)
+    add_sync_args(play_panda3d)
+    add_compare_args(play_panda3d)
+    add_frame_args(play_panda3d)
+    add_index_args(play_panda3d)
+    play_panda3d.add_argument("--gpu", action="store_true",
+                              help="Upload the pose tracks once and pose the boots in a vertex shader")
+    play_panda3d.set_defaults(func=cmd_play_panda3d)
+
+    stream = subparsers.add_parser("stream", help="Headless UDP streamer")
+    add_session_args(stream)
+    add_udp_args(stream)
+    add_filter_args(stream)
+    add_sync_args(stream)
+    stream.add_argument("--speed", type=float, default=1.0, help="Playback speed, 0 = as fast as possible")
+    stream.add_argument("--loop", action="store_true", help="Restart at the end of the session")
+    stream.set_defaults(func=cmd_stream)
+
+    export = subparsers.add_parser("export", help="Render the session offscreen to a video or image sequence")
+    add_session_args(export)
+    export.add_argument("--output", required=True,
+                        help="Video file (encoded with ffmpeg) or folder for a PPM image sequence")
+    export.add_argument("--fps", type=int, default=30)
+    export.add_argument("--size", default="1280x720", help="WIDTHxHEIGHT (default: %(default)s)")
+    export.add_argument("--player", choices=("opengl", "panda3d"), default="opengl")
+    export.set_defaults(func=cmd_export)
+
+    convert = subparsers.add_parser("convert", help="Write the binary session cache from the CSVs")
+    add_session_args(convert)
+    convert.set_defaults(func=cmd_convert)
+
+    record_live = subparsers.add_parser("record-live", help="Feed a session through the live recorder, "
+                                                            "e.g. to try instant replay while it records")
+    add_session_args(record_live)
+    record_live.add_argument("--output", required=True, help="Session folder to record into")
+    record_live.add_argument("--speed", type=float, default=1.0, help="Playback speed, 0 = as fast as possible")
+    record_live.set_defaults(func=cmd_record_live)
+
+    index = subparsers.add_parser("index", help="Build or update the similar-turn index over session archives")
+    index.add_argument("archive", nargs="+", help="Folders searched recursively for sessions")
+    index.add_argument("--index", required=True, metavar="FOLDER", help="Index folder, updated in place")
+    index.add_argument("--mode", choices=("turns", "windows"), default="turns",
+                       help="Split sessions into detected turns or fixed windows (default: %(default)s)")
+    index.add_argument("--window", type=float, default=2.0, help="Window length in seconds for --mode windows")
+    index.add_argument("--dt", type=float, default=0.01, help="Sample period in seconds")
+    index.set_defaults(func=cmd_index)
+
+    similar = subparsers.add_parser("similar", help="List the archive turns most similar to one turn of a session")
+    add_session_args(similar)
+    similar.add_argument("--index", required=True, metavar="FOLDER", help="Index built with the index command")
+    similar.add_argument("--at", type=float, required=True, help="Seconds into the session of the turn to match")
+    similar.add_argument("--stop", type=float, help="End of the range in seconds, instead of the turn around --at")
+    similar.add_argument("-k", type=int, default=10, help="Number of matches (default: %(default)s)")
+    similar.set_defaults(func=cmd_similar)
+
+    bench = subparsers.add_parser("bench", help="Time imports, loading, stepping and sending")
+    add_session_args(bench)
+    bench.add_argument("--ip", default="127.0.0.1")
+    bench.add_argument("--port", type=int, default=5005)
+    bench.add_argument("--ticks", type=int, default=10000)
+    bench.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())